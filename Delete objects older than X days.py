@@ -1,50 +1,137 @@
 
-import boto3
+import json
+import sys
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 from datetime import datetime, timezone, timedelta
 
+from cookbook.checkpoint import CheckpointJournal, resume_requested
+from cookbook.clients import get_client
+from cookbook.s3_delete import delete_objects_batched
+from cookbook.s3_lifecycle import apply_rule, estimate_expiration, expiration_rule, tagged_objects
+from cookbook.s3_listing import iter_objects, iter_objects_sorted
+from cookbook.s3_versions import purge_versions
+
 # ----- AWS Configuration -----
 AWS_ACCESS_KEY_ID = ""  # Replace with your access key
 AWS_SECRET_ACCESS_KEY = ""  # Replace with your secret key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 BUCKET_NAME = "test-timescaledb-2"  # Replace with your bucket name
 
 # Delete settings
 OLDER_THAN_DAYS = 30  # Delete objects older than X days
+DELETE_WORKERS = 8  # Concurrent DeleteObjects requests (1000 keys each)
+LIST_WORKERS = 16  # Prefixes listed in parallel
+PREFIX = ""  # Only keys under this prefix ("" = whole bucket)
+TAG_FILTERS = {}  # Only objects carrying all of these tags, e.g. {"retention": "short"}
+# "client" deletes now with batched DeleteObjects; "lifecycle" installs an S3 expiration rule instead,
+# so S3 expires the objects server-side with no per-object API calls; "versions" purges noncurrent
+# versions (noncurrent for OLDER_THAN_DAYS) and expired delete markers from a versioned bucket
+DELETE_MODE = "client"
+KEEP_NONCURRENT_VERSIONS = 0  # versions mode: newest noncurrent versions kept per key whatever their age
+LIFECYCLE_RULE_ID = "delete-objects-older-than-x-days"  # Existing rule with this ID is replaced, others kept
+DRY_RUN = False  # lifecycle / versions mode: only print the estimate
+# Progress journal for --resume (e.g. "./delete.checkpoint.db"); listing switches to key order when set
+CHECKPOINT_FILE = ""
+RESUME = resume_requested(sys.argv)
 
-# ----- Force explicit credentials -----
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise NoCredentialsError("No AWS credentials provided explicitly!")
-
-# Create isolated session (ignores EC2/EKS roles)
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
-s3_client = session.client("s3")
+# ----- Create S3 client (explicit keys, AWS_PROFILE, ROLE_ARN or the default credential chain) -----
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=DELETE_WORKERS + LIST_WORKERS,
+                       access_key=AWS_ACCESS_KEY_ID, secret_key=AWS_SECRET_ACCESS_KEY,
+                       profile=AWS_PROFILE, role_arn=ROLE_ARN)
 
 # Calculate cutoff datetime
 cutoff_date = datetime.now(timezone.utc) - timedelta(days=OLDER_THAN_DAYS)
 
+
+journal = None
+if CHECKPOINT_FILE and DELETE_MODE == "client":
+    journal = CheckpointJournal(CHECKPOINT_FILE, f"delete:{BUCKET_NAME}:{OLDER_THAN_DAYS}d", resume=RESUME)
+    if journal.resumed:
+        print(f"Resuming after '{journal.watermark}' ({journal.totals()[0]} objects handled by earlier runs)")
+
+
+def expired_objects():
+    """Yield listing entries older than the cutoff date."""
+    if journal:
+        # Journaled batches must arrive in key order to form a resumable watermark
+        listing = iter_objects_sorted(s3_client, BUCKET_NAME, PREFIX, start_after=journal.watermark,
+                                      prefetch_pages=16)
+    else:
+        listing = iter_objects(s3_client, BUCKET_NAME, PREFIX, max_workers=LIST_WORKERS)
+    for obj in listing:
+        if obj["LastModified"] < cutoff_date:
+            yield obj
+
+
+def delete_candidates():
+    """Expired objects that also carry every TAG_FILTERS tag, still in listing order."""
+    return tagged_objects(s3_client, BUCKET_NAME, expired_objects(), TAG_FILTERS, max_workers=LIST_WORKERS)
+
+
+def report_batch(batch, deleted, errors):
+    print(f"Deleted batch of {len(deleted)} objects (up to {batch[-1]['Key']})")
+    for err in errors:
+        print(f"Failed to delete {err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+
+
+def compile_lifecycle_rule():
+    """Install OLDER_THAN_DAYS (+ PREFIX / TAG_FILTERS) as a lifecycle expiration rule, after a dry-run estimate."""
+    rule = expiration_rule(LIFECYCLE_RULE_ID, OLDER_THAN_DAYS, PREFIX, TAG_FILTERS)
+    print(f"Lifecycle rule: {json.dumps(rule)}")
+
+    estimate = estimate_expiration(s3_client, BUCKET_NAME, OLDER_THAN_DAYS, PREFIX, TAG_FILTERS,
+                                   list_workers=LIST_WORKERS)
+    print(f"Estimate: {estimate['objects']} of {estimate['scanned']} objects "
+          f"({estimate['bytes'] / (1024**3):.2f} GB) would expire on the next lifecycle run "
+          f"(oldest: {estimate['oldest']}, listed in {estimate['elapsed']:.1f}s)")
+
+    if DRY_RUN:
+        print("Dry run: lifecycle configuration not changed.")
+        return
+    action = apply_rule(s3_client, BUCKET_NAME, rule)
+    print(f"Lifecycle rule '{LIFECYCLE_RULE_ID}' {action}; other rules were kept. "
+          f"S3 expires matching objects asynchronously, usually within a day or two.")
+
+
+def purge_old_versions():
+    """Delete noncurrent versions and expired delete markers under PREFIX (TAG_FILTERS does not apply)."""
+    result = purge_versions(
+        s3_client, BUCKET_NAME, PREFIX, noncurrent_days=OLDER_THAN_DAYS,
+        keep_noncurrent=KEEP_NONCURRENT_VERSIONS, max_workers=DELETE_WORKERS,
+        on_batch=report_batch, dry_run=DRY_RUN
+    )
+    print(f"\nScanned {result['keys']} keys: {result['versions']} versions, "
+          f"{result['delete_markers']} delete markers")
+    print(f"Purge candidates: {result['candidates']} ({result['candidate_bytes'] / (1024**3):.2f} GB)")
+    if DRY_RUN:
+        print("Dry run: nothing deleted.")
+        return
+    rate = result["deleted"] / result["elapsed"] if result["elapsed"] else 0
+    print(f"Versions and delete markers deleted: {result['deleted']}")
+    print(f"Storage reclaimed: {result['bytes'] / (1024**3):.2f} GB")
+    print(f"Failed deletions: {len(result['errors'])}")
+    if result["markers_kept"]:
+        print(f"Delete markers kept because a version behind them could not be deleted: {result['markers_kept']}")
+    print(f"Elapsed: {result['elapsed']:.1f}s ({rate:.0f} versions/s)")
+
+
 try:
-    paginator = s3_client.get_paginator("list_objects_v2")
-    deleted_count = 0
-
-    for page in paginator.paginate(Bucket=BUCKET_NAME):
-        for obj in page.get("Contents", []):
-            last_modified = obj["LastModified"]
-            key = obj["Key"]
-
-            if last_modified < cutoff_date:
-                try:
-                    s3_client.delete_object(Bucket=BUCKET_NAME, Key=key)
-                    deleted_count += 1
-                    print(f"Deleted: {key} (LastModified: {last_modified})")
-                except ClientError as e:
-                    print(f"Failed to delete {key}: {e}")
-
-    print(f"\nTotal objects deleted: {deleted_count}")
+    if DELETE_MODE == "lifecycle":
+        compile_lifecycle_rule()
+    elif DELETE_MODE == "versions":
+        purge_old_versions()
+    else:
+        result = delete_objects_batched(
+            s3_client, BUCKET_NAME, delete_candidates(),
+            max_workers=DELETE_WORKERS, on_batch=report_batch, journal=journal
+        )
+        rate = result["deleted"] / result["elapsed"] if result["elapsed"] else 0
+
+        print(f"\nTotal objects deleted: {result['deleted']}")
+        print(f"Failed deletions: {len(result['errors'])}")
+        print(f"Elapsed: {result['elapsed']:.1f}s ({rate:.0f} objects/s)")
 
 except NoCredentialsError:
     print("AWS credentials not found or invalid.")
@@ -1,10 +1,13 @@
-import boto3
+from cookbook.clients import get_client
+from cookbook.eks import TERMINAL_STATUSES, UNCHANGED, scale_nodegroups
 
 # ===========================
 # AWS Configuration
 # ===========================
 AWS_ACCESS_KEY = ""       # <-- Your AWS Access Key
 AWS_SECRET_KEY = ""  # <-- Your AWS Secret Key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 REGION = "ap-south-1"
 CLUSTER_NAME = "testing-eks-cluster"
 NODEGROUP_NAME = "testing-nodegroup"
@@ -12,49 +15,43 @@ MIN_NODES = 1
 MAX_NODES = 3
 DESIRED_NODES = 1
 
+# Nodegroups scaled together (any cluster in REGION); add entries to scale more at once
+NODEGROUPS = [
+    {"cluster": CLUSTER_NAME, "nodegroup": NODEGROUP_NAME, "min": MIN_NODES, "max": MAX_NODES, "desired": DESIRED_NODES},
+]
+SCALE_WORKERS = 16  # Nodegroups updated concurrently
+
 # ===========================
-# Step 1: Create boto3 session and EKS client
+# Step 1: Create EKS client (keys, AWS_PROFILE, ROLE_ARN or default chain)
 # ===========================
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION
-)
-
-eks_client = session.client("eks")
+eks_client = get_client("eks", REGION, max_pool_connections=SCALE_WORKERS,
+                        access_key=AWS_ACCESS_KEY, secret_key=AWS_SECRET_KEY,
+                        profile=AWS_PROFILE, role_arn=ROLE_ARN)
 
 # ===========================
-# Step 2: Update Node Group Scaling
+# Step 2: Update Node Group Scaling (all nodegroups at once)
 # ===========================
-response = eks_client.update_nodegroup_config(
-    clusterName=CLUSTER_NAME,
-    nodegroupName=NODEGROUP_NAME,
-    scalingConfig={
-        'minSize': MIN_NODES,
-        'maxSize': MAX_NODES,
-        'desiredSize': DESIRED_NODES
+targets = [
+    {
+        "cluster": ng["cluster"],
+        "nodegroup": ng["nodegroup"],
+        "scalingConfig": {'minSize': ng["min"], 'maxSize': ng["max"], 'desiredSize': ng["desired"]},
     }
-)
+    for ng in NODEGROUPS
+]
 
-print("[INFO] Node group scaling update initiated.")
-print(f"Status: {response['update']['status']}")
-print(f"Update ID: {response['update']['id']}")
 
-# ===========================
-# Step 3: Optional - Wait for Update Completion
-# ===========================
-import time
+def report_status(target, update):
+    print(f"[INFO] {target['cluster']}/{target['nodegroup']}: update {update['id']} {update['status']}")
 
-while True:
-    status = eks_client.describe_update(
-        name=CLUSTER_NAME,
-        nodegroupName=NODEGROUP_NAME,
-        updateId=response['update']['id']
-    )['update']['status']
 
-    print(f"[INFO] Current update status: {status}")
-    if status in ['Successful', 'Failed', 'Cancelled']:
-        break
-    time.sleep(10)
+# ===========================
+# Step 3: Wait for every update (backoff tuned to the update type)
+# ===========================
+result = scale_nodegroups(eks_client, targets, max_workers=SCALE_WORKERS, on_status=report_status)
 
-print(f"[INFO] Final node group update status: {status}")
+for target, error in result["errors"]:
+    print(f"[ERROR] {target['cluster']}/{target['nodegroup']}: {error}")
+print(f"[INFO] Final node group update status: "
+      + ", ".join(f"{status}={result[status]}" for status in TERMINAL_STATUSES + (UNCHANGED,))
+      + f" ({len(result['errors'])} errors, {result['elapsed']:.0f}s)")
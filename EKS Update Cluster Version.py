@@ -1,50 +1,63 @@
-import boto3
-import time
+import sys
+
+from cookbook.checkpoint import CheckpointJournal, resume_requested
+from cookbook.clients import get_client
+from cookbook.eks import BLOCKED, ERROR, UNCHANGED, plan_upgrade, run_upgrade
 
 # ===========================
 # AWS Configuration
 # ===========================
 AWS_ACCESS_KEY = ""
 AWS_SECRET_KEY = ""
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 REGION = "ap-south-1"
 CLUSTER_NAME = "testing-eks-cluster"
+CLUSTERS = [CLUSTER_NAME]  # Clusters upgraded together; add names to upgrade several at once
 NEW_VERSION = "1.30"  # Kubernetes version to upgrade to
+UPGRADE_WORKERS = 8  # Updates in flight across all clusters
+PER_CLUSTER_WORKERS = 2  # Add-on / nodegroup updates in flight per cluster
+CHECKPOINT_FILE = "./eks_upgrade.checkpoint.db"  # In-flight and finished updates ("" disables it)
+RESUME = resume_requested(sys.argv)  # Run with --resume to wait on updates started by an interrupted run
 
 # ===========================
-# Create EKS client
+# Create EKS client (keys, AWS_PROFILE, ROLE_ARN or default chain)
 # ===========================
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION
-)
-
-eks_client = session.client("eks")
+eks_client = get_client("eks", REGION, max_pool_connections=UPGRADE_WORKERS,
+                        access_key=AWS_ACCESS_KEY, secret_key=AWS_SECRET_KEY,
+                        profile=AWS_PROFILE, role_arn=ROLE_ARN)
 
 # ===========================
-# Update Cluster Version
+# Plan: control plane, then add-ons and nodegroups
 # ===========================
-response = eks_client.update_cluster_version(
-    name=CLUSTER_NAME,
-    version=NEW_VERSION
-)
+journal = None
+if CHECKPOINT_FILE:
+    journal = CheckpointJournal(CHECKPOINT_FILE, f"eks-upgrade:{REGION}:{NEW_VERSION}", resume=RESUME)
 
-update_id = response['update']['id']
-print(f"[INFO] Cluster version update initiated. Update ID: {update_id}")
+steps = []
+for cluster in CLUSTERS:
+    cluster_steps = plan_upgrade(eks_client, cluster, NEW_VERSION)
+    print(f"[INFO] {cluster}: {len(cluster_steps)} upgrade steps to {NEW_VERSION}")
+    for step in cluster_steps:
+        print(f"  - {step['kind']} {step['name']} -> {step['version']}")
+    steps += cluster_steps
 
 # ===========================
-# Wait for Update Completion
+# Run the plan (independent steps in parallel, backoff tuned to each update type)
 # ===========================
-while True:
-    update_status = eks_client.describe_update(
-        name=CLUSTER_NAME,
-        updateId=update_id
-    )['update']['status']
-    
-    print(f"[INFO] Current cluster update status: {update_status}")
-    
-    if update_status in ['Successful', 'Failed', 'Cancelled']:
-        break
-    time.sleep(15)
+def report_step(step, status, error):
+    detail = f": {error}" if error else ""
+    print(f"[INFO] {step['cluster']} {step['kind']} {step['name']} -> {step['version']}: {status}{detail}")
+
+
+result = run_upgrade(eks_client, steps, max_workers=UPGRADE_WORKERS, per_cluster=PER_CLUSTER_WORKERS,
+                     journal=journal, on_step=report_step)
 
-print(f"[INFO] Final cluster update status: {update_status}")
+statuses = list(result["statuses"].values())
+print(f"[INFO] Upgrade finished in {result['elapsed'] / 60:.1f} min: "
+      f"{statuses.count('Successful')} updated, {statuses.count(UNCHANGED)} already at version, "
+      f"{statuses.count('Failed') + statuses.count('Cancelled') + statuses.count(ERROR)} failed, "
+      f"{statuses.count(BLOCKED)} blocked")
+if len(statuses) != statuses.count("Successful") + statuses.count(UNCHANGED):
+    print("[INFO] Fix the failed steps and run again with --resume to continue.")
+    sys.exit(1)
@@ -1,39 +1,71 @@
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 
+from cookbook.clients import get_client
+from cookbook.s3_compliance import (COMPLIANT, ERROR, FIXED, NON_COMPLIANT, RegionCache, scan_account,
+                                    write_report)
+
 # ----- AWS Configuration -----
 AWS_ACCESS_KEY_ID = ""  # Fill your access key
 AWS_SECRET_ACCESS_KEY = ""  # Fill your secret key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 BUCKET_NAME = "test-timescaledb-1"
 
-# ----- Force explicit credentials -----
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise NoCredentialsError("No AWS credentials provided explicitly!")
+# Account-wide scan: every bucket, checked concurrently per region
+SCAN_ALL_BUCKETS = False  # Check every bucket in the account instead of BUCKET_NAME
+APPLY_CHANGES = True  # False only reports non-compliant buckets
+SCAN_WORKERS = 16  # Buckets checked concurrently per region
+REPORT_FILE = "./versioning_compliance.csv"  # Compliance report (.csv or .json, "" to skip)
+REGION_CACHE_FILE = "./bucket_regions.json"  # Cached bucket regions ("" keeps them in memory only)
 
-# Create isolated session
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+# ----- Create S3 client (explicit keys, AWS_PROFILE, ROLE_ARN or the default credential chain) -----
+CREDENTIALS = dict(access_key=AWS_ACCESS_KEY_ID, secret_key=AWS_SECRET_ACCESS_KEY,
+                   profile=AWS_PROFILE, role_arn=ROLE_ARN)
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=SCAN_WORKERS, **CREDENTIALS)
 
-s3_client = session.client("s3")
 
-try:
-    # Check versioning status
-    versioning = s3_client.get_bucket_versioning(Bucket=BUCKET_NAME)
-    status = versioning.get("Status")
+def report_bucket(record):
+    if record["status"] == ERROR:
+        print(f"Bucket '{record['bucket']}' ({record['region']}): {record['error']}")
+    elif record["changes"]:
+        verb = "applied" if record["status"] == FIXED else "needed"
+        print(f"Bucket '{record['bucket']}' ({record['region']}): {', '.join(record['changes'])} {verb}")
+
+
+def scan_all_buckets():
+    """Check every bucket in the account, in its own region, and write the compliance report."""
+    records = scan_account(
+        s3_client,
+        lambda region: get_client("s3", region, max_pool_connections=SCAN_WORKERS, **CREDENTIALS),
+        region_cache=RegionCache(REGION_CACHE_FILE or None), max_workers=SCAN_WORKERS,
+        on_result=report_bucket, apply=APPLY_CHANGES, versioning=True
+    )
+    counts = {s: sum(r["status"] == s for r in records) for s in (COMPLIANT, FIXED, NON_COMPLIANT, ERROR)}
+    print(f"\n{len(records)} buckets: {counts[COMPLIANT]} compliant, {counts[FIXED]} fixed, "
+          f"{counts[NON_COMPLIANT]} non-compliant, {counts[ERROR]} errors")
+    if REPORT_FILE:
+        write_report(records, REPORT_FILE)
+        print(f"Compliance report written to {REPORT_FILE}")
 
-    if status == "Enabled":
-        print(f"Bucket '{BUCKET_NAME}' versioning is already ENABLED.")
+
+try:
+    if SCAN_ALL_BUCKETS:
+        scan_all_buckets()
     else:
-        print(f"Bucket '{BUCKET_NAME}' versioning is not enabled. Enabling now...")
-        s3_client.put_bucket_versioning(
-            Bucket=BUCKET_NAME,
-            VersioningConfiguration={'Status': 'Enabled'}
-        )
-        print(f"Versioning has been ENABLED for bucket '{BUCKET_NAME}'.")
+        # Check versioning status
+        versioning = s3_client.get_bucket_versioning(Bucket=BUCKET_NAME)
+        status = versioning.get("Status")
+
+        if status == "Enabled":
+            print(f"Bucket '{BUCKET_NAME}' versioning is already ENABLED.")
+        else:
+            print(f"Bucket '{BUCKET_NAME}' versioning is not enabled. Enabling now...")
+            s3_client.put_bucket_versioning(
+                Bucket=BUCKET_NAME,
+                VersioningConfiguration={'Status': 'Enabled'}
+            )
+            print(f"Versioning has been ENABLED for bucket '{BUCKET_NAME}'.")
 
 except NoCredentialsError:
     print("AWS credentials not found or invalid.")
@@ -1,66 +1,84 @@
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 
+from cookbook.clients import get_client
+from cookbook.s3_compliance import (COMPLIANT, ERROR, FIXED, NON_COMPLIANT, RegionCache, encryption_matches,
+                                    encryption_target, get_encryption_rules, scan_account, write_report)
+
 # ----- AWS Configuration -----
 AWS_ACCESS_KEY_ID = ""  # Fill your access key
 AWS_SECRET_ACCESS_KEY = ""  # Fill your secret key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 BUCKET_NAME = "test-timescaledb-1"
 
 ENCRYPTION_TYPE = "AES256"  # or "aws:kms"
 KMS_KEY_ID = "arn:aws:kms:us-west-2:123456789012:key/your-kms-key-id"
 
-# ----- Force explicit credentials -----
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise NoCredentialsError("No AWS credentials provided explicitly!")
+# Account-wide scan: every bucket, checked concurrently per region
+SCAN_ALL_BUCKETS = False  # Check every bucket in the account instead of BUCKET_NAME
+APPLY_CHANGES = True  # False only reports non-compliant buckets
+SCAN_WORKERS = 16  # Buckets checked concurrently per region
+REPORT_FILE = "./encryption_compliance.csv"  # Compliance report (.csv or .json, "" to skip)
+REGION_CACHE_FILE = "./bucket_regions.json"  # Cached bucket regions ("" keeps them in memory only)
+
+# ----- Create S3 client (explicit keys, AWS_PROFILE, ROLE_ARN or the default credential chain) -----
+CREDENTIALS = dict(access_key=AWS_ACCESS_KEY_ID, secret_key=AWS_SECRET_ACCESS_KEY,
+                   profile=AWS_PROFILE, role_arn=ROLE_ARN)
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=SCAN_WORKERS, **CREDENTIALS)
+
+
+def report_bucket(record):
+    if record["status"] == ERROR:
+        print(f"Bucket '{record['bucket']}' ({record['region']}): {record['error']}")
+    elif record["changes"]:
+        verb = "applied" if record["status"] == FIXED else "needed"
+        print(f"Bucket '{record['bucket']}' ({record['region']}): {', '.join(record['changes'])} {verb}")
 
-# Create isolated session
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
 
-s3_client = session.client("s3")
+def scan_all_buckets():
+    """Check every bucket in the account, in its own region, and write the compliance report."""
+    records = scan_account(
+        s3_client,
+        lambda region: get_client("s3", region, max_pool_connections=SCAN_WORKERS, **CREDENTIALS),
+        region_cache=RegionCache(REGION_CACHE_FILE or None), max_workers=SCAN_WORKERS,
+        on_result=report_bucket, apply=APPLY_CHANGES, encryption=ENCRYPTION_TARGET
+    )
+    counts = {s: sum(r["status"] == s for r in records) for s in (COMPLIANT, FIXED, NON_COMPLIANT, ERROR)}
+    print(f"\n{len(records)} buckets: {counts[COMPLIANT]} compliant, {counts[FIXED]} fixed, "
+          f"{counts[NON_COMPLIANT]} non-compliant, {counts[ERROR]} errors")
+    if REPORT_FILE:
+        write_report(records, REPORT_FILE)
+        print(f"Compliance report written to {REPORT_FILE}")
+
 
 try:
-    # ----- Get current encryption configuration -----
-    try:
-        current = s3_client.get_bucket_encryption(Bucket=BUCKET_NAME)
-        rules = current["ServerSideEncryptionConfiguration"]["Rules"]
-        print(f"Bucket '{BUCKET_NAME}' already has encryption configured: {rules}")
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ServerSideEncryptionConfigurationNotFoundError":
-            print(f"Bucket '{BUCKET_NAME}' has no encryption. Applying now...")
-        else:
-            raise e
+    ENCRYPTION_TARGET = encryption_target(ENCRYPTION_TYPE, KMS_KEY_ID)
 
-    # ----- Apply encryption -----
-    if ENCRYPTION_TYPE == "AES256":
-        s3_client.put_bucket_encryption(
-            Bucket=BUCKET_NAME,
-            ServerSideEncryptionConfiguration={
-                'Rules': [
-                    {'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'}}
-                ]
-            }
-        )
-        print(f"AES-256 encryption enabled for bucket '{BUCKET_NAME}'.")
-    elif ENCRYPTION_TYPE == "aws:kms":
-        s3_client.put_bucket_encryption(
-            Bucket=BUCKET_NAME,
-            ServerSideEncryptionConfiguration={
-                'Rules': [
-                    {'ApplyServerSideEncryptionByDefault': {
-                        'SSEAlgorithm': 'aws:kms',
-                        'KMSMasterKeyID': KMS_KEY_ID
-                    }}
-                ]
-            }
-        )
-        print(f"KMS encryption enabled for bucket '{BUCKET_NAME}' with key {KMS_KEY_ID}.")
+    if SCAN_ALL_BUCKETS:
+        scan_all_buckets()
     else:
-        print("Invalid ENCRYPTION_TYPE. Use 'AES256' or 'aws:kms'.")
+        # ----- Check existing encryption configuration -----
+        rules = get_encryption_rules(s3_client, BUCKET_NAME)
+        if encryption_matches(rules, ENCRYPTION_TARGET):
+            print(f"Bucket '{BUCKET_NAME}' already has the requested encryption configured: {rules}")
+        else:
+            if rules:
+                print(f"Bucket '{BUCKET_NAME}' has different encryption configured: {rules}. Replacing it...")
+            else:
+                print(f"Bucket '{BUCKET_NAME}' has no encryption. Applying now...")
+
+            # ----- Apply encryption -----
+            s3_client.put_bucket_encryption(
+                Bucket=BUCKET_NAME,
+                ServerSideEncryptionConfiguration={
+                    'Rules': [{'ApplyServerSideEncryptionByDefault': ENCRYPTION_TARGET}]
+                }
+            )
+            if ENCRYPTION_TARGET["SSEAlgorithm"] == "AES256":
+                print(f"AES-256 encryption enabled for bucket '{BUCKET_NAME}'.")
+            else:
+                print(f"KMS encryption enabled for bucket '{BUCKET_NAME}' with key {KMS_KEY_ID}.")
 
 except NoCredentialsError:
     print("AWS credentials not found or invalid.")
@@ -68,3 +86,5 @@ except PartialCredentialsError:
     print("Incomplete AWS credentials provided.")
 except ClientError as e:
     print(f"AWS Client Error: {e}")
+except ValueError as e:
+    print(f"Configuration Error: {e}")
@@ -4,43 +4,89 @@ category: "Cloud Security"
 platform: "AWS"
 type: "Shell Script"
 script_data: |
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 
+from cookbook.clients import get_client
+from cookbook.s3_analytics import StorageBreakdown
+from cookbook.s3_inventory import inventory_totals, iter_batches, load_manifest
+from cookbook.s3_listing import iter_objects
+from cookbook.s3_storage_metrics import cloudwatch_bucket_size
+
 AWS_ACCESS_KEY_ID = ""  # Fill your access key
 AWS_SECRET_ACCESS_KEY = ""  # Fill your secret key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 BUCKET_NAME = "test-timescaledb-1"
+LIST_WORKERS = 16  # Prefixes listed in parallel
 
-# ----- Force use of explicit credentials only -----
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise NoCredentialsError("No AWS credentials provided explicitly!")
+# Size source: "list" (full LIST scan) | "inventory" (S3 Inventory report) | "cloudwatch" (daily metrics)
+SIZE_MODE = "list"
+INVENTORY_MANIFEST = ""  # s3://bucket/path/manifest.json or the inventory configuration prefix
 
-# Create a session using only the provided credentials
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+# Breakdown by prefix, storage class and age, built during the same list/inventory pass
+ANALYTICS_FILE = ""  # Report path (.csv or .parquet); "" skips the breakdown
+PREFIX_DEPTH = 1  # Prefix levels to group by (1 = top-level prefixes)
 
-s3_client = session.client("s3")
+# ----- Create clients (explicit keys, AWS_PROFILE, ROLE_ARN or the default credential chain) -----
+CREDENTIALS = dict(access_key=AWS_ACCESS_KEY_ID, secret_key=AWS_SECRET_ACCESS_KEY,
+                   profile=AWS_PROFILE, role_arn=ROLE_ARN)
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=LIST_WORKERS, **CREDENTIALS)
 
 try:
-    paginator = s3_client.get_paginator("list_objects_v2")
-    total_files = total_size = 0
+    breakdown = StorageBreakdown(PREFIX_DEPTH) if ANALYTICS_FILE else None
+
+    if SIZE_MODE == "cloudwatch":
+        if breakdown:
+            raise ValueError("ANALYTICS_FILE needs SIZE_MODE 'list' or 'inventory'.")
+        # Daily storage metrics: no listing at all, but up to ~48h old
+        metrics = cloudwatch_bucket_size(get_client("cloudwatch", AWS_REGION, **CREDENTIALS), BUCKET_NAME)
+        if metrics["objects"] is None:
+            raise ValueError("No BucketSizeBytes/NumberOfObjects metrics found for this bucket yet.")
+        total_files, total_size = metrics["objects"], metrics["bytes"]
+        source = f"CloudWatch storage metrics ({metrics['timestamp']})"
+    elif SIZE_MODE == "inventory":
+        # Stream the latest S3 Inventory report instead of listing the bucket
+        manifest = load_manifest(s3_client, INVENTORY_MANIFEST)
+        if breakdown:
+            for batch in iter_batches(s3_client, manifest):
+                breakdown.add(batch)
+            total_files, total_size = breakdown.totals()
+        else:
+            totals = inventory_totals(s3_client, manifest)
+            total_files, total_size = totals["objects"], totals["bytes"]
+        source = f"S3 Inventory ({manifest['_key']})"
+    elif breakdown:
+        # One LIST pass feeds both the totals and the breakdown
+        breakdown.add_objects(iter_objects(s3_client, BUCKET_NAME, max_workers=LIST_WORKERS))
+        total_files, total_size = breakdown.totals()
+        source = "LIST scan"
+    else:
+        total_files = total_size = 0
 
-    for page in paginator.paginate(Bucket=BUCKET_NAME):
-        for obj in page.get("Contents", []):
+        for obj in iter_objects(s3_client, BUCKET_NAME, max_workers=LIST_WORKERS):
             total_files += 1
             total_size += obj["Size"]
+        source = "LIST scan"
 
     print(f"Bucket: {BUCKET_NAME}")
+    print(f"Source: {source}")
     print(f"Total Files: {total_files}")
     print(f"Total Size: {total_size / (1024**2):.2f} MB")
 
+    if breakdown:
+        for dimension in ("storage_class", "age"):
+            print(f"\nBy {dimension.replace('_', ' ')}:")
+            for row in breakdown.rows(by=(dimension,)):
+                print(f"  {row[dimension]:<20} {row['objects']:>12} files {row['bytes'] / (1024**2):>14.2f} MB")
+        breakdown.write(ANALYTICS_FILE)
+        print(f"\nBreakdown by prefix (depth {PREFIX_DEPTH}), storage class and age written to {ANALYTICS_FILE}")
+
 except NoCredentialsError:
     print("AWS credentials not found or invalid.")
 except PartialCredentialsError:
     print("Incomplete AWS credentials provided.")
 except ClientError as e:
     print(f"AWS Client Error: {e}")
+except (ValueError, RuntimeError) as e:
+    print(f"Configuration Error: {e}")
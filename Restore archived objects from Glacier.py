@@ -1,56 +1,107 @@
-import boto3
+import sys
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 
+from cookbook.checkpoint import CheckpointJournal, resume_requested
+from cookbook.clients import get_client
+from cookbook.s3_glacier import (AVAILABLE, FAILED, IN_PROGRESS, LIST_ATTRIBUTES, RESTORED, SUBMITTED,
+                                 RestoreTracker, archived_objects, parse_date, restore_objects)
+from cookbook.s3_listing import iter_objects, iter_objects_sorted
+
 # ----- AWS Configuration -----
 AWS_ACCESS_KEY_ID = ""  # Replace with your access key
 AWS_SECRET_ACCESS_KEY = ""  # Replace with your secret key
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 BUCKET_NAME = "test-timescaledb-1"  # Replace with your bucket name
 
 # Restore settings
 RESTORE_DAYS = 7  # Number of days the restored object will be temporarily available
 RESTORE_TIER = "Standard"  # Options: Standard | Bulk | Expedited
+MODE = "submit"  # submit: send restore requests | track: poll until the objects are readable
+TRACKER_FILE = "./glacier_restore.tracker.db"  # Pending restores shared by both modes
+LIST_WORKERS = 16  # Prefixes listed in parallel
+RESTORE_WORKERS = 32  # Concurrent RestoreObject requests
+PREFIX = ""  # Only restore keys under this prefix
+MIN_SIZE_BYTES = 0  # Skip archived objects smaller than this
+MODIFIED_AFTER = ""  # ISO date, e.g. "2024-01-01" ("" = no limit)
+MODIFIED_BEFORE = ""  # ISO date ("" = no limit)
+# Progress journal for --resume (e.g. "./glacier_restore.checkpoint.db"); listing switches to key order when set
+CHECKPOINT_FILE = ""
+RESUME = resume_requested(sys.argv)  # Run with --resume to skip batches already submitted
 
-# ----- Force explicit credentials -----
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise NoCredentialsError("No AWS credentials provided explicitly!")
+if MODE not in ("submit", "track"):
+    raise ValueError(f"Invalid MODE '{MODE}' (expected submit or track)")
 
-# Create isolated session (ignores EC2/EKS roles)
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
-s3_client = session.client("s3")
+# ----- Create S3 client (explicit keys, AWS_PROFILE, ROLE_ARN or the default credential chain) -----
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=LIST_WORKERS + RESTORE_WORKERS,
+                       access_key=AWS_ACCESS_KEY_ID, secret_key=AWS_SECRET_ACCESS_KEY,
+                       profile=AWS_PROFILE, role_arn=ROLE_ARN)
 
-try:
-    # ----- Paginate through bucket objects -----
-    paginator = s3_client.get_paginator("list_objects_v2")
-    glacier_objects = []
+tracker = RestoreTracker(TRACKER_FILE, BUCKET_NAME)
+
+
+def report_restore(obj, status, error):
+    if status in (SUBMITTED, IN_PROGRESS):
+        tracker.add(obj, RESTORE_TIER)
+    elif status == RESTORED:
+        tracker.add(obj, RESTORE_TIER, status=AVAILABLE)
+    if status == SUBMITTED:
+        print(f"Restore request submitted for: {obj['Key']}")
+    elif status == FAILED:
+        print(f"Failed to submit restore for {obj['Key']}: {error}")
+
+
+def report_progress(stats):
+    eta = f"{stats['eta'] / 3600:.1f}h" if stats["eta"] is not None else "unknown"
+    print(f"Progress: {stats['percent']:.1f}% readable "
+          f"({stats['bytes_available'] / 1024 ** 3:.2f} of {stats['bytes_total'] / 1024 ** 3:.2f} GB), "
+          f"{stats[AVAILABLE]} available, {stats['pending']} pending, {stats['lost']} lost, ETA {eta}")
 
-    for page in paginator.paginate(Bucket=BUCKET_NAME):
-        for obj in page.get("Contents", []):
-            if obj.get("StorageClass") in ["GLACIER", "DEEP_ARCHIVE", "GLACIER_IR"]:
-                glacier_objects.append(obj["Key"])
 
-    if not glacier_objects:
-        print(f"No archived objects found in bucket '{BUCKET_NAME}'.")
+def track_restores():
+    """Poll pending restores with a tier-based backoff and print objects as they become readable."""
+    print(f"Tracking restores recorded in '{TRACKER_FILE}'...")
+    for obj in tracker.watch(s3_client, max_workers=RESTORE_WORKERS, on_progress=report_progress):
+        print(f"Available: {obj['Key']} (until {obj['Expiry']})")
+    print("No restores pending.")
+
+
+try:
+    if MODE == "track":
+        track_restores()
     else:
-        print(f"Found {len(glacier_objects)} archived objects. Submitting restore requests...")
-
-        for key in glacier_objects:
-            try:
-                s3_client.restore_object(
-                    Bucket=BUCKET_NAME,
-                    Key=key,
-                    RestoreRequest={
-                        "Days": RESTORE_DAYS,
-                        "GlacierJobParameters": {"Tier": RESTORE_TIER}
-                    }
-                )
-                print(f"Restore request submitted for: {key}")
-            except ClientError as e:
-                print(f"Failed to submit restore for {key}: {e}")
+        # ----- Stream archived objects (GLACIER_IR needs no restore) -----
+        journal = None
+        if CHECKPOINT_FILE:
+            # Submitted batches are journaled in key order so --resume can skip them
+            journal = CheckpointJournal(CHECKPOINT_FILE, f"glacier-restore:{BUCKET_NAME}", resume=RESUME)
+            if journal.resumed:
+                print(f"Resuming after '{journal.watermark}' ({journal.totals()[0]} objects handled by earlier runs)")
+            listing = iter_objects_sorted(s3_client, BUCKET_NAME, PREFIX, start_after=journal.watermark,
+                                          prefetch_pages=16, **LIST_ATTRIBUTES)
+        else:
+            listing = iter_objects(s3_client, BUCKET_NAME, PREFIX, max_workers=LIST_WORKERS, **LIST_ATTRIBUTES)
+
+        # Restore requests start while the listing is still running
+        archived = archived_objects(listing, MIN_SIZE_BYTES, parse_date(MODIFIED_AFTER), parse_date(MODIFIED_BEFORE))
+        result = restore_objects(
+            s3_client, BUCKET_NAME, archived,
+            days=RESTORE_DAYS, tier=RESTORE_TIER, max_workers=RESTORE_WORKERS,
+            on_result=report_restore, journal=journal
+        )
+
+        handled = result[SUBMITTED] + result[RESTORED] + result[IN_PROGRESS] + result[FAILED]
+        if not handled:
+            print(f"No archived objects found in bucket '{BUCKET_NAME}'.")
+        else:
+            rate = result["requests"] / result["elapsed"] if result["elapsed"] else 0
+            print(f"\nArchived objects: {handled}")
+            print(f"Restore requests submitted: {result[SUBMITTED]} ({result['bytes'] / 1024 ** 3:.2f} GB)")
+            print(f"Already restored: {result[RESTORED]}, restore in progress: {result[IN_PROGRESS]}")
+            print(f"Failed submissions: {result[FAILED]}")
+            print(f"Elapsed: {result['elapsed']:.1f}s ({rate:.0f} requests/s)")
+            print("Run with MODE = \"track\" to follow the restores until they are readable.")
 
 except NoCredentialsError:
     print("AWS credentials not found or invalid.")
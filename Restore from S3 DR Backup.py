@@ -7,59 +7,65 @@ Purpose:
     to the primary or recovery bucket.
 
 Performs:
-    ✅ Lists all objects in the source (DR) bucket
-    ✅ Validates object counts before restore
-    ✅ Copies all objects to the target bucket
-    ✅ Verifies checksums to ensure integrity
+    ✅ Streams both bucket listings in key order and diffs them
+    ✅ Copies only missing or changed objects to the target bucket
+    ✅ Verifies each copy from the ETag the copy returned (checksums for multipart objects)
+    ✅ Journals progress so an interrupted restore can --resume
+    ✅ Keeps memory flat with bounded queues between the stages
 
 IAM Permissions Required:
     - s3:ListBucket
     - s3:GetObject
     - s3:CopyObject
     - s3:PutObject
+    - s3:GetObjectAttributes
 """
 
-import boto3
-import hashlib
 import sys
 from botocore.exceptions import ClientError
 
+from cookbook.checkpoint import CheckpointJournal, resume_requested
+from cookbook.clients import get_client
+from cookbook.s3_copy import MB
+from cookbook.s3_restore import FAILED, restore_bucket
+from cookbook.s3_sync import COPY, DELETE, SAME, UPDATE
+from cookbook.s3_verify import MISMATCH, UNVERIFIABLE, VERIFIED
+
 # ======== Hardcoded credentials (for demo/testing only — avoid in production) ========
 AWS_ACCESS_KEY = ""
 AWS_SECRET_KEY = ""
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = "us-west-2"
 
 # ======== Inputs ========
 SOURCE_BUCKET = ""
 TARGET_BUCKET = ""
+COPY_WORKERS = 16  # Objects copied in parallel
+PART_WORKERS = 16  # UploadPartCopy parts copied in parallel
+VERIFY_WORKERS = 8  # Multipart copies checked with GetObjectAttributes in parallel
+MULTIPART_THRESHOLD_MB = 5120  # Larger objects are copied in parts (CopyObject caps at 5 GB)
+PART_SIZE_MB = 128
+VERIFY_REPORT = "./dr_restore_mismatches.jsonl"  # Machine-readable mismatch report
+CHECKPOINT_FILE = "./dr_restore.checkpoint.db"  # Progress journal ("" disables it)
+RESUME = resume_requested(sys.argv)  # Run with --resume to continue an interrupted restore
 
 # ======== Initialize Clients ========
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=AWS_REGION,
-)
-
-def list_bucket_objects(bucket_name):
-    """Return a list of all objects in the specified bucket."""
-    objects = []
-    paginator = s3_client.get_paginator("list_objects_v2")
-
-    for page in paginator.paginate(Bucket=bucket_name):
-        for obj in page.get("Contents", []):
-            objects.append(obj["Key"])
-    return objects
+s3_client = get_client("s3", AWS_REGION, max_pool_connections=COPY_WORKERS + PART_WORKERS + VERIFY_WORKERS + 2,
+                       access_key=AWS_ACCESS_KEY, secret_key=AWS_SECRET_KEY,
+                       profile=AWS_PROFILE, role_arn=ROLE_ARN)
 
-
-def calculate_s3_etag(bucket, key):
-    """Fetch the ETag of an object (acts as checksum for single-part uploads)."""
-    response = s3_client.head_object(Bucket=bucket, Key=key)
-    return response.get("ETag").strip('"')
+def report_result(key, status, reason):
+    if status == VERIFIED:
+        print(f"🔄 Copied: {key}" if reason.startswith("copy") else f"✔️  Already restored: {key}")
+    elif status == FAILED:
+        print(f"❌ Failed to copy {key}: {reason}")
+    else:
+        print(f"⚠️  {key}: {status} ({reason})")
 
 
 def restore_objects(source_bucket, target_bucket):
-    """Copy all objects from source to target bucket with validation."""
+    """Stream missing or changed objects from the source to the target bucket, verifying each copy."""
     print("===============================================================")
     print("☁️  AWS S3 DR Restore Script")
     print("===============================================================")
@@ -67,41 +73,44 @@ def restore_objects(source_bucket, target_bucket):
     print(f"🔹 Target Bucket: {target_bucket}\n")
 
     try:
-        source_objects = list_bucket_objects(source_bucket)
-        target_objects = list_bucket_objects(target_bucket)
-
-        print(f"📦 Objects in source: {len(source_objects)}")
-        print(f"📦 Objects in target (before copy): {len(target_objects)}")
-
-        if not source_objects:
+        if not s3_client.list_objects_v2(Bucket=source_bucket, MaxKeys=1).get("KeyCount"):
             print("⚠️  No objects found in source bucket. Exiting.")
             return
 
-        # Copy missing or outdated objects
-        for obj_key in source_objects:
-            print(f"🔄 Copying: {obj_key}")
-            copy_source = {"Bucket": source_bucket, "Key": obj_key}
-
-            s3_client.copy_object(
-                CopySource=copy_source,
-                Bucket=target_bucket,
-                Key=obj_key
-            )
-
-        print("\n✅ Copy operation completed. Verifying integrity...\n")
-
-        # Verify checksum/ETag integrity
-        mismatches = []
-        for obj_key in source_objects:
-            src_etag = calculate_s3_etag(source_bucket, obj_key)
-            tgt_etag = calculate_s3_etag(target_bucket, obj_key)
-            if src_etag != tgt_etag:
-                mismatches.append(obj_key)
-
-        if mismatches:
-            print("❌ Checksum mismatches found for the following objects:")
-            for key in mismatches:
-                print(f"   - {key}")
+        journal = None
+        if CHECKPOINT_FILE:
+            # Listings are diffed in key order, so the journal watermark works as StartAfter
+            journal = CheckpointJournal(CHECKPOINT_FILE, f"dr-restore:{source_bucket}->{target_bucket}",
+                                        resume=RESUME)
+            if journal.resumed:
+                print(f"⏩ Resuming after '{journal.watermark}': {journal.totals()[0]} objects handled by "
+                      f"earlier runs; failed copies are retried")
+
+        # List -> diff -> copy (large objects as parallel part copies) -> verify, as one stream
+        result = restore_bucket(
+            s3_client, source_bucket, target_bucket,
+            max_workers=COPY_WORKERS,
+            part_workers=PART_WORKERS,
+            verify_workers=VERIFY_WORKERS,
+            multipart_threshold=MULTIPART_THRESHOLD_MB * MB,
+            part_size=PART_SIZE_MB * MB,
+            report_path=VERIFY_REPORT,
+            journal=journal,
+            on_result=report_result
+        )
+
+        print(f"\n📦 Objects in source: {result[COPY] + result[UPDATE] + result[SAME]} "
+              f"({result[COPY]} missing, {result[UPDATE]} changed, {result[SAME]} already restored)")
+        print(f"📦 Extra objects in target (kept): {result[DELETE]}")
+        print(f"📊 Copied {result['copied']} objects, {result['bytes'] / MB:.1f} MB in {result['elapsed']:.1f}s")
+        print(f"🔍 {result[VERIFIED]} verified, {result[MISMATCH]} mismatched, "
+              f"{result[UNVERIFIABLE]} unverifiable, {result[FAILED]} failed to copy")
+
+        if result[MISMATCH] or result[UNVERIFIABLE] or result[FAILED]:
+            print("❌ Problems found for the following objects:")
+            for entry in result["sample"]:
+                print(f"   - {entry['key']} ({entry['status']}: {entry['reason']})")
+            print(f"   Full report: {VERIFY_REPORT}")
         else:
             print("✅ All objects restored successfully and verified.\n")
 
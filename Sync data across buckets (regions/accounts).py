@@ -6,57 +6,104 @@ Copies all objects from a source bucket to a destination bucket.
 Throws exceptions if credentials are missing, buckets are missing, or AWS API errors occur.
 """
 
-import boto3
+import sys
 from botocore.exceptions import ClientError, NoCredentialsError
 
+from cookbook.checkpoint import CheckpointJournal, resume_requested
+from cookbook.clients import get_client
+from cookbook.s3_copy import MB, copy_objects
+from cookbook.s3_delete import MAX_KEYS_PER_REQUEST, delete_batch
+from cookbook.s3_sync import COPY, DELETE, SAME, UPDATE, diff_buckets
+
 # --- AWS credentials and inputs ---
 AWS_ACCESS_KEY = ""    # Replace with valid key
 AWS_SECRET_KEY = ""    # Replace with valid secret
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 SRC_BUCKET = "test-timescaledb-1"
 DEST_BUCKET = "test-timescaledb-2"
 REGION = "us-west-2"
-
-if not AWS_ACCESS_KEY or not AWS_SECRET_KEY:
-    raise ValueError("AWS credentials are missing! Set AWS_ACCESS_KEY and AWS_SECRET_KEY.")
+DELETE_EXTRA = False  # Remove destination keys that are not in the source
+COPY_WORKERS = 16  # Objects copied in parallel
+PART_WORKERS = 16  # UploadPartCopy parts copied in parallel
+MULTIPART_THRESHOLD_MB = 5120  # Larger objects are copied in parts (CopyObject caps at 5 GB; smaller keep their ETag)
+PART_SIZE_MB = 128
+CHECKPOINT_FILE = "./sync.checkpoint.db"  # Progress journal ("" disables it)
+RESUME = resume_requested(sys.argv)  # Run with --resume to continue an interrupted sync
 
 # --- Create S3 client ---
 try:
-    s3 = boto3.client(
-        's3',
-        region_name=REGION,
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY
-    )
+    s3 = get_client("s3", REGION, max_pool_connections=COPY_WORKERS + PART_WORKERS,
+                    access_key=AWS_ACCESS_KEY, secret_key=AWS_SECRET_KEY,
+                    profile=AWS_PROFILE, role_arn=ROLE_ARN)
 except Exception as e:
     raise RuntimeError(f"Failed to create S3 client: {e}")
 
+def report_copy(obj, etag, error):
+    if error is None:
+        print(f"Copied {obj['Key']} to {DEST_BUCKET}")
+
+
+def delete_extras(extras):
+    """Remove destination keys that no longer exist in the source."""
+    errors = delete_batch(s3, DEST_BUCKET, extras)
+    if errors:
+        raise RuntimeError(f"Failed to delete {len(errors)} extra objects, e.g. {errors[0]}")
+
+
 try:
-    # List objects in source bucket
-    src_objects = s3.list_objects_v2(Bucket=SRC_BUCKET)
-    if 'Contents' not in src_objects:
+    # Refuse to sync (and possibly delete extras) from an empty source
+    if not s3.list_objects_v2(Bucket=SRC_BUCKET, MaxKeys=1).get('KeyCount'):
         raise RuntimeError(f"No objects found in source bucket {SRC_BUCKET}")
 
-    src_keys = [obj['Key'] for obj in src_objects['Contents']]
-    print(f"Found {len(src_keys)} objects in source bucket '{SRC_BUCKET}'.")
-
-    # Copy objects to destination bucket
-    for key in src_keys:
-        copy_source = {'Bucket': SRC_BUCKET, 'Key': key}
-        try:
-            s3.copy_object(CopySource=copy_source, Bucket=DEST_BUCKET, Key=key)
-            print(f"Copied {key} to {DEST_BUCKET}")
-        except ClientError as e:
-            raise RuntimeError(f"Failed to copy object {key}: {e}")
-
-    # Verify sync by comparing object counts
-    dest_objects = s3.list_objects_v2(Bucket=DEST_BUCKET)
-    dest_keys = [obj['Key'] for obj in dest_objects.get('Contents', [])]
-    print(f"{len(dest_keys)} objects in destination bucket '{DEST_BUCKET}'.")
-
-    if set(src_keys) == set(dest_keys):
-        print("Sync successful: All objects copied.")
-    else:
-        raise RuntimeError("Object count mismatch: Some objects may not have copied correctly.")
+    counts = {COPY: 0, UPDATE: 0, DELETE: 0, SAME: 0}
+    extras = []
+
+    # Copied batches are journaled so an interrupted sync can skip ahead with --resume
+    journal = None
+    if CHECKPOINT_FILE:
+        journal = CheckpointJournal(CHECKPOINT_FILE, f"sync:{SRC_BUCKET}->{DEST_BUCKET}", resume=RESUME)
+        if journal.resumed:
+            print(f"Resuming after '{journal.watermark}' ({journal.totals()[0]} objects copied by earlier runs)")
+    start_after = journal.watermark if journal else None
+
+    def changed_objects():
+        """Diff fully paginated listings; only new or changed keys are copied."""
+        global extras
+        for action, src_obj, dst_obj in diff_buckets(s3, SRC_BUCKET, DEST_BUCKET, start_after=start_after):
+            counts[action] += 1
+            if action in (COPY, UPDATE):
+                yield src_obj
+            elif action == DELETE and DELETE_EXTRA:
+                extras.append(dst_obj)
+                if len(extras) == MAX_KEYS_PER_REQUEST:
+                    delete_extras(extras)
+                    extras = []
+
+    result = copy_objects(
+        s3, SRC_BUCKET, DEST_BUCKET, changed_objects(),
+        max_workers=COPY_WORKERS,
+        part_workers=PART_WORKERS,
+        multipart_threshold=MULTIPART_THRESHOLD_MB * MB,
+        part_size=PART_SIZE_MB * MB,
+        on_result=report_copy,
+        journal=journal
+    )
+    if result["errors"]:
+        first = result["errors"][0]
+        raise RuntimeError(f"Failed to copy {len(result['errors'])} objects, e.g. {first['Key']}: {first['Error']}")
+    if extras:
+        delete_extras(extras)
+
+    src_count = counts[COPY] + counts[UPDATE] + counts[SAME]
+    print(f"Found {src_count} objects in source bucket '{SRC_BUCKET}'.")
+    print(f"Copied {counts[COPY]} new and {counts[UPDATE]} changed objects, skipped {counts[SAME]} unchanged.")
+    print(f"Copy throughput: {result['bytes_per_second'] / MB:.1f} MB/s over {result['elapsed']:.1f}s")
+
+    if counts[DELETE]:
+        state = "deleted" if DELETE_EXTRA else "kept"
+        print(f"{counts[DELETE]} extra objects in destination bucket '{DEST_BUCKET}' were {state}.")
+    print("Sync successful: All objects copied.")
 
 except NoCredentialsError:
     raise RuntimeError("AWS credentials not found or invalid.")
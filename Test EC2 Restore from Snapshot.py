@@ -1,11 +1,18 @@
-import boto3
-import time
+import csv
+import statistics
+import sys
+
+from cookbook.clients import get_client
+from cookbook.ebs import (ATTACHED, disable_fast_snapshot_restores, enable_fast_snapshot_restores,
+                          restore_snapshots, teardown, verify_snapshot, volume_args)
 
 # -----------------------------
 # AWS Credentials (hardcoded)
 # -----------------------------
 aws_access_key = ""
 aws_secret_key = ""
+aws_profile = ""  # Used when the keys are empty (else the default credential chain)
+role_arn = ""  # Optional IAM role to assume
 region = "us-west-2"
 
 # -----------------------------
@@ -14,6 +21,7 @@ region = "us-west-2"
 vpc_id = ""
 subnet_id = ""
 snapshot_id = ""
+snapshot_ids = [snapshot_id]  # Snapshots restored concurrently; list as many as needed
 ami_id = ""        # Bootable AMI
 instance_type = "t3.micro"
 security_group_ids = [""]
@@ -21,88 +29,138 @@ key_name = ""
 mount_point = "/mnt/snapshot"
 device_name = "/dev/sdf"
 
+# -----------------------------
+# Restore test settings
+# -----------------------------
+volume_type = "gp3"
+volume_iops = 3000        # gp3/io1/io2 provisioned IOPS (None = volume type default)
+volume_throughput = 125   # gp3 throughput in MiB/s (None = default)
+fast_snapshot_restore = False  # Enable FSR in the subnet's AZ for the test, disabled again afterwards
+max_workers = 16          # Concurrent CreateVolume / RunInstances calls
+poll_seconds = 5          # Timing resolution of the batched status polls
+timeout_seconds = 1800    # Give up on a snapshot after this long
+tear_down = True          # Terminate the instances and delete the volumes when done
+results_file = "./snapshot_restore_results.csv"  # Per-snapshot timings ("" to skip)
+
+# -----------------------------
+# Verification mode
+# -----------------------------
+verification = "attach"   # attach: restore onto test instances | direct: checksum blocks via EBS direct APIs
+base_snapshot_id = ""     # direct: only verify blocks changed since this snapshot
+verify_workers = 32       # direct: concurrent GetSnapshotBlock calls
+ebs_endpoint_url = ""     # direct: alternative EBS endpoint, e.g. a local stand-in
+
 # -----------------------------
 # Boto3 clients
 # -----------------------------
-ec2_client = boto3.client(
-    "ec2",
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key,
-    region_name=region
-)
-ec2_resource = boto3.resource(
-    "ec2",
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key,
-    region_name=region
-)
+credentials = dict(access_key=aws_access_key, secret_key=aws_secret_key, profile=aws_profile, role_arn=role_arn)
+ec2_client = get_client("ec2", region, max_pool_connections=max_workers, **credentials)
 
-try:
-    # Step 1: Create EBS volume from snapshot
-    print(f"Creating EBS volume from snapshot {snapshot_id} in VPC {vpc_id}...")
-    subnet_info = ec2_client.describe_subnets(SubnetIds=[subnet_id])['Subnets'][0]
-    az = subnet_info['AvailabilityZone']
 
-    volume_response = ec2_client.create_volume(
-        SnapshotId=snapshot_id,
-        AvailabilityZone=az,
-        VolumeType="gp2",
-        TagSpecifications=[{
-            'ResourceType': 'volume',
-            'Tags': [
-                {'Key': 'Name', 'Value': 'Snapshot-Volume'},
-                {'Key': 'VPC', 'Value': vpc_id}
-            ]
-        }]
-    )
-    volume_id = volume_response['VolumeId']
-    print(f"Volume {volume_id} created. Waiting for it to become available...")
-    waiter = ec2_client.get_waiter('volume_available')
-    waiter.wait(VolumeIds=[volume_id])
-    print(f"Volume {volume_id} is ready.")
-
-    # Step 2: Launch EC2 instance from AMI with User Data to mount volume
-    user_data_script = f"""#!/bin/bash
+# -----------------------------
+# Direct mode: no volumes or instances
+# -----------------------------
+def verify_direct():
+    ebs_client = get_client("ebs", region, max_pool_connections=verify_workers,
+                            endpoint_url=ebs_endpoint_url, **credentials)
+    failed = False
+    for sid in snapshot_ids:
+        scope = f"blocks changed since {base_snapshot_id}" if base_snapshot_id else "all blocks"
+        print(f"Verifying {sid} ({scope}) via EBS direct APIs...")
+        result = verify_snapshot(
+            ebs_client, sid, base_snapshot_id or None, max_workers=verify_workers,
+            on_mismatch=lambda index, error: print(f"❌ {sid} block {index}: {error or 'checksum mismatch'}")
+        )
+        rate = result["bytes"] / 1024 ** 3 / result["elapsed"] if result["elapsed"] else 0
+        bad = result["mismatched"] + len(result["errors"])
+        print(f"{'✅' if not bad else '❌'} {sid}: {result['blocks']} blocks, "
+              f"{result['bytes'] / 1024 ** 3:.2f} GB verified in {result['elapsed']:.1f}s ({rate:.2f} GB/s), "
+              f"{result['mismatched']} checksum mismatches, {len(result['errors'])} read errors")
+        failed |= bool(bad)
+    return failed
+
+
+if verification == "direct":
+    sys.exit(1 if verify_direct() else 0)
+
+user_data_script = f"""#!/bin/bash
 mkdir -p {mount_point}
 mount {device_name} {mount_point}
 chmod 777 {mount_point}
 """
 
-    print(f"Launching EC2 instance in VPC {vpc_id}...")
-    instances = ec2_resource.create_instances(
-        ImageId=ami_id,
-        InstanceType=instance_type,
-        KeyName=key_name,
-        MaxCount=1,
-        MinCount=1,
-        NetworkInterfaces=[{
-            'SubnetId': subnet_id,
-            'DeviceIndex': 0,
-            'AssociatePublicIpAddress': True,
-            'Groups': security_group_ids
-        }],
-        UserData=user_data_script,
-        TagSpecifications=[{
-            'ResourceType': 'instance',
-            'Tags': [{'Key': 'Name', 'Value': 'Test-Instance-Snapshot'}]
-        }]
-    )
+launch_args = dict(
+    ImageId=ami_id,
+    InstanceType=instance_type,
+    NetworkInterfaces=[{
+        'SubnetId': subnet_id,
+        'DeviceIndex': 0,
+        'AssociatePublicIpAddress': True,
+        'Groups': security_group_ids
+    }],
+    UserData=user_data_script,
+)
+if key_name:
+    launch_args["KeyName"] = key_name
+
+
+def report_result(record):
+    if record["status"] == ATTACHED:
+        print(f"✅ {record['snapshot_id']}: {record['volume_id']} available in {record['available_seconds']:.0f}s, "
+              f"attached to {record['instance_id']} in {record['attached_seconds']:.0f}s"
+              f"{' (fast restored)' if record['fast_restored'] else ''}")
+    else:
+        print(f"❌ {record['snapshot_id']}: {record['error']}")
+
+
+def summarize(label, values):
+    if values:
+        p95 = statistics.quantiles(values, n=20)[-1] if len(values) > 1 else values[0]
+        print(f"{label}: p50 {statistics.median(values):.0f}s, p95 {p95:.0f}s, max {max(values):.0f}s")
 
-    instance = instances[0]
-    instance.wait_until_running()
-    instance.reload()
-    print(f"Instance {instance.id} running at IP: {instance.public_ip_address}")
-
-    # Step 3: Attach snapshot volume as secondary
-    print(f"Attaching volume {volume_id} to instance {instance.id} as {device_name}...")
-    ec2_client.attach_volume(
-        VolumeId=volume_id,
-        InstanceId=instance.id,
-        Device=device_name
+
+records = []
+fsr_enabled = []
+try:
+    subnet_info = ec2_client.describe_subnets(SubnetIds=[subnet_id])['Subnets'][0]
+    az = subnet_info['AvailabilityZone']
+
+    if fast_snapshot_restore:
+        print(f"Enabling fast snapshot restore for {len(snapshot_ids)} snapshots in {az}...")
+        # fsr_enabled is filled as requests are accepted, so FSR is disabled again even if the wait fails
+        enable_fast_snapshot_restores(ec2_client, snapshot_ids, az, enabled=fsr_enabled)
+
+    # Step 1-3: Create volumes, launch instances and attach, all snapshots at once
+    print(f"Restoring {len(snapshot_ids)} snapshots in VPC {vpc_id} ({az}) as {volume_type} volumes...")
+    # records is filled as resources are created, so teardown still sees them if this fails
+    restore_snapshots(
+        ec2_client, snapshot_ids, az, launch_args,
+        device_name=device_name,
+        volume_options=volume_args(volume_type, volume_iops, volume_throughput),
+        tags=[{'Key': 'Name', 'Value': 'Snapshot-Restore-Test'}, {'Key': 'VPC', 'Value': vpc_id}],
+        max_workers=max_workers, poll_interval=poll_seconds, timeout=timeout_seconds,
+        on_result=report_result, records=records,
     )
 
-    print("✅ Volume attached successfully and will mount automatically at boot.")
-    print(f"SSH: ssh -i {key_name} ec2-user@{instance.public_ip_address}")
+    attached = [r for r in records if r["status"] == ATTACHED]
+    print(f"\n{len(attached)} of {len(records)} snapshots restored and attached.")
+    summarize("Time to available", [r["available_seconds"] for r in attached])
+    summarize("Time to attached", [r["attached_seconds"] for r in attached])
+
+    if results_file:
+        with open(results_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+        print(f"Per-snapshot timings written to {results_file}")
 
 except Exception as e:
     print("❌ Error occurred:", e)
+
+finally:
+    if tear_down and records:
+        instances, volumes = teardown(ec2_client, records, poll_interval=poll_seconds)
+        print(f"Teardown: {instances} instances terminated, {volumes} volumes deleted.")
+    if fsr_enabled:
+        disable_fast_snapshot_restores(ec2_client, fsr_enabled, az)
+        print(f"Fast snapshot restore disabled for {len(fsr_enabled)} snapshots.")
@@ -4,20 +4,26 @@ Route53 DNS Failover Script
 
 ✅ Checks the primary record health using HealthCheckId
 ✅ If primary health check fails, promotes secondary record
-✅ Uses hardcoded AWS credentials and environment configs
+✅ DAEMON_MODE stays resident: fails over after consecutive failures, fails back after recoveries
+✅ INVENTORY_FILE fails over a whole JSON record inventory, one chunked batch per hosted zone
+✅ Uses hardcoded AWS credentials, a profile/role or the default credential chain
 """
 
-import boto3
 import logging
 import sys
 from botocore.exceptions import ClientError, NoCredentialsError
 
+from cookbook.clients import get_client
+from cookbook.route53 import failover_records, fleet_failover, load_inventory, watch_failover
+
 # =============================
 # 🔧 Hardcoded Configuration
 # =============================
 AWS_ACCESS_KEY = ""
 AWS_SECRET_KEY = ""
 AWS_SESSION_TOKEN = None  # Optional, leave None for IAM user
+AWS_PROFILE = ""  # Named profile used when the keys are empty (else the default credential chain)
+ROLE_ARN = ""  # Optional IAM role to assume, e.g. in another account
 AWS_REGION = ""
 
 HOSTED_ZONE_ID = ""
@@ -30,6 +36,18 @@ PRIMARY_HEALTH_CHECK_ID = "c136e72f-472e-4b71-890c-b95b57583097"
 TTL = 60
 LOG_FILE = "./route53_failover.log"
 
+# Daemon mode: poll the health check with a warm client instead of running once
+DAEMON_MODE = False
+CHECK_INTERVAL = 10      # Seconds between health check polls
+FAILURE_THRESHOLD = 3    # Consecutive failed checks before failing over
+RECOVERY_THRESHOLD = 5   # Consecutive healthy checks before failing back
+FAILBACK = True          # Restore the primary automatically once it recovers
+
+# Fleet mode: JSON list of {zone_id, name, type, ttl, primary, secondary, health_check_id}
+INVENTORY_FILE = ""      # Set to fail over every record in the inventory instead of RECORD_NAME
+FORCE_FAILOVER = False   # Skip health checks and fail over every inventory record
+FLEET_WORKERS = 16       # Concurrent health checks / hosted zones
+
 # =============================
 # 🪵 Logging Setup
 # =============================
@@ -43,12 +61,14 @@ logging.basicConfig(
 # 🧠 AWS Client
 # =============================
 try:
-    route53 = boto3.client(
+    route53 = get_client(
         "route53",
-        region_name=AWS_REGION,
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        aws_session_token=AWS_SESSION_TOKEN
+        AWS_REGION,
+        access_key=AWS_ACCESS_KEY,
+        secret_key=AWS_SECRET_KEY,
+        session_token=AWS_SESSION_TOKEN,
+        profile=AWS_PROFILE,
+        role_arn=ROLE_ARN
     )
 except (NoCredentialsError, ClientError) as e:
     logging.error(f"Failed to create Route53 client: {e}")
@@ -90,35 +110,17 @@ def is_primary_healthy(health_check_id):
 def switch_to_secondary():
     logging.warning("⚠️ Primary DNS is unhealthy. Switching to secondary IP...")
 
+    primary, secondary = failover_records(
+        RECORD_NAME, RECORD_TYPE, TTL, PRIMARY_IP, SECONDARY_IP, PRIMARY_HEALTH_CHECK_ID
+    )
     try:
         route53.change_resource_record_sets(
             HostedZoneId=HOSTED_ZONE_ID,
             ChangeBatch={
                 "Comment": "Failover triggered: switching to secondary",
                 "Changes": [
-                    {
-                        "Action": "UPSERT",
-                        "ResourceRecordSet": {
-                            "Name": RECORD_NAME,
-                            "Type": RECORD_TYPE,
-                            "SetIdentifier": "primary",
-                            "Failover": "PRIMARY",
-                            "TTL": TTL,
-                            "ResourceRecords": [{"Value": PRIMARY_IP}],
-                            "HealthCheckId": PRIMARY_HEALTH_CHECK_ID
-                        }
-                    },
-                    {
-                        "Action": "UPSERT",
-                        "ResourceRecordSet": {
-                            "Name": RECORD_NAME,
-                            "Type": RECORD_TYPE,
-                            "SetIdentifier": "secondary",
-                            "Failover": "SECONDARY",
-                            "TTL": TTL,
-                            "ResourceRecords": [{"Value": SECONDARY_IP}]
-                        }
-                    }
+                    {"Action": "UPSERT", "ResourceRecordSet": primary},
+                    {"Action": "UPSERT", "ResourceRecordSet": secondary}
                 ]
             }
         )
@@ -130,10 +132,70 @@ def switch_to_secondary():
         logging.error(f"❌ Failed to update DNS records: {e}")
         sys.exit(1)
 
+# =============================
+# 🔁 Daemon: Hysteresis, Failback and INSYNC Latency
+# =============================
+def run_daemon():
+    primary, secondary = failover_records(
+        RECORD_NAME, RECORD_TYPE, TTL, PRIMARY_IP, SECONDARY_IP, PRIMARY_HEALTH_CHECK_ID
+    )
+    events = watch_failover(
+        route53, HOSTED_ZONE_ID, primary, secondary, PRIMARY_HEALTH_CHECK_ID,
+        interval=CHECK_INTERVAL, failures=FAILURE_THRESHOLD, recoveries=RECOVERY_THRESHOLD, failback=FAILBACK
+    )
+    try:
+        for event in events:
+            if event["propagation_seconds"] is None:
+                logging.error(f"❌ {event['action'].capitalize()} of {RECORD_NAME} submitted "
+                              f"({event['change_id']}) but not INSYNC before the timeout")
+            else:
+                logging.warning(f"✅ {event['action'].capitalize()} of {RECORD_NAME} INSYNC: "
+                                f"detected in {event['detection_seconds']:.1f}s, "
+                                f"propagated in {event['propagation_seconds']:.1f}s")
+    except KeyboardInterrupt:
+        logging.info("Failover daemon stopped.")
+
+# =============================
+# 🌐 Fleet Failover from an Inventory
+# =============================
+def report_zone(result):
+    logging.info(f"Zone {result['zone_id']}: {result['records']} records in {len(result['changes'])} change batches, "
+                 f"{result['insync']} INSYNC, {result['already']} already on secondary, "
+                 f"{result['failed']} records not submitted")
+    for zone_id, error in result["errors"]:
+        logging.error(f"❌ Zone {zone_id}: {error}")
+
+
+def run_fleet_failover():
+    inventory = load_inventory(INVENTORY_FILE)
+    logging.info(f"🔍 Checking {len(inventory)} records from {INVENTORY_FILE}"
+                 f"{' (forced failover)' if FORCE_FAILOVER else ''}...")
+    result = fleet_failover(route53, inventory, max_workers=FLEET_WORKERS, force=FORCE_FAILOVER, on_zone=report_zone)
+    if result["unknown"]:
+        logging.warning(f"⚠️ {result['unknown']} records skipped: health check status unavailable")
+    if result["already"]:
+        logging.info(f"{result['already']} records already serve their secondary values")
+    if not result["failed_over"] and not result["failed"]:
+        healthy = "" if result["already"] else "All primaries are healthy. "
+        logging.info(f"✅ {healthy}No action required.")
+        return
+    logging.info(f"Failed over {result['failed_over']} records across {result['zones']} zones: "
+                 f"{result['insync']}/{result['changes']} changes INSYNC in {result['elapsed']:.1f}s")
+    if result["failed"]:
+        logging.error(f"❌ {result['failed']} records NOT failed over: their change batches were rejected")
+    if result["errors"] or result["insync"] < result["changes"]:
+        sys.exit(1)
+
 # =============================
 # 🚀 Main Logic
 # =============================
 def main():
+    if INVENTORY_FILE:
+        run_fleet_failover()
+        return
+    if DAEMON_MODE:
+        run_daemon()
+        return
     logging.info("🔍 Checking primary DNS health...")
     if is_primary_healthy(PRIMARY_HEALTH_CHECK_ID):
         logging.info("✅ Primary is healthy. No action required.")
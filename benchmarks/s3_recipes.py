@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+S3 Recipe Benchmarks
+Runs the delete, size-report, Glacier-restore, sync and DR-restore flows
+against a local S3 stand-in and records, for each recipe and bucket size,
+objects per second, API calls per object, peak RSS and wall time.
+
+Each run seeds fresh synthetic buckets (mixed object sizes and storage
+classes, spread over a two-level prefix tree), then runs the recipe in its
+own subprocess so peak RSS belongs to that run alone. Seeding is not timed.
+Results are appended to RESULTS_FILE as JSON Lines, one record per run, so
+runs can be compared across commits.
+
+By default an in-process moto server is started and reset between runs;
+set S3_ENDPOINT_URL to use another endpoint (MinIO, LocalStack, a running
+moto server). Note that moto keeps every object in memory and its LIST cost
+grows with the bucket, so the 1M-key size needs several GB and a long run.
+
+    BENCH_SIZES=10000 BENCH_RECIPES=size,delete python benchmarks/s3_recipes.py
+"""
+
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cookbook.clients import get_client  # noqa: E402
+from cookbook.instrumentation import metrics  # noqa: E402
+from cookbook.s3_copy import copy_objects  # noqa: E402
+from cookbook.s3_delete import delete_objects_batched  # noqa: E402
+from cookbook.s3_glacier import LIST_ATTRIBUTES, archived_objects, restore_objects  # noqa: E402
+from cookbook.s3_listing import iter_objects  # noqa: E402
+from cookbook.s3_restore import FAILED, restore_bucket  # noqa: E402
+from cookbook.s3_sync import COPY, UPDATE, diff_buckets  # noqa: E402
+from cookbook.s3_verify import MISMATCH, UNVERIFIABLE, VERIFIED  # noqa: E402
+
+# ----- Benchmark configuration -----
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")  # Empty starts a local moto server
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "10000,100000,1000000").split(",")]
+RECIPES = os.getenv("BENCH_RECIPES", "size,delete,glacier,sync,dr-restore").split(",")
+WORKERS = int(os.getenv("BENCH_WORKERS", 16))  # Worker count handed to every recipe
+SEED_WORKERS = int(os.getenv("SEED_WORKERS", 64))  # Concurrent PutObject calls while seeding
+RESULTS_FILE = os.getenv("RESULTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "results.jsonl"))
+
+# Object size mix in bytes, as (size, weight out of 100)
+OBJECT_SIZES = [(0, 5), (256, 45), (1024, 30), (4096, 15), (32768, 5)]
+
+# Storage classes cycled through the keys; archived classes only where the recipe expects them
+STANDARD_CLASSES = ["STANDARD", "STANDARD", "STANDARD_IA", "ONEZONE_IA", "INTELLIGENT_TIERING", "GLACIER_IR"]
+ARCHIVE_CLASSES = ["STANDARD", "STANDARD_IA", "GLACIER", "GLACIER", "DEEP_ARCHIVE"]
+
+# Sync destinations hold the first half of the source keys, every 10th with
+# different content, plus 2% keys that only exist in the destination
+SYNC_PRESENT = 0.5
+SYNC_CHANGED_EVERY = 10
+SYNC_EXTRA = 0.02
+
+
+def object_key(i):
+    # 16 top-level prefixes, each with a new sub-prefix every 4096 keys
+    return f"{i % 16:02x}/batch-{i // 4096:04d}/obj-{i:08d}.dat"
+
+
+def object_spec(i, storage_classes):
+    """(size, storage class) for key i, fixed across runs."""
+    h = zlib.crc32(str(i).encode())
+    pick = h % 100
+    for size, weight in OBJECT_SIZES:
+        if pick < weight:
+            break
+        pick -= weight
+    return size, storage_classes[(h >> 8) % len(storage_classes)]
+
+
+def create_bucket(s3, bucket):
+    if AWS_REGION == "us-east-1":
+        s3.create_bucket(Bucket=bucket)
+    else:
+        s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={"LocationConstraint": AWS_REGION})
+
+
+def seed_bucket(s3, bucket, start, stop, storage_classes, changed_every=0):
+    """PutObject keys start..stop-1; with `changed_every`, every nth body is one byte longer."""
+    def put_range(first, last):
+        for i in range(first, last):
+            size, storage_class = object_spec(i, storage_classes)
+            if changed_every and i % changed_every == 0:
+                size += 1
+            s3.put_object(Bucket=bucket, Key=object_key(i), Body=b"x" * size, StorageClass=storage_class)
+
+    step = max(1, (stop - start) // (SEED_WORKERS * 4))
+    with ThreadPoolExecutor(max_workers=SEED_WORKERS) as pool:
+        list(pool.map(lambda first: put_range(first, min(first + step, stop)), range(start, stop, step)))
+
+
+def prepare(s3, recipe, size):
+    """Create and seed the buckets one run needs; returns {role: bucket}."""
+    source = f"bench-{recipe}-{size}"
+    buckets = {"source": source}
+    create_bucket(s3, source)
+    seed_bucket(s3, source, 0, size, ARCHIVE_CLASSES if recipe == "glacier" else STANDARD_CLASSES)
+    if recipe in ("sync", "dr-restore"):
+        buckets["target"] = f"{source}-target"
+        create_bucket(s3, buckets["target"])
+    if recipe == "sync":
+        present = int(size * SYNC_PRESENT)
+        seed_bucket(s3, buckets["target"], 0, present, STANDARD_CLASSES, changed_every=SYNC_CHANGED_EVERY)
+        seed_bucket(s3, buckets["target"], size, size + int(size * SYNC_EXTRA), STANDARD_CLASSES)
+    return buckets
+
+
+def cleanup(s3, buckets, moto_reset_url=None):
+    """Drop the run's buckets: a moto reset when we own the server, else delete everything."""
+    if moto_reset_url:
+        urllib.request.urlopen(urllib.request.Request(moto_reset_url, method="POST")).read()
+        return
+    for bucket in buckets.values():
+        delete_objects_batched(s3, bucket, iter_objects(s3, bucket, max_workers=WORKERS), max_workers=WORKERS)
+        s3.delete_bucket(Bucket=bucket)
+
+
+# ======== Recipes (run in the child process) ========
+# Each returns (objects handled, details) and drives the same engines as the recipe scripts
+
+def run_size(s3, buckets):
+    objects = total = 0
+    for obj in iter_objects(s3, buckets["source"], max_workers=WORKERS):
+        objects += 1
+        total += obj["Size"]
+    return objects, {"bytes": total}
+
+
+def run_delete(s3, buckets):
+    listing = iter_objects(s3, buckets["source"], max_workers=WORKERS)
+    result = delete_objects_batched(s3, buckets["source"], listing, max_workers=WORKERS)
+    return result["deleted"], {"bytes": result["bytes"], "batches": result["batches"],
+                               "errors": len(result["errors"])}
+
+
+def run_glacier(s3, buckets):
+    listed = 0
+
+    def counted(listing):
+        nonlocal listed
+        for obj in listing:
+            listed += 1
+            yield obj
+
+    listing = counted(iter_objects(s3, buckets["source"], max_workers=WORKERS, **LIST_ATTRIBUTES))
+    result = restore_objects(s3, buckets["source"], archived_objects(listing), days=1, tier="Bulk",
+                             max_workers=WORKERS * 2)
+    details = {k: v for k, v in result.items() if k != "errors"}
+    details["errors"] = len(result["errors"])
+    return listed, details
+
+
+def run_sync(s3, buckets):
+    compared = 0
+
+    def changed_objects():
+        nonlocal compared
+        for action, src_obj, _ in diff_buckets(s3, buckets["source"], buckets["target"]):
+            compared += 1
+            if action in (COPY, UPDATE):
+                yield src_obj
+
+    result = copy_objects(s3, buckets["source"], buckets["target"], changed_objects(), max_workers=WORKERS)
+    return compared, {"copied": result["copied"], "bytes": result["bytes"], "errors": len(result["errors"])}
+
+
+def run_dr_restore(s3, buckets):
+    result = restore_bucket(s3, buckets["source"], buckets["target"], max_workers=WORKERS)
+    return result["copied"], {"bytes": result["bytes"], "failed": result[FAILED], "verified": result[VERIFIED],
+                              "mismatch": result[MISMATCH], "unverifiable": result[UNVERIFIABLE]}
+
+
+RECIPE_RUNNERS = {
+    "size": run_size,
+    "delete": run_delete,
+    "glacier": run_glacier,
+    "sync": run_sync,
+    "dr-restore": run_dr_restore,
+}
+
+
+def make_client(endpoint_url):
+    return get_client("s3", AWS_REGION, max_pool_connections=WORKERS * 4, endpoint_url=endpoint_url,
+                      access_key=os.getenv("AWS_ACCESS_KEY_ID"), secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"))
+
+
+def child(spec):
+    """Run one recipe and print its measurements as a single JSON line."""
+    s3 = make_client(spec["endpoint_url"])
+    metrics.reset()
+
+    start = time.monotonic()
+    objects, details = RECIPE_RUNNERS[spec["recipe"]](s3, spec["buckets"])
+    elapsed = time.monotonic() - start
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    summary = metrics.summary()
+    print(json.dumps({"objects": objects, "elapsed": elapsed, "api_calls": summary["totals"]["calls"],
+                      "retries": summary["totals"]["retries"], "throttles": summary["totals"]["throttles"],
+                      "calls_by_operation": {op["operation"]: op["calls"] for op in summary["operations"]},
+                      "peak_rss_mb": round(peak_mb, 1), "details": details}))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_one(s3, endpoint_url, recipe, size, moto_reset_url):
+    """Seed, run one recipe in a subprocess, clean up; returns the result record."""
+    record = {"recipe": recipe, "keys": size, "workers": WORKERS}
+    start = time.monotonic()
+    buckets = prepare(s3, recipe, size)
+    record["seed_seconds"] = round(time.monotonic() - start, 2)
+    try:
+        spec = {"recipe": recipe, "buckets": buckets, "endpoint_url": endpoint_url}
+        start = time.monotonic()
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                              capture_output=True, text=True)
+        record["wall_seconds"] = round(time.monotonic() - start, 3)
+        if proc.returncode != 0:
+            record["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode
+            return record
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        cleanup(s3, buckets, moto_reset_url)
+
+    objects, elapsed = result["objects"], result["elapsed"]
+    record.update(
+        objects=objects,
+        elapsed_seconds=round(elapsed, 3),
+        objects_per_second=round(objects / elapsed, 1) if elapsed else None,
+        api_calls=result["api_calls"],
+        calls_per_object=round(result["api_calls"] / objects, 4) if objects else None,
+        retries=result["retries"],
+        throttles=result["throttles"],
+        peak_rss_mb=result["peak_rss_mb"],
+        calls_by_operation=result["calls_by_operation"],
+        details=result["details"],
+    )
+    return record
+
+
+def main():
+    unknown = [r for r in RECIPES if r not in RECIPE_RUNNERS]
+    if unknown:
+        raise ValueError(f"Unknown recipes: {', '.join(unknown)} (choose from {', '.join(RECIPE_RUNNERS)})")
+
+    server = moto_reset_url = None
+    endpoint_url = S3_ENDPOINT_URL
+    if not endpoint_url:
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # One access-log line per request otherwise
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+        server.start()
+        endpoint_url = "http://%s:%d" % server.get_host_and_port()
+        moto_reset_url = f"{endpoint_url}/moto-api/reset"
+        # moto accepts any credentials; the child inherits these
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    run = {"run_id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"), "commit": git_commit(),
+           "endpoint": S3_ENDPOINT_URL or "moto", "python": platform.python_version()}
+    s3 = make_client(endpoint_url)
+    print(f"{'recipe':<12}{'keys':>10}{'objects/s':>12}{'calls/obj':>11}{'peak MB':>9}{'wall s':>9}")
+    try:
+        for size in SIZES:
+            for recipe in RECIPES:
+                record = dict(run, **run_one(s3, endpoint_url, recipe, size, moto_reset_url))
+                with open(RESULTS_FILE, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                if "error" in record:
+                    print(f"{recipe:<12}{size:>10}  failed: {record['error']}")
+                    continue
+                print(f"{recipe:<12}{size:>10}{record['objects_per_second'] or 0:>12.0f}"
+                      f"{record['calls_per_object'] or 0:>11.3f}{record['peak_rss_mb']:>9.0f}"
+                      f"{record['wall_seconds']:>9.1f}")
+    finally:
+        if server:
+            server.stop()
+    print(f"\nResults appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(json.loads(sys.argv[2]))
+    else:
+        main()
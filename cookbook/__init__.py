@@ -0,0 +1,5 @@
+"""
+Shared helpers for the AWS recipes in this repository.
+Each recipe stays a standalone script; the pieces they have in common
+(batched S3 calls, listing, copy engines, ...) live here.
+"""
@@ -0,0 +1,182 @@
+"""
+Checkpoint Journal
+SQLite-backed progress journal that lets long-running recipes resume
+after a crash or timeout instead of starting again from the first key.
+
+Work is recorded as numbered batches of keys taken in listing (key)
+order. The watermark is the last key of the longest run of finished
+batches without failures, so a resumed run lists with
+StartAfter=watermark and redoes both the batches that were still in
+flight and everything from the first batch with a failed object on.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    watermark TEXT,
+    done_seq INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    job TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    first_key TEXT,
+    last_key TEXT,
+    count INTEGER,
+    failed INTEGER,
+    finished REAL,
+    PRIMARY KEY (job, seq)
+);
+CREATE TABLE IF NOT EXISTS state (
+    job TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (job, name)
+);
+"""
+
+
+class CheckpointJournal:
+    """Progress journal for one job (e.g. "dr-restore:src->dst") in a SQLite file."""
+
+    def __init__(self, path, job, resume=False):
+        self.job = job
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        if not resume:
+            self.reset()
+        self.conn.execute("INSERT OR IGNORE INTO jobs (job, updated) VALUES (?, ?)", (job, time.time()))
+        self.watermark, self.done_seq = self.conn.execute(
+            "SELECT watermark, done_seq FROM jobs WHERE job = ?", (job,)).fetchone()
+        # Batches past the watermark are redone on resume, so numbering restarts there
+        self.conn.execute("DELETE FROM batches WHERE job = ? AND seq > ?", (job, self.done_seq))
+        self.next_seq = self.done_seq + 1
+        self.finished = {}
+
+    @property
+    def resumed(self):
+        return self.watermark is not None
+
+    def begin(self, first_key):
+        """Open a new batch starting at `first_key`; returns its sequence number."""
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.conn.execute("INSERT INTO batches (job, seq, first_key) VALUES (?, ?, ?)",
+                              (self.job, seq, first_key))
+            return seq
+
+    def finish(self, seq, last_key, count, failed=0):
+        """
+        Record a finished batch and advance the watermark if it closes a gap.
+        A batch with failures holds the watermark back, so --resume retries it.
+        """
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                "UPDATE batches SET last_key = ?, count = ?, failed = ?, finished = ? WHERE job = ? AND seq = ?",
+                (last_key, count, failed, now, self.job, seq))
+            self.finished[seq] = (last_key, failed)
+            advanced = False
+            while self.finished.get(self.done_seq + 1, (None, 1))[1] == 0:
+                self.done_seq += 1
+                self.watermark = self.finished.pop(self.done_seq)[0]
+                advanced = True
+            if advanced:
+                self.conn.execute("UPDATE jobs SET watermark = ?, done_seq = ?, updated = ? WHERE job = ?",
+                                  (self.watermark, self.done_seq, now, self.job))
+
+    def totals(self):
+        """Objects and failures recorded in finished batches (including earlier runs)."""
+        with self.lock:
+            count, failed = self.conn.execute(
+                "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(failed), 0) FROM batches "
+                "WHERE job = ? AND finished IS NOT NULL", (self.job,)).fetchone()
+        return count, failed
+
+    def get(self, name, default=None):
+        """Read a JSON value stored with set()."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM state WHERE job = ? AND name = ?",
+                                    (self.job, name)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, name, value):
+        """Store a small JSON-serialisable value (e.g. an in-flight update ID)."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO state (job, name, value) VALUES (?, ?, ?)",
+                              (self.job, name, json.dumps(value)))
+
+    def reset(self):
+        """Forget all progress for this job."""
+        for table in ("jobs", "batches", "state"):
+            self.conn.execute(f"DELETE FROM {table} WHERE job = ?", (self.job,))
+        self.watermark, self.done_seq, self.next_seq, self.finished = None, 0, 1, {}
+
+    def close(self):
+        self.conn.close()
+
+
+class BatchTracker:
+    """
+    Groups per-object work into journal batches. Objects are added in key
+    order by the producer and completed out of order by worker threads.
+    """
+
+    def __init__(self, journal, batch_size=1000):
+        self.journal = journal
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.current = None
+        self.batches = {}
+
+    def add(self, key):
+        """Register the next key; returns the batch it belongs to."""
+        with self.lock:
+            if self.current is None:
+                self.current = self.journal.begin(key)
+                self.batches[self.current] = {"last": key, "count": 0, "pending": 0,
+                                              "failed": 0, "sealed": False}
+            seq = self.current
+            batch = self.batches[seq]
+            batch["last"] = key
+            batch["count"] += 1
+            batch["pending"] += 1
+            if batch["count"] >= self.batch_size:
+                batch["sealed"] = True
+                self.current = None
+            return seq
+
+    def done(self, seq, failed=False):
+        """Mark one object of batch `seq` as processed."""
+        with self.lock:
+            batch = self.batches[seq]
+            batch["pending"] -= 1
+            batch["failed"] += int(failed)
+            self._maybe_finish(seq)
+
+    def seal(self):
+        """Close the last, partially filled batch once input is exhausted."""
+        with self.lock:
+            if self.current is not None:
+                self.batches[self.current]["sealed"] = True
+                self._maybe_finish(self.current)
+                self.current = None
+
+    def _maybe_finish(self, seq):
+        batch = self.batches[seq]
+        if batch["sealed"] and batch["pending"] == 0:
+            del self.batches[seq]
+            self.journal.finish(seq, batch["last"], batch["count"], batch["failed"])
+
+
+def resume_requested(argv, env_value=None):
+    """True if --resume was passed on the command line or RESUME=true is set."""
+    return "--resume" in argv or str(env_value).lower() == "true"
@@ -0,0 +1,100 @@
+"""
+Shared AWS Client Factory
+Caches sessions and clients per (service, region, credentials) so every
+recipe, and every worker thread within it, reuses the same warm connection
+pool. Clients use adaptive retries and a pool sized to the caller's
+concurrency. Every client is instrumented (see cookbook.instrumentation).
+
+Credentials come from, in order: explicit keys, a named profile, or the
+default chain (environment, SSO, instance/task role). A role_arn is assumed
+on top of whichever source applies and refreshed automatically.
+"""
+
+import threading
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import AssumeRoleCredentialFetcher, DeferredRefreshableCredentials
+from botocore.exceptions import NoCredentialsError
+
+from cookbook.instrumentation import instrument
+
+# botocore's default pool size; raised per client to match worker counts
+DEFAULT_POOL_SIZE = 10
+
+# Adaptive mode adds client-side rate limiting on throttling errors
+RETRIES = {"mode": "adaptive", "max_attempts": 10}
+
+_lock = threading.RLock()
+_sessions = {}
+_clients = {}
+
+
+def _source_key(access_key, profile, role_arn):
+    return (access_key or None, profile or None, role_arn or None)
+
+
+def _assume_role(base_session, role_arn, region, session_name):
+    fetcher = AssumeRoleCredentialFetcher(
+        client_creator=base_session._session.create_client,
+        source_credentials=base_session.get_credentials(),
+        role_arn=role_arn,
+        extra_args={"RoleSessionName": session_name},
+    )
+    core = botocore.session.Session()
+    core._credentials = DeferredRefreshableCredentials(
+        method="assume-role", refresh_using=fetcher.fetch_credentials
+    )
+    return boto3.Session(botocore_session=core, region_name=region)
+
+
+def get_session(region=None, access_key=None, secret_key=None, session_token=None,
+                profile=None, role_arn=None, role_session_name="cookbook"):
+    """
+    Return a cached boto3 Session for one credential source.
+    Raises NoCredentialsError if no credentials can be resolved.
+    """
+    key = _source_key(access_key, profile, role_arn) + (region or None,)
+    with _lock:
+        session = _sessions.get(key)
+        if session is not None:
+            return session
+        if access_key and secret_key:
+            session = boto3.Session(aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+                                    aws_session_token=session_token or None, region_name=region or None)
+        else:
+            session = boto3.Session(profile_name=profile or None, region_name=region or None)
+        if session.get_credentials() is None:
+            raise NoCredentialsError()
+        if role_arn:
+            session = _assume_role(session, role_arn, region or None, role_session_name)
+        _sessions[key] = session
+        return session
+
+
+def get_client(service, region=None, max_pool_connections=None, endpoint_url=None, **credentials):
+    """
+    Return a cached client for (service, region, credentials, endpoint).
+
+    `credentials` are the get_session() keyword arguments. When a later
+    caller asks for a larger pool, a new client with that pool replaces
+    the cached one; smaller requests reuse the existing client.
+    """
+    pool_size = max(max_pool_connections or 0, DEFAULT_POOL_SIZE)
+    session = get_session(region, **credentials)
+    key = (service, region or session.region_name, endpoint_url or None,
+           _source_key(credentials.get("access_key"), credentials.get("profile"), credentials.get("role_arn")))
+    with _lock:
+        cached = _clients.get(key)
+        if cached and cached[1] >= pool_size:
+            return cached[0]
+        client = session.client(
+            service,
+            region_name=region or None,
+            endpoint_url=endpoint_url or None,
+            config=Config(max_pool_connections=pool_size, retries=RETRIES),
+        )
+        instrument(client)
+        _clients[key] = (client, pool_size)
+        return client
@@ -0,0 +1,343 @@
+"""
+EBS Snapshot Restore Harness
+Restores many snapshots at once: every volume is created and every test
+instance launched up front, then a single loop polls all of them with
+batched Describe calls, attaches each volume as soon as both sides are
+ready, and records time-to-available and time-to-attached per snapshot
+(to within one poll interval). teardown() removes everything it created.
+
+gp3/io volumes take provisioned IOPS and throughput, and Fast Snapshot
+Restore can be enabled for the test and disabled again afterwards.
+
+verify_snapshot() checks a snapshot without any instance: it reads every
+block through the EBS direct APIs from a worker pool and compares each
+block's SHA256 with the checksum EBS returns (only the blocks changed
+since a base snapshot, when one is given).
+"""
+
+import base64
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Per-snapshot outcomes
+PENDING = "pending"
+ATTACHED = "attached"
+FAILED = "failed"
+
+# Filter values per Describe call
+DESCRIBE_BATCH = 200
+
+
+def _chunks(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _describe_volumes(ec2, volume_ids):
+    """Volumes by ID; a volume-id filter, unlike VolumeIds, tolerates IDs that are not visible yet."""
+    found = {}
+    for chunk in _chunks(volume_ids, DESCRIBE_BATCH):
+        for page in ec2.get_paginator("describe_volumes").paginate(Filters=[{"Name": "volume-id", "Values": chunk}]):
+            found.update({v["VolumeId"]: v for v in page["Volumes"]})
+    return found
+
+
+def _describe_instances(ec2, instance_ids):
+    found = {}
+    for chunk in _chunks(instance_ids, DESCRIBE_BATCH):
+        pages = ec2.get_paginator("describe_instances").paginate(Filters=[{"Name": "instance-id", "Values": chunk}])
+        for page in pages:
+            found.update({i["InstanceId"]: i for r in page["Reservations"] for i in r["Instances"]})
+    return found
+
+
+def volume_args(volume_type="gp3", iops=None, throughput=None):
+    """create_volume arguments; IOPS applies to gp3/io1/io2, throughput to gp3 only."""
+    args = {"VolumeType": volume_type}
+    if iops and volume_type in ("gp3", "io1", "io2"):
+        args["Iops"] = iops
+    if throughput and volume_type == "gp3":
+        args["Throughput"] = throughput
+    return args
+
+
+def enable_fast_snapshot_restores(ec2, snapshot_ids, availability_zone, poll_interval=30, timeout=3600,
+                                  enabled=None):
+    """
+    Enable FSR for the snapshots in one AZ and wait until it is "enabled".
+    Returns the snapshots this call enabled (so only those are disabled
+    again). They are appended to `enabled`, when given, as each request is
+    accepted, so the caller can still disable them if the wait times out or
+    a later request fails. FSR is billed per snapshot-AZ hour while enabled.
+    """
+    def states():
+        found = {}
+        for chunk in _chunks(snapshot_ids, DESCRIBE_BATCH):
+            pages = ec2.get_paginator("describe_fast_snapshot_restores").paginate(Filters=[
+                {"Name": "snapshot-id", "Values": chunk},
+                {"Name": "availability-zone", "Values": [availability_zone]},
+            ])
+            for page in pages:
+                found.update({f["SnapshotId"]: f["State"] for f in page.get("FastSnapshotRestores", [])})
+        return found
+
+    enabled = [] if enabled is None else enabled
+    wanted = [s for s in snapshot_ids if states().get(s) not in ("enabling", "optimizing", "enabled")]
+    for chunk in _chunks(wanted, 10):
+        ec2.enable_fast_snapshot_restores(AvailabilityZones=[availability_zone], SourceSnapshotIds=chunk)
+        enabled.extend(chunk)
+    deadline = time.monotonic() + timeout
+    while True:
+        current = states()
+        if all(current.get(s) == "enabled" for s in snapshot_ids):
+            return enabled
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Fast snapshot restore not enabled after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def disable_fast_snapshot_restores(ec2, snapshot_ids, availability_zone):
+    for chunk in _chunks(snapshot_ids, 10):
+        ec2.disable_fast_snapshot_restores(AvailabilityZones=[availability_zone], SourceSnapshotIds=chunk)
+
+
+def restore_snapshots(ec2, snapshot_ids, availability_zone, launch_args, device_name="/dev/sdf",
+                      volume_options=None, tags=None, max_workers=16, poll_interval=5, timeout=1800,
+                      on_result=None, records=None):
+    """
+    Create a volume and launch an instance (`launch_args` for run_instances,
+    without counts) per snapshot, attach them, and return one record per
+    snapshot: snapshot_id, volume_id, instance_id, status, error,
+    fast_restored, and available/running/attached seconds measured from
+    the create_volume call. Calls `on_result(record)` as each finishes.
+
+    The records are appended to `records` (a caller's list) before anything
+    is created and filled in as resources appear, so the caller can still
+    tear down what was created if this raises. Describe errors while
+    polling (throttling, IDs not visible yet) are retried until `timeout`.
+    """
+    tags = tags or []
+    by_snapshot = {sid: {"snapshot_id": sid, "volume_id": None, "instance_id": None, "status": PENDING,
+                         "error": None, "fast_restored": None, "available_seconds": None,
+                         "running_seconds": None, "attached_seconds": None, "started": None}
+                   for sid in snapshot_ids}
+    if records is not None:
+        records.extend(by_snapshot.values())
+
+    def fail(record, error):
+        record["status"], record["error"] = FAILED, str(error)
+        if on_result:
+            on_result(record)
+
+    def create(record):
+        record["started"] = time.monotonic()
+        record["volume_id"] = ec2.create_volume(
+            SnapshotId=record["snapshot_id"], AvailabilityZone=availability_zone,
+            TagSpecifications=[{"ResourceType": "volume",
+                                "Tags": tags + [{"Key": "RestoreTest", "Value": record["snapshot_id"]}]}],
+            **(volume_options or volume_args()),
+        )["VolumeId"]
+        record["instance_id"] = ec2.run_instances(
+            MinCount=1, MaxCount=1,
+            TagSpecifications=[{"ResourceType": "instance",
+                                "Tags": tags + [{"Key": "RestoreTest", "Value": record["snapshot_id"]}]}],
+            **launch_args,
+        )["Instances"][0]["InstanceId"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(create, record): record for record in by_snapshot.values()}
+    for future, record in futures.items():
+        try:
+            future.result()
+        except (ClientError, BotoCoreError) as e:
+            fail(record, e)
+
+    deadline = time.monotonic() + timeout
+    attaching = set()
+    while True:
+        pending = [r for r in by_snapshot.values() if r["status"] == PENDING]
+        if not pending:
+            break
+        if time.monotonic() >= deadline:
+            for record in pending:
+                fail(record, f"timed out after {timeout}s")
+            break
+        try:
+            volumes = _describe_volumes(ec2, [r["volume_id"] for r in pending])
+            instances = _describe_instances(ec2, [r["instance_id"] for r in pending if r["running_seconds"] is None])
+        except (ClientError, BotoCoreError):
+            # Throttled, or just-created IDs not visible yet: poll again
+            time.sleep(poll_interval)
+            continue
+        now = time.monotonic()
+        for record in pending:
+            volume = volumes.get(record["volume_id"], {})
+            instance = instances.get(record["instance_id"], {})
+            if volume.get("State") == "error":
+                fail(record, "volume entered the error state")
+                continue
+            if instance.get("State", {}).get("Name") in ("shutting-down", "terminated"):
+                fail(record, instance.get("StateReason", {}).get("Message", "instance terminated"))
+                continue
+            if record["available_seconds"] is None and volume.get("State") in ("available", "in-use"):
+                record["available_seconds"] = now - record["started"]
+                record["fast_restored"] = volume.get("FastRestored", False)
+            if record["running_seconds"] is None and instance.get("State", {}).get("Name") == "running":
+                record["running_seconds"] = now - record["started"]
+            if any(a.get("State") == "attached" for a in volume.get("Attachments", [])):
+                record["attached_seconds"] = now - record["started"]
+                record["status"] = ATTACHED
+                if on_result:
+                    on_result(record)
+            elif (record["available_seconds"] is not None and record["running_seconds"] is not None
+                  and record["snapshot_id"] not in attaching):
+                attaching.add(record["snapshot_id"])
+                try:
+                    ec2.attach_volume(VolumeId=record["volume_id"], InstanceId=record["instance_id"],
+                                      Device=device_name)
+                except (ClientError, BotoCoreError) as e:
+                    fail(record, e)
+        time.sleep(poll_interval)
+
+    for record in by_snapshot.values():
+        del record["started"]
+    return list(by_snapshot.values())
+
+
+def teardown(ec2, records, poll_interval=5, timeout=900):
+    """
+    Terminate the test instances, wait for their volumes to detach, and
+    delete the volumes. Returns (instances terminated, volumes deleted).
+    """
+    instance_ids = [r["instance_id"] for r in records if r["instance_id"]]
+    volume_ids = [r["volume_id"] for r in records if r["volume_id"]]
+    for chunk in _chunks(instance_ids, 1000):
+        ec2.terminate_instances(InstanceIds=chunk)
+
+    deleted, remaining = 0, set(volume_ids)
+    deadline = time.monotonic() + timeout
+    while remaining and time.monotonic() < deadline:
+        volumes = _describe_volumes(ec2, remaining)
+        for volume_id in list(remaining):
+            state = volumes.get(volume_id, {}).get("State")
+            if state is None or state in ("deleting", "deleted"):
+                remaining.discard(volume_id)
+            elif state in ("available", "error"):
+                try:
+                    ec2.delete_volume(VolumeId=volume_id)
+                    deleted += 1
+                except ClientError:
+                    continue
+                remaining.discard(volume_id)
+        if remaining:
+            time.sleep(poll_interval)
+    return len(instance_ids), deleted
+
+
+def iter_snapshot_blocks(ebs, snapshot_id, info=None):
+    """
+    Yield (block_index, block_token) for every written block. Fills `info`
+    with BlockSize and VolumeSize (GiB) from the first page.
+    """
+    kwargs = {"SnapshotId": snapshot_id, "MaxResults": 10000}
+    while True:
+        page = ebs.list_snapshot_blocks(**kwargs)
+        if info is not None:
+            info.setdefault("BlockSize", page.get("BlockSize"))
+            info.setdefault("VolumeSize", page.get("VolumeSize"))
+        for block in page.get("Blocks", []):
+            yield block["BlockIndex"], block["BlockToken"]
+        if not page.get("NextToken"):
+            return
+        kwargs["NextToken"] = page["NextToken"]
+
+
+def iter_changed_blocks(ebs, first_snapshot_id, second_snapshot_id, info=None):
+    """
+    Yield (block_index, block_token) for the blocks of the second snapshot
+    that differ from the first. Blocks removed in the second snapshot have
+    no token and are skipped.
+    """
+    kwargs = {"FirstSnapshotId": first_snapshot_id, "SecondSnapshotId": second_snapshot_id, "MaxResults": 10000}
+    while True:
+        page = ebs.list_changed_blocks(**kwargs)
+        if info is not None:
+            info.setdefault("BlockSize", page.get("BlockSize"))
+            info.setdefault("VolumeSize", page.get("VolumeSize"))
+        for block in page.get("ChangedBlocks", []):
+            if block.get("SecondBlockToken"):
+                yield block["BlockIndex"], block["SecondBlockToken"]
+        if not page.get("NextToken"):
+            return
+        kwargs["NextToken"] = page["NextToken"]
+
+
+def verify_block(ebs, snapshot_id, block_index, block_token):
+    """Read one block and return (bytes read, checksum matches)."""
+    resp = ebs.get_snapshot_block(SnapshotId=snapshot_id, BlockIndex=block_index, BlockToken=block_token)
+    data = resp["BlockData"].read()
+    digest = base64.b64encode(hashlib.sha256(data).digest()).decode()
+    return len(data), digest == resp["Checksum"]
+
+
+def verify_snapshot(ebs, snapshot_id, base_snapshot_id=None, max_workers=32, on_mismatch=None):
+    """
+    Read and checksum every block of `snapshot_id` (or, with a base
+    snapshot, only the blocks changed since it). Block reads run on
+    `max_workers` threads with at most 2 * max_workers in flight.
+    `on_mismatch(block_index, error)` is called for bad or unreadable
+    blocks (error is None for a checksum mismatch).
+
+    Returns a summary dict: blocks, bytes, mismatched, errors, block_size,
+    volume_size (GiB) and elapsed.
+    """
+    summary = {"blocks": 0, "bytes": 0, "mismatched": 0, "errors": [], "elapsed": 0.0}
+    info = {}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def run(block_index, block_token):
+        try:
+            try:
+                size, ok = verify_block(ebs, snapshot_id, block_index, block_token)
+                error = None
+            except (ClientError, BotoCoreError) as e:
+                size, ok, error = 0, False, e
+            with lock:
+                summary["blocks"] += 1
+                summary["bytes"] += size
+                if error:
+                    summary["errors"].append({"BlockIndex": block_index, "Error": str(error)})
+                elif not ok:
+                    summary["mismatched"] += 1
+            if not ok and on_mismatch:
+                on_mismatch(block_index, error)
+        finally:
+            slots.release()
+
+    if base_snapshot_id:
+        blocks = iter_changed_blocks(ebs, base_snapshot_id, snapshot_id, info)
+    else:
+        blocks = iter_snapshot_blocks(ebs, snapshot_id, info)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for block_index, block_token in blocks:
+            slots.acquire()
+            pending.add(pool.submit(run, block_index, block_token))
+            finished = {f for f in pending if f.done()}
+            for future in finished:
+                future.result()
+            pending -= finished
+        for future in pending:
+            future.result()
+
+    summary["elapsed"] = time.monotonic() - start
+    summary["block_size"] = info.get("BlockSize")
+    summary["volume_size"] = info.get("VolumeSize")
+    return summary
@@ -0,0 +1,293 @@
+"""
+EKS Update Waiter and Nodegroup Scaler
+Waits on describe_update with exponential backoff and jitter tuned to the
+update type, so a scaling change is noticed within seconds while a
+control-plane upgrade is not polled every few seconds for half an hour.
+
+scale_nodegroups() submits many nodegroup scaling updates, across any
+number of clusters, and waits for them concurrently.
+
+plan_upgrade() and run_upgrade() turn a version upgrade into a dependency
+graph: control plane (one minor version per step) first, then add-ons and
+nodegroups in parallel. Steps run across clusters at once within a per-cluster
+limit, and a CheckpointJournal lets an interrupted run pick up its
+in-flight updates instead of submitting them again.
+"""
+
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+TERMINAL_STATUSES = ("Successful", "Failed", "Cancelled")
+
+# Scaling config already matches: no update submitted
+UNCHANGED = "Unchanged"
+
+# Upgrade step outcomes besides the update statuses
+BLOCKED = "Blocked"  # A step it depends on did not succeed
+ERROR = "Error"  # The API call itself failed
+
+# Upgrade step kinds
+CONTROL_PLANE = "control-plane"
+ADDON = "addon"
+NODEGROUP = "nodegroup"
+
+# (first delay, max delay) in seconds per describe_update "type".
+# Config updates finish in minutes; version updates take 10-60 minutes.
+BACKOFF = {
+    "ConfigUpdate": (5, 60),
+    "AddonUpdate": (10, 60),
+    "LoggingUpdate": (10, 60),
+    "EndpointAccessUpdate": (30, 120),
+    "VersionUpdate": (60, 300),
+}
+DEFAULT_BACKOFF = (10, 120)
+
+
+def backoff_delays(first, maximum):
+    """Exponential delays capped at `maximum`, each jittered to between half and all of its value."""
+    delay = first
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * 2, maximum)
+
+
+def wait_for_update(eks, cluster, update_id, nodegroup=None, addon=None, on_status=None, timeout=None):
+    """
+    Poll describe_update until the update reaches a terminal status and
+    return the final update dict. Calls `on_status(update)` whenever the
+    status changes. Raises TimeoutError after `timeout` seconds.
+    """
+    kwargs = {"name": cluster, "updateId": update_id}
+    if nodegroup:
+        kwargs["nodegroupName"] = nodegroup
+    if addon:
+        kwargs["addonName"] = addon
+    deadline = time.monotonic() + timeout if timeout else None
+    delays, last_status = None, None
+    while True:
+        update = eks.describe_update(**kwargs)["update"]
+        if update["status"] != last_status:
+            last_status = update["status"]
+            if on_status:
+                on_status(update)
+        if update["status"] in TERMINAL_STATUSES:
+            return update
+        if delays is None:
+            delays = backoff_delays(*BACKOFF.get(update.get("type"), DEFAULT_BACKOFF))
+        delay = next(delays)
+        if deadline and time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Update {update_id} on {cluster} still {update['status']} after {timeout}s")
+        time.sleep(delay)
+
+
+def scale_nodegroup(eks, cluster, nodegroup, scaling_config, on_status=None, timeout=None):
+    """
+    Apply `scaling_config` (minSize/maxSize/desiredSize) and wait for it.
+    Returns the final update dict, or {"status": UNCHANGED} when the
+    nodegroup already has that configuration.
+    """
+    current = eks.describe_nodegroup(clusterName=cluster, nodegroupName=nodegroup)["nodegroup"]["scalingConfig"]
+    if all(current.get(k) == v for k, v in scaling_config.items()):
+        return {"status": UNCHANGED}
+    update = eks.update_nodegroup_config(
+        clusterName=cluster, nodegroupName=nodegroup, scalingConfig=scaling_config
+    )["update"]
+    return wait_for_update(eks, cluster, update["id"], nodegroup=nodegroup,
+                           on_status=on_status, timeout=timeout)
+
+
+def scale_nodegroups(eks, targets, max_workers=16, on_status=None, timeout=None):
+    """
+    Scale every target concurrently. `targets` are dicts with cluster,
+    nodegroup and scalingConfig. Calls `on_status(target, update)` as each
+    update changes status; returns counts per final status plus errors
+    and elapsed.
+    """
+    started = time.monotonic()
+    result = {status: 0 for status in TERMINAL_STATUSES + (UNCHANGED,)}
+    errors = []
+
+    def scale(target):
+        report = (lambda update: on_status(target, update)) if on_status else None
+        return scale_nodegroup(eks, target["cluster"], target["nodegroup"], target["scalingConfig"],
+                               on_status=report, timeout=timeout)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(scale, target): target for target in targets}
+        for future in as_completed(futures):
+            try:
+                result[future.result()["status"]] += 1
+            except (ClientError, BotoCoreError, TimeoutError) as e:
+                errors.append((futures[future], e))
+
+    result["errors"] = errors
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+
+def _minor(version):
+    major, minor = version.split(".")[:2]
+    return int(major), int(minor)
+
+
+def _addon_release(version):
+    """Comparable form of an add-on version, e.g. "v1.18.3-eksbuild.1" -> (1, 18, 3, 1)."""
+    return tuple(int(n) for n in re.findall(r"\d+", version))
+
+
+def _minor_steps(current, target):
+    """Control-plane versions between `current` and `target`; EKS moves one minor version at a time."""
+    major, minor = _minor(current)
+    return [f"{major}.{m}" for m in range(minor + 1, _minor(target)[1] + 1)]
+
+
+def addon_version(eks, addon, kubernetes_version):
+    """The add-on's default version for `kubernetes_version`, else the newest compatible one."""
+    versions = eks.describe_addon_versions(addonName=addon, kubernetesVersion=kubernetes_version)["addons"]
+    candidates = versions[0]["addonVersions"] if versions else []
+    for candidate in candidates:
+        for compat in candidate.get("compatibilities", []):
+            if compat.get("clusterVersion") == kubernetes_version and compat.get("defaultVersion"):
+                return candidate["addonVersion"]
+    return candidates[0]["addonVersion"] if candidates else None
+
+
+def plan_upgrade(eks, cluster, version):
+    """
+    Steps to bring `cluster` to `version`: dicts with id, cluster, kind,
+    name, version and deps (ids). Add-ons and nodegroups depend on the
+    last control-plane step only, so they run in parallel with each other.
+    """
+    steps, deps = [], []
+    current = eks.describe_cluster(name=cluster)["cluster"]["version"]
+    for step_version in _minor_steps(current, version):
+        step_id = f"{cluster}/{CONTROL_PLANE}@{step_version}"
+        steps.append({"id": step_id, "cluster": cluster, "kind": CONTROL_PLANE, "name": cluster,
+                      "version": step_version, "deps": deps})
+        deps = [step_id]
+
+    for page in eks.get_paginator("list_addons").paginate(clusterName=cluster):
+        for addon in page.get("addons", []):
+            target = addon_version(eks, addon, version)
+            if target:
+                steps.append({"id": f"{cluster}/{ADDON}/{addon}@{target}", "cluster": cluster, "kind": ADDON,
+                              "name": addon, "version": target, "deps": deps})
+
+    for page in eks.get_paginator("list_nodegroups").paginate(clusterName=cluster):
+        for nodegroup in page.get("nodegroups", []):
+            steps.append({"id": f"{cluster}/{NODEGROUP}/{nodegroup}@{version}", "cluster": cluster,
+                          "kind": NODEGROUP, "name": nodegroup, "version": version, "deps": deps})
+    return steps
+
+
+def _current_version(eks, step):
+    if step["kind"] == CONTROL_PLANE:
+        return eks.describe_cluster(name=step["cluster"])["cluster"]["version"]
+    if step["kind"] == ADDON:
+        return eks.describe_addon(clusterName=step["cluster"], addonName=step["name"])["addon"]["addonVersion"]
+    return eks.describe_nodegroup(clusterName=step["cluster"], nodegroupName=step["name"])["nodegroup"]["version"]
+
+
+def _start_update(eks, step):
+    if step["kind"] == CONTROL_PLANE:
+        resp = eks.update_cluster_version(name=step["cluster"], version=step["version"])
+    elif step["kind"] == ADDON:
+        resp = eks.update_addon(clusterName=step["cluster"], addonName=step["name"],
+                                addonVersion=step["version"], resolveConflicts="PRESERVE")
+    else:
+        resp = eks.update_nodegroup_version(clusterName=step["cluster"], nodegroupName=step["name"],
+                                            version=step["version"])
+    return resp["update"]["id"]
+
+
+def run_step(eks, step, journal=None, on_status=None):
+    """
+    Run one upgrade step and return its final status. A step already at
+    its version is UNCHANGED; an update recorded in the journal by an
+    interrupted run is waited on rather than submitted again, unless it
+    already failed.
+    """
+    state = journal.get(step["id"], {}) if journal else {}
+    if state.get("status") == "Successful":
+        return UNCHANGED
+    # A journaled update that ended Failed/Cancelled is submitted again, not waited on
+    update_id = state.get("update") if "status" not in state else None
+    if not update_id:
+        current = _current_version(eks, step)
+        at_version = (_addon_release(current) >= _addon_release(step["version"]) if step["kind"] == ADDON
+                      else _minor(current) >= _minor(step["version"]))
+        if at_version:
+            return UNCHANGED
+        update_id = _start_update(eks, step)
+        if journal:
+            journal.set(step["id"], {"update": update_id})
+    update = wait_for_update(
+        eks, step["cluster"], update_id,
+        nodegroup=step["name"] if step["kind"] == NODEGROUP else None,
+        addon=step["name"] if step["kind"] == ADDON else None,
+        on_status=on_status,
+    )
+    if journal:
+        journal.set(step["id"], {"update": update_id, "status": update["status"]})
+    return update["status"]
+
+
+def run_upgrade(eks, steps, max_workers=8, per_cluster=2, journal=None, on_step=None):
+    """
+    Run a plan as soon as each step's dependencies have succeeded, with at
+    most `max_workers` steps in flight overall and `per_cluster` per
+    cluster. Dependents of a step that did not succeed are BLOCKED.
+    Calls `on_step(step, status, error)` for every status change; returns
+    {step id: final status} plus errors and elapsed.
+    """
+    started = time.monotonic()
+    statuses, errors = {}, []
+    waiting = list(steps)
+    running = {}  # future -> step
+    per_cluster_running = {}
+
+    def report(step, status, error=None):
+        if on_step:
+            on_step(step, status, error)
+
+    def execute(step):
+        return run_step(eks, step, journal, on_status=lambda update: report(step, update["status"]))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while waiting or running:
+            for step in list(waiting):
+                dep_statuses = [statuses.get(dep) for dep in step["deps"]]
+                if any(s is not None and s not in ("Successful", UNCHANGED) for s in dep_statuses):
+                    waiting.remove(step)
+                    statuses[step["id"]] = BLOCKED
+                    report(step, BLOCKED)
+                elif (all(s is not None for s in dep_statuses) and len(running) < max_workers
+                      and per_cluster_running.get(step["cluster"], 0) < per_cluster):
+                    waiting.remove(step)
+                    per_cluster_running[step["cluster"]] = per_cluster_running.get(step["cluster"], 0) + 1
+                    running[pool.submit(execute, step)] = step
+
+            if not running:
+                # Nothing in flight, so whatever still waits has a dependency that can never succeed
+                for step in waiting:
+                    statuses[step["id"]] = BLOCKED
+                    report(step, BLOCKED)
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                per_cluster_running[step["cluster"]] -= 1
+                try:
+                    statuses[step["id"]] = future.result()
+                    if statuses[step["id"]] == UNCHANGED:
+                        report(step, UNCHANGED)
+                except (ClientError, BotoCoreError, TimeoutError) as e:
+                    statuses[step["id"]] = ERROR
+                    errors.append((step, e))
+                    report(step, ERROR, e)
+
+    return {"statuses": statuses, "errors": errors, "elapsed": time.monotonic() - started}
@@ -0,0 +1,243 @@
+"""
+AWS API Call Instrumentation
+Hooks botocore's event system on every client made by cookbook.clients to
+record, per service and operation: calls, errors, retries, throttling
+responses (S3 503 SlowDown, Throttling, RequestLimitExceeded, ...) and a
+latency histogram. Latency covers the whole call, retries and client-side
+rate limiting included, so slow operations show up where the time went.
+
+At exit the totals are written as a JSON summary to COOKBOOK_METRICS_JSON
+and as a Prometheus textfile (for node_exporter's textfile collector) to
+COOKBOOK_METRICS_PROM, when those environment variables are set. The
+paths are read at exit, so values loaded from a .env file also apply.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Error codes counted as throttling (S3 returns SlowDown with a 503)
+THROTTLE_CODES = {
+    "SlowDown", "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestThrottledException", "TooManyRequestsException", "RequestLimitExceeded",
+    "ProvisionedThroughputExceededException", "BandwidthLimitExceeded", "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+_ATTEMPTS = "cookbook_attempts"
+_STARTED = "cookbook_started"
+
+
+class _Operation:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            i = len(LATENCY_BUCKETS)
+        self.buckets[i] += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def quantile(self, q):
+        """Estimate from the histogram, interpolating within the bucket (as Prometheus does)."""
+        if not self.calls:
+            return None
+        rank, seen, lower = q * self.calls, 0, 0.0
+        for count, upper in zip(self.buckets, LATENCY_BUCKETS + (self.latency_max,)):
+            if count and seen + count >= rank:
+                return round(min(lower + (upper - lower) * (rank - seen) / count, self.latency_max), 6)
+            seen += count
+            lower = upper
+        return round(self.latency_max, 6)
+
+
+class Metrics:
+    """Thread-safe per-operation counters, keyed by (service, operation)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.started = time.time()
+
+    def _operation(self, service, operation):
+        key = (service, operation)
+        if key not in self.operations:
+            self.operations[key] = _Operation()
+        return self.operations[key]
+
+    def record_call(self, service, operation, seconds, retries, error):
+        with self.lock:
+            op = self._operation(service, operation)
+            op.calls += 1
+            op.retries += retries
+            op.errors += bool(error)
+            op.observe(seconds)
+
+    def record_throttle(self, service, operation, code):
+        with self.lock:
+            throttles = self._operation(service, operation).throttles
+            throttles[code] = throttles.get(code, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.started = time.time()
+
+    def summary(self):
+        """JSON-ready totals, operations sorted by total time spent (the hot path first)."""
+        with self.lock:
+            operations = []
+            for (service, operation), op in self.operations.items():
+                operations.append({
+                    "service": service,
+                    "operation": operation,
+                    "calls": op.calls,
+                    "errors": op.errors,
+                    "retries": op.retries,
+                    "throttles": sum(op.throttles.values()),
+                    "throttles_by_code": dict(op.throttles),
+                    "seconds": round(op.latency_sum, 6),
+                    "latency": {
+                        "mean": round(op.latency_sum / op.calls, 6) if op.calls else None,
+                        "p50": op.quantile(0.5),
+                        "p95": op.quantile(0.95),
+                        "p99": op.quantile(0.99),
+                        "max": round(op.latency_max, 6),
+                        "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], op.buckets)),
+                    },
+                })
+        operations.sort(key=lambda o: o["seconds"], reverse=True)
+        totals = {name: sum(o[name] for o in operations) for name in ("calls", "errors", "retries", "throttles")}
+        return {"recipe": recipe_name(), "started": self.started, "elapsed": round(time.time() - self.started, 3),
+                "totals": totals, "operations": operations}
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        recipe = recipe_name().replace("\\", "\\\\").replace('"', '\\"')
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in [("recipe", recipe)] + labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        with self.lock:
+            items = sorted(self.operations.items())
+            ops = [([("service", s), ("operation", o)], op) for (s, o), op in items]
+            family("cookbook_aws_api_calls_total", "counter", "AWS API calls made.",
+                   [("", labels, op.calls) for labels, op in ops])
+            family("cookbook_aws_api_errors_total", "counter", "AWS API calls that failed after retries.",
+                   [("", labels, op.errors) for labels, op in ops])
+            family("cookbook_aws_api_retries_total", "counter", "Retried AWS API attempts.",
+                   [("", labels, op.retries) for labels, op in ops])
+            family("cookbook_aws_api_throttles_total", "counter", "Throttling responses, by error code.",
+                   [("", labels + [("code", code)], count)
+                    for labels, op in ops for code, count in sorted(op.throttles.items())])
+            histogram = []
+            for labels, op in ops:
+                cumulative = 0
+                for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], op.buckets):
+                    cumulative += count
+                    histogram.append(("_bucket", labels + [("le", bound)], cumulative))
+                histogram.append(("_sum", labels, round(op.latency_sum, 6)))
+                histogram.append(("_count", labels, op.calls))
+            family("cookbook_aws_api_latency_seconds", "histogram",
+                   "AWS API call latency, retries included.", histogram)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def recipe_name():
+    return os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+
+
+def _service(model):
+    return model.service_model.service_id.hyphenize()
+
+
+def _before_call(model, context, **kwargs):
+    context[_STARTED] = time.monotonic()
+    context[_ATTEMPTS] = 1
+
+
+def _needs_retry(response, attempts, operation, request_dict, **kwargs):
+    # Emitted after every attempt, successful or not
+    request_dict["context"][_ATTEMPTS] = attempts
+    if response is None:
+        return None
+    http_response, parsed = response
+    code = (parsed or {}).get("Error", {}).get("Code") or str(http_response.status_code)
+    if code in THROTTLE_CODES or http_response.status_code == 503:
+        metrics.record_throttle(_service(operation), operation.name, code)
+    return None
+
+
+def _finish(context, service, operation, error):
+    started = context.pop(_STARTED, None)
+    if started is not None:
+        metrics.record_call(service, operation, time.monotonic() - started,
+                            context.pop(_ATTEMPTS, 1) - 1, error)
+
+
+def _after_call(http_response, model, context, **kwargs):
+    _finish(context, _service(model), model.name, http_response.status_code >= 300)
+
+
+def _after_call_error(context, exception, event_name, **kwargs):
+    # after-call-error.<service>.<operation>
+    _, service, operation = event_name.split(".", 2)
+    _finish(context, service, operation, True)
+
+
+def instrument(client):
+    """Register the metric hooks on one client."""
+    events = client.meta.events
+    events.register("before-call", _before_call)
+    # First, so throttled attempts are counted before the retry handler sleeps
+    events.register_first("needs-retry", _needs_retry)
+    events.register("after-call", _after_call)
+    events.register("after-call-error", _after_call_error)
+    return client
+
+
+def _write(path, text):
+    # Write then rename, so collectors never read a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def export(json_path=None, prom_path=None):
+    """Write the JSON summary and/or Prometheus textfile (defaults: the COOKBOOK_METRICS_* variables)."""
+    json_path = json_path or os.getenv("COOKBOOK_METRICS_JSON")
+    prom_path = prom_path or os.getenv("COOKBOOK_METRICS_PROM")
+    if not metrics.operations:
+        return
+    if json_path:
+        _write(json_path, json.dumps(metrics.summary(), indent=1) + "\n")
+    if prom_path:
+        _write(prom_path, metrics.prometheus())
+
+
+atexit.register(export)
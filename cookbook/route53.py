@@ -0,0 +1,337 @@
+"""
+Route53 Failover Daemon
+Polls a health check with a warm client and switches a PRIMARY/SECONDARY
+failover record pair only after consecutive failures (or recoveries), so
+a single flapping observation never moves traffic.
+
+The pair itself always stays in place, so Route53's own health-checked
+failover keeps working. The daemon moves traffic by pointing the PRIMARY
+record at the secondary's values (failover) and back at its own values
+(failback). Each switch waits for GetChange to report INSYNC and is
+yielded as an event carrying its detection and propagation latency.
+
+fleet_failover() does the same switch for a whole record inventory: health
+checks are read concurrently and each hosted zone gets its own chunked
+ChangeBatches, with zones submitted in parallel.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Record pair states
+PRIMARY = "primary"
+SECONDARY = "secondary"
+
+# ChangeResourceRecordSets limits per request; UPSERT values count twice
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_CHARS = 32000
+
+log = logging.getLogger(__name__)
+
+
+def is_healthy(route53, health_check_id):
+    """
+    True unless the health check fails in at least half of the checker
+    regions (the one-shot scripts' rule). API errors propagate.
+    """
+    observations = route53.get_health_check_status(HealthCheckId=health_check_id).get("HealthCheckObservations", [])
+    failures = sum(1 for obs in observations if "failure" in obs["StatusReport"]["Status"].lower())
+    return failures < len(observations) / 2
+
+
+def failover_records(name, record_type, ttl, primary_value, secondary_value, health_check_id):
+    """The PRIMARY/SECONDARY ResourceRecordSets of a failover pair."""
+    primary = {
+        "Name": name,
+        "Type": record_type,
+        "SetIdentifier": PRIMARY,
+        "Failover": "PRIMARY",
+        "TTL": ttl,
+        "ResourceRecords": [{"Value": primary_value}],
+        "HealthCheckId": health_check_id,
+    }
+    secondary = {
+        "Name": name,
+        "Type": record_type,
+        "SetIdentifier": SECONDARY,
+        "Failover": "SECONDARY",
+        "TTL": ttl,
+        "ResourceRecords": [{"Value": secondary_value}],
+    }
+    return primary, secondary
+
+
+def _same_name(a, b):
+    return a.rstrip(".").lower() == b.rstrip(".").lower()
+
+
+def find_pair(route53, zone_id, name, record_type):
+    """The live record sets of the pair: {"primary": rrset or None, "secondary": rrset or None}."""
+    pair = {PRIMARY: None, SECONDARY: None}
+    resp = route53.list_resource_record_sets(
+        HostedZoneId=zone_id, StartRecordName=name, StartRecordType=record_type, MaxItems="100"
+    )
+    for rrset in resp.get("ResourceRecordSets", []):
+        if not _same_name(rrset["Name"], name) or rrset["Type"] != record_type:
+            break
+        if rrset.get("SetIdentifier") in pair:
+            pair[rrset["SetIdentifier"]] = rrset
+    return pair
+
+
+def _values(rrset):
+    return sorted(r["Value"] for r in (rrset or {}).get("ResourceRecords", []))
+
+
+def current_state(route53, zone_id, primary, secondary):
+    """SECONDARY when the live PRIMARY record already points at the secondary's values."""
+    live = find_pair(route53, zone_id, primary["Name"], primary["Type"])[PRIMARY]
+    if live is not None and _values(live) == _values(secondary) != _values(primary):
+        return SECONDARY
+    return PRIMARY
+
+
+def wait_insync(route53, change_id, interval=2, timeout=600):
+    """Poll GetChange until the change is INSYNC; returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if route53.get_change(Id=change_id)["ChangeInfo"]["Status"] == "INSYNC":
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def switch_records(route53, zone_id, primary, secondary, target, comment=None):
+    """
+    Move the pair to `target` and return the change ID, or None if it is
+    already there. Failover points the PRIMARY record at the secondary's
+    values; failback restores them. Both records are UPSERTed, never deleted.
+    """
+    serving = dict(primary, ResourceRecords=secondary["ResourceRecords"]) if target == SECONDARY else primary
+    live = find_pair(route53, zone_id, primary["Name"], primary["Type"])
+    if live[PRIMARY] is not None and live[SECONDARY] is not None and _values(live[PRIMARY]) == _values(serving):
+        return None
+    resp = route53.change_resource_record_sets(
+        HostedZoneId=zone_id,
+        ChangeBatch={"Comment": comment or f"Failover daemon: switching to {target}", "Changes": [
+            {"Action": "UPSERT", "ResourceRecordSet": serving},
+            {"Action": "UPSERT", "ResourceRecordSet": secondary},
+        ]},
+    )
+    return resp["ChangeInfo"]["Id"]
+
+
+def watch_failover(route53, zone_id, primary, secondary, health_check_id, interval=10,
+                   failures=3, recoveries=5, failback=True, insync_timeout=600):
+    """
+    Poll `health_check_id` every `interval` seconds forever, yielding one
+    event dict per switch: action, first_failing (or first_recovered),
+    detected, insync, detection_seconds and propagation_seconds (wall-clock
+    times are epoch seconds). A switch fires after `failures` consecutive
+    unhealthy checks, and fails back after `recoveries` healthy ones.
+    Checks that error out count towards neither streak.
+    """
+    state = current_state(route53, zone_id, primary, secondary)
+    log.info(f"Failover daemon started: traffic on {state}, "
+             f"{failures} failures to fail over, {recoveries} recoveries to fail back")
+    streak, streak_healthy, streak_start = 0, None, None
+
+    while True:
+        started = time.monotonic()
+        try:
+            healthy = is_healthy(route53, health_check_id)
+        except (ClientError, BotoCoreError) as e:
+            log.warning(f"Health check {health_check_id} status unavailable: {e}")
+            time.sleep(interval)
+            continue
+
+        if healthy != streak_healthy:
+            streak, streak_healthy, streak_start = 0, healthy, time.time()
+        streak += 1
+
+        target = None
+        if state == PRIMARY and not healthy and streak >= failures:
+            target = SECONDARY
+        elif state == SECONDARY and healthy and failback and streak >= recoveries:
+            target = PRIMARY
+
+        if target:
+            detected = time.time()
+            try:
+                change_id = switch_records(route53, zone_id, primary, secondary, target)
+                insync = change_id is None or wait_insync(route53, change_id, timeout=insync_timeout)
+            except (ClientError, BotoCoreError) as e:
+                # Streak is kept, so the switch is retried on the next check
+                log.error(f"Failed to switch {primary['Name']} to {target}: {e}")
+            else:
+                if change_id is None:
+                    log.info(f"{primary['Name']} is already on {target}")
+                state = target
+                finished = time.time()
+                yield {
+                    "action": "failover" if target == SECONDARY else "failback",
+                    "record": primary["Name"],
+                    "change_id": change_id,
+                    "first_failing" if target == SECONDARY else "first_recovered": streak_start,
+                    "detected": detected,
+                    "insync": finished if insync else None,
+                    "detection_seconds": detected - streak_start,
+                    "propagation_seconds": finished - detected if insync else None,
+                }
+
+        time.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+def load_inventory(path):
+    """
+    Read a JSON list of failover pairs: zone_id, name, primary, secondary,
+    health_check_id, and optionally type (default A) and ttl (default 60).
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    return [dict({"type": "A", "ttl": 60}, **entry) for entry in entries]
+
+
+def check_health(route53, health_check_ids, max_workers=16):
+    """Read each distinct health check concurrently: {id: True/False, or None if unavailable}."""
+    ids = sorted(set(health_check_ids))
+
+    def check(health_check_id):
+        try:
+            return is_healthy(route53, health_check_id)
+        except (ClientError, BotoCoreError) as e:
+            log.warning(f"Health check {health_check_id} status unavailable: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(ids, pool.map(check, ids)))
+
+
+def _change_cost(change):
+    records = change["ResourceRecordSet"].get("ResourceRecords", [])
+    weight = 2 if change["Action"] == "UPSERT" else 1
+    return weight * len(records), weight * sum(len(r["Value"]) for r in records)
+
+
+def chunk_changes(groups, max_records=MAX_BATCH_RECORDS, max_chars=MAX_BATCH_CHARS):
+    """
+    Pack groups of changes (one failover pair each, kept in the same request)
+    into ChangeBatch lists within Route53's per-request limits.
+    """
+    batch, records, chars = [], 0, 0
+    for group in groups:
+        group_records, group_chars = map(sum, zip(*map(_change_cost, group)))
+        if batch and (records + group_records > max_records or chars + group_chars > max_chars):
+            yield batch
+            batch, records, chars = [], 0, 0
+        batch.extend(group)
+        records += group_records
+        chars += group_chars
+    if batch:
+        yield batch
+
+
+def _zone_pairs(route53, zone_id):
+    """Every failover pair in the zone: {(name, type): {"primary": rrset, "secondary": rrset}}."""
+    pairs = {}
+    for page in route53.get_paginator("list_resource_record_sets").paginate(HostedZoneId=zone_id):
+        for rrset in page["ResourceRecordSets"]:
+            if rrset.get("SetIdentifier") in (PRIMARY, SECONDARY):
+                key = (rrset["Name"].rstrip(".").lower(), rrset["Type"])
+                pairs.setdefault(key, {PRIMARY: None, SECONDARY: None})[rrset["SetIdentifier"]] = rrset
+    return pairs
+
+
+def _failover_zone(route53, zone_id, entries, insync_timeout):
+    """
+    Point each PRIMARY record of the zone at its secondary's values, skipping
+    pairs already serving them. Chunks are submitted in order, then every
+    change is waited on until INSYNC.
+    """
+    try:
+        live = _zone_pairs(route53, zone_id)
+    except (ClientError, BotoCoreError) as e:
+        return {"zone_id": zone_id, "records": 0, "already": 0, "failed": len(entries), "changes": [],
+                "insync": 0, "errors": [(zone_id, str(e))]}
+    groups, already = [], 0
+    for entry in entries:
+        primary, secondary = failover_records(entry["name"], entry["type"], entry["ttl"], entry["primary"],
+                                              entry["secondary"], entry.get("health_check_id"))
+        if not primary["HealthCheckId"]:
+            del primary["HealthCheckId"]
+        serving = dict(primary, ResourceRecords=secondary["ResourceRecords"])
+        pair = live.get((entry["name"].rstrip(".").lower(), entry["type"]), {})
+        if pair.get(SECONDARY) and _values(pair.get(PRIMARY)) == _values(serving):
+            already += 1
+            continue
+        groups.append([{"Action": "UPSERT", "ResourceRecordSet": serving},
+                       {"Action": "UPSERT", "ResourceRecordSet": secondary}])
+    change_ids, errors, accepted = [], [], 0
+    for batch in chunk_changes(groups):
+        try:
+            resp = route53.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch={"Comment": f"Fleet failover: {len(batch) // 2} records to secondary", "Changes": batch},
+            )
+            change_ids.append(resp["ChangeInfo"]["Id"])
+            accepted += len(batch) // 2  # Two changes per failover pair
+        except (ClientError, BotoCoreError) as e:
+            errors.append((zone_id, str(e)))
+    insync = 0
+    for change_id in change_ids:
+        try:
+            insync += wait_insync(route53, change_id, timeout=insync_timeout)
+        except (ClientError, BotoCoreError) as e:
+            errors.append((zone_id, str(e)))
+    return {"zone_id": zone_id, "records": accepted, "already": already, "failed": len(groups) - accepted,
+            "changes": change_ids, "insync": insync, "errors": errors}
+
+
+def fleet_failover(route53, inventory, max_workers=16, force=False, insync_timeout=600, on_zone=None):
+    """
+    Fail over every inventory entry whose health check is unhealthy (or all
+    of them with `force`). Entries whose check cannot be read are left alone.
+    Calls `on_zone(result)` as each zone reaches INSYNC (or gives up) and
+    returns a summary dict; failed_over counts only records in accepted
+    change batches, already the ones whose PRIMARY was serving the
+    secondary's values, failed the rest.
+    """
+    started = time.monotonic()
+    health = {} if force else check_health(route53, [e["health_check_id"] for e in inventory
+                                                     if e.get("health_check_id")], max_workers)
+    zones, unknown = {}, 0
+    for entry in inventory:
+        state = health.get(entry.get("health_check_id"))
+        if not force and state is None:
+            unknown += 1
+        elif force or not state:
+            zones.setdefault(entry["zone_id"], []).append(entry)
+
+    results = []
+    if zones:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(zones))) as pool:
+            futures = [pool.submit(_failover_zone, route53, zone_id, entries, insync_timeout)
+                       for zone_id, entries in zones.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_zone:
+                    on_zone(result)
+
+    return {
+        "records": len(inventory),
+        "failed_over": sum(r["records"] for r in results),
+        "already": sum(r["already"] for r in results),
+        "failed": sum(r["failed"] for r in results),
+        "unknown": unknown,
+        "zones": len(results),
+        "changes": sum(len(r["changes"]) for r in results),
+        "insync": sum(r["insync"] for r in results),
+        "errors": [err for r in results for err in r["errors"]],
+        "elapsed": time.monotonic() - started,
+    }
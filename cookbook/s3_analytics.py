@@ -0,0 +1,170 @@
+"""
+S3 Storage Analytics
+Builds a breakdown of objects and bytes by prefix (to a given depth),
+storage class and age bucket in a single streaming pass. Listing entries
+are grouped into columnar batches, the same {field: [values]} shape that
+cookbook.s3_inventory yields, so a LIST scan and an inventory report feed
+the same aggregation.
+
+With pyarrow each batch is aggregated with a vectorized group-by and only
+the per-group totals are kept, so memory depends on the number of groups,
+not the number of objects. Without pyarrow a row-by-row fallback gives the
+same result. Writing Parquet needs pyarrow.
+"""
+
+import csv
+import re
+from datetime import datetime, timezone
+from functools import reduce
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+BATCH_ROWS = 10000
+
+# Age buckets as (minimum age in days, label), oldest last
+AGE_BUCKETS = ((0, "0-30d"), (30, "30-90d"), (90, "90-180d"), (180, "180d-1y"), (365, "1-2y"), (730, "2y+"))
+UNKNOWN_AGE = "unknown"
+
+DIMENSIONS = ("prefix", "storage_class", "age")
+REPORT_FIELDS = list(DIMENSIONS) + ["objects", "bytes"]
+
+_US_PER_DAY = 86400 * 10 ** 6
+
+
+def listing_batches(objects, batch_rows=BATCH_ROWS):
+    """Group listing entries into columnar batches of Key, Size, StorageClass and LastModified."""
+    fields = ("Key", "Size", "StorageClass", "LastModified")
+    batch = {name: [] for name in fields}
+    for obj in objects:
+        for name in fields:
+            batch[name].append(obj.get(name))
+        if len(batch["Key"]) >= batch_rows:
+            yield batch
+            batch = {name: [] for name in fields}
+    if batch["Key"]:
+        yield batch
+
+
+def key_prefix(key, depth, delimiter="/"):
+    """The first `depth` delimited levels of `key` ("" for keys at the top level)."""
+    parts = key.split(delimiter, depth)
+    return "".join(part + delimiter for part in parts[:-1])
+
+
+def age_bucket(last_modified, now):
+    if last_modified is None:
+        return UNKNOWN_AGE
+    days = (now - last_modified).days
+    label = AGE_BUCKETS[0][1]
+    for minimum, name in AGE_BUCKETS:
+        if days >= minimum:
+            label = name
+    return label
+
+
+class StorageBreakdown:
+    """Running totals of objects and bytes per (prefix, storage class, age bucket)."""
+
+    def __init__(self, prefix_depth=1, delimiter="/", now=None, use_arrow=True):
+        self.prefix_depth = prefix_depth
+        self.delimiter = delimiter
+        self.now = now or datetime.now(timezone.utc)
+        self.use_arrow = use_arrow and pa is not None and len(delimiter) == 1
+        self.groups = {}
+
+    def _merge(self, group, objects, size):
+        totals = self.groups.get(group)
+        if totals is None:
+            self.groups[group] = [objects, size]
+        else:
+            totals[0] += objects
+            totals[1] += size
+
+    def add(self, batch):
+        """Aggregate one columnar batch; delete markers (inventory batches) are skipped."""
+        if self.use_arrow:
+            self._add_arrow(batch)
+            return
+        count = len(batch["Key"])
+        classes = batch.get("StorageClass") or [None] * count
+        modified = batch.get("LastModified") or [None] * count
+        markers = batch.get("IsDeleteMarker") or [False] * count
+        for key, size, storage_class, last_modified, is_marker in zip(
+                batch["Key"], batch["Size"], classes, modified, markers):
+            if is_marker:
+                continue
+            group = (key_prefix(key, self.prefix_depth, self.delimiter), storage_class or "STANDARD",
+                     age_bucket(last_modified, self.now))
+            self._merge(group, 1, size or 0)
+
+    def _add_arrow(self, batch):
+        count = len(batch["Key"])
+        keys = pa.array(batch["Key"], pa.string())
+        if batch.get("IsDeleteMarker"):
+            keep = pc.invert(pc.fill_null(pa.array(batch["IsDeleteMarker"], pa.bool_()), False))
+        else:
+            keep = None
+
+        d = re.escape(self.delimiter)
+        prefixes = pc.struct_field(
+            pc.extract_regex(keys, rf"^(?P<prefix>(?:[^{d}]*{d}){{0,{self.prefix_depth}}})"), [0])
+        classes = pc.fill_null(pa.array(batch.get("StorageClass") or [None] * count, pa.string()), "STANDARD")
+
+        # Age bucket index = number of bucket minimums the age reaches (future dates count as new)
+        modified = pa.array(batch.get("LastModified") or [None] * count, pa.timestamp("us", tz="UTC"))
+        now_us = int(self.now.timestamp() * 10 ** 6)
+        age_days = pc.divide(pc.subtract(pa.scalar(now_us), pc.cast(modified, pa.int64())), _US_PER_DAY)
+        reached = reduce(pc.add, [pc.cast(pc.greater_equal(age_days, minimum), pa.int8())
+                                  for minimum, _ in AGE_BUCKETS])
+        index = pc.max_element_wise(pc.subtract(reached, 1), 0, skip_nulls=False)
+        labels = pa.array([name for _, name in AGE_BUCKETS] + [UNKNOWN_AGE])
+        ages = pc.take(labels, pc.fill_null(pc.cast(index, pa.int32()), len(AGE_BUCKETS)))
+
+        table = pa.table({"prefix": prefixes, "storage_class": classes, "age": ages,
+                          "size": pc.fill_null(pa.array(batch["Size"], pa.int64()), 0)})
+        if keep is not None:
+            table = table.filter(keep)
+        grouped = table.group_by(list(DIMENSIONS)).aggregate([("size", "count"), ("size", "sum")])
+        for row in grouped.to_pylist():
+            self._merge((row["prefix"], row["storage_class"], row["age"]), row["size_count"], row["size_sum"] or 0)
+
+    def add_objects(self, objects, batch_rows=BATCH_ROWS):
+        """Aggregate a stream of listing entries."""
+        for batch in listing_batches(objects, batch_rows):
+            self.add(batch)
+
+    def totals(self):
+        """(objects, bytes) across every group."""
+        return (sum(objects for objects, _ in self.groups.values()),
+                sum(size for _, size in self.groups.values()))
+
+    def rows(self, by=DIMENSIONS):
+        """Report rows summed over the dimensions in `by`, largest first."""
+        rolled = {}
+        for group, (objects, size) in self.groups.items():
+            key = tuple(value for name, value in zip(DIMENSIONS, group) if name in by)
+            totals = rolled.setdefault(key, [0, 0])
+            totals[0] += objects
+            totals[1] += size
+        names = [name for name in DIMENSIONS if name in by]
+        rows = [dict(zip(names, key), objects=objects, bytes=size) for key, (objects, size) in rolled.items()]
+        return sorted(rows, key=lambda r: r["bytes"], reverse=True)
+
+    def write(self, path):
+        """Write the full breakdown as Parquet (.parquet) or CSV (anything else)."""
+        rows = self.rows()
+        if path.endswith(".parquet"):
+            if pa is None:
+                raise RuntimeError("pyarrow is required to write Parquet reports (pip install pyarrow)")
+            import pyarrow.parquet as pq
+            columns = {name: [row[name] for row in rows] for name in REPORT_FIELDS}
+            pq.write_table(pa.table(columns), path)
+            return
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,209 @@
+"""
+S3 Bucket Compliance Scanner
+Checks versioning and default encryption for every bucket in an account
+(or a given list), with the buckets grouped by region and each region
+checked on its own worker pool. A bucket is only changed when its current
+state differs from the target, and every bucket gets a report record.
+
+Bucket regions come from ListBuckets where S3 returns them, else from
+GetBucketLocation, and are cached (optionally in a JSON file) so repeat
+scans skip the lookups.
+"""
+
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Report statuses
+COMPLIANT = "compliant"
+FIXED = "fixed"
+NON_COMPLIANT = "non-compliant"
+ERROR = "error"
+
+REPORT_FIELDS = ["bucket", "region", "status", "versioning", "encryption", "changes", "error"]
+
+
+def list_bucket_regions(s3_client):
+    """{bucket: region or None} for every bucket; None when ListBuckets does not report the region."""
+    buckets = {}
+    for page in s3_client.get_paginator("list_buckets").paginate():
+        for bucket in page.get("Buckets", []):
+            buckets[bucket["Name"]] = bucket.get("BucketRegion")
+    return buckets
+
+
+def bucket_region(s3_client, bucket):
+    location = s3_client.get_bucket_location(Bucket=bucket).get("LocationConstraint")
+    # Buckets in us-east-1 have no constraint; "EU" is the legacy name of eu-west-1
+    return {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}.get(location, location)
+
+
+class RegionCache:
+    """Bucket -> region lookups, kept in memory and optionally in a JSON file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.regions = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.regions = json.load(f)
+
+    def resolve(self, s3_client, buckets, max_workers=16):
+        """
+        Fill in missing regions concurrently; returns {bucket: region}, with
+        None for buckets whose location cannot be read.
+        """
+        def lookup(bucket):
+            try:
+                return bucket_region(s3_client, bucket)
+            except (ClientError, BotoCoreError):
+                return None
+
+        missing = [b for b, region in buckets.items() if not region and b not in self.regions]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            found = dict(zip(missing, pool.map(lookup, missing)))
+        with self.lock:
+            self.regions.update({b: region for b, region in buckets.items() if region})
+            self.regions.update({b: region for b, region in found.items() if region})
+            return {b: self.regions.get(b) for b in buckets}
+
+    def save(self):
+        if self.path:
+            with self.lock, open(self.path, "w") as f:
+                json.dump(self.regions, f, indent=1, sort_keys=True)
+
+
+def encryption_target(algorithm="AES256", kms_key_id=None):
+    """The ApplyServerSideEncryptionByDefault block to enforce."""
+    if algorithm.upper() == "AES256":
+        return {"SSEAlgorithm": "AES256"}
+    if algorithm.lower() == "aws:kms":
+        if not kms_key_id:
+            raise ValueError("KMS_KEY_ID is required when using aws:kms encryption.")
+        return {"SSEAlgorithm": "aws:kms", "KMSMasterKeyID": kms_key_id}
+    raise ValueError(f"Invalid encryption type '{algorithm}'. Use 'AES256' or 'aws:kms'.")
+
+
+def _same_key(a, b):
+    # Accept a key ID where the other side has the full key ARN
+    return a == b or (a or "").split("/")[-1] == (b or "").split("/")[-1]
+
+
+def encryption_matches(rules, target):
+    for rule in rules:
+        current = rule.get("ApplyServerSideEncryptionByDefault", {})
+        if current.get("SSEAlgorithm") != target["SSEAlgorithm"]:
+            continue
+        if target["SSEAlgorithm"] != "aws:kms":
+            return True
+        if _same_key(current.get("KMSMasterKeyID"), target["KMSMasterKeyID"]):
+            return True
+    return False
+
+
+def get_encryption_rules(s3_client, bucket):
+    """Default encryption rules, or [] when the bucket has none."""
+    try:
+        return s3_client.get_bucket_encryption(Bucket=bucket)["ServerSideEncryptionConfiguration"]["Rules"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ServerSideEncryptionConfigurationNotFoundError":
+            return []
+        raise
+
+
+def check_bucket(s3_client, bucket, versioning=False, encryption=None, apply=False):
+    """
+    Check (and with `apply`, fix) one bucket. `encryption` is an
+    encryption_target() dict or None to skip the check. Returns a report
+    record; `changes` lists what was (or would be) applied.
+    """
+    record = {"bucket": bucket, "status": COMPLIANT, "versioning": None, "encryption": None,
+              "changes": [], "error": None}
+    try:
+        if versioning:
+            record["versioning"] = s3_client.get_bucket_versioning(Bucket=bucket).get("Status", "Disabled")
+            if record["versioning"] != "Enabled":
+                record["changes"].append("enable versioning")
+                if apply:
+                    s3_client.put_bucket_versioning(Bucket=bucket, VersioningConfiguration={"Status": "Enabled"})
+        if encryption:
+            rules = get_encryption_rules(s3_client, bucket)
+            record["encryption"] = ",".join(
+                r.get("ApplyServerSideEncryptionByDefault", {}).get("SSEAlgorithm", "") for r in rules) or "None"
+            if not encryption_matches(rules, encryption):
+                record["changes"].append(f"set {encryption['SSEAlgorithm']} encryption")
+                if apply:
+                    rules = [{"ApplyServerSideEncryptionByDefault": encryption}]
+                    s3_client.put_bucket_encryption(Bucket=bucket, ServerSideEncryptionConfiguration={"Rules": rules})
+    except (ClientError, BotoCoreError) as e:
+        record["status"], record["error"] = ERROR, str(e)
+        return record
+    if record["changes"]:
+        record["status"] = FIXED if apply else NON_COMPLIANT
+    return record
+
+
+def scan_buckets(client_for_region, regions, versioning=False, encryption=None, apply=False,
+                 max_workers=16, on_result=None):
+    """
+    Check every bucket in `regions` ({bucket: region}). Each region gets
+    its own client (`client_for_region(region)`) and pool of `max_workers`,
+    and all regions run at once. Calls `on_result(record)` per bucket and
+    returns the records sorted by bucket.
+    """
+    by_region = {}
+    for bucket, region in regions.items():
+        by_region.setdefault(region, []).append(bucket)
+
+    def scan_region(region, buckets):
+        s3_client = client_for_region(region)
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for record in pool.map(lambda b: check_bucket(s3_client, b, versioning, encryption, apply), buckets):
+                record["region"] = region
+                if on_result:
+                    on_result(record)
+                results.append(record)
+        return results
+
+    records = []
+    for bucket in by_region.pop(None, []):
+        record = {"bucket": bucket, "region": None, "status": ERROR, "versioning": None, "encryption": None,
+                  "changes": [], "error": "bucket region could not be resolved"}
+        if on_result:
+            on_result(record)
+        records.append(record)
+    if by_region:
+        with ThreadPoolExecutor(max_workers=len(by_region)) as pool:
+            for results in pool.map(lambda item: scan_region(*item), by_region.items()):
+                records.extend(results)
+    return sorted(records, key=lambda r: r["bucket"])
+
+
+def scan_account(s3_client, client_for_region, region_cache=None, max_workers=16, on_result=None, **checks):
+    """
+    scan_buckets() over every bucket the credentials can list. `checks` are
+    the versioning / encryption / apply arguments. The cache is saved after
+    regions are resolved.
+    """
+    region_cache = region_cache or RegionCache()
+    regions = region_cache.resolve(s3_client, list_bucket_regions(s3_client), max_workers)
+    region_cache.save()
+    return scan_buckets(client_for_region, regions, max_workers=max_workers, on_result=on_result, **checks)
+
+
+def write_report(records, path):
+    """Write the records as JSON (.json) or CSV (anything else)."""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".json"):
+            json.dump(records, f, indent=1, default=str)
+            return
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict(record, changes="; ".join(record["changes"])))
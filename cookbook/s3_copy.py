@@ -0,0 +1,172 @@
+"""
+Concurrent S3 Copy Engine
+Server-side copies across a thread pool. Objects above the multipart
+threshold are split into UploadPartCopy parts copied in parallel, which
+also lifts the 5 GB CopyObject limit. Metadata, tags and storage class
+are preserved.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from cookbook.checkpoint import BatchTracker
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+
+PART_SIZE = 128 * MB
+MAX_PARTS = 10000
+MAX_COPY_OBJECT_SIZE = 5 * GB
+# Everything CopyObject can take is copied whole: a single-part source keeps
+# its MD5 ETag, so the copy is verified from the ETag alone. A multipart
+# source gets a new single-part ETag (and multipart copies a new "-N" one),
+# so those copies are verified through their checksums instead.
+MULTIPART_THRESHOLD = MAX_COPY_OBJECT_SIZE
+
+# head_object fields carried over to create_multipart_upload
+_HEADERS = ("ContentType", "CacheControl", "ContentDisposition", "ContentEncoding",
+            "ContentLanguage", "Expires", "WebsiteRedirectLocation")
+
+
+def _part_ranges(size, part_size):
+    # Grow the part size if the object would need more than 10,000 parts
+    part_size = max(part_size, -(-size // MAX_PARTS))
+    for number, start in enumerate(range(0, size, part_size), start=1):
+        yield number, start, min(start + part_size, size) - 1
+
+
+def copy_single(s3_client, src_bucket, dst_bucket, obj):
+    """Copy one object with CopyObject; returns the new ETag."""
+    params = {}
+    if obj.get("StorageClass") and obj["StorageClass"] != "STANDARD":
+        params["StorageClass"] = obj["StorageClass"]
+    response = s3_client.copy_object(
+        CopySource={"Bucket": src_bucket, "Key": obj["Key"]},
+        Bucket=dst_bucket,
+        Key=obj["Key"],
+        **params
+    )
+    return response["CopyObjectResult"]["ETag"]
+
+
+def copy_multipart(s3_client, src_bucket, dst_bucket, obj, part_pool, part_size=PART_SIZE):
+    """Copy one object as parallel UploadPartCopy parts; returns the new ETag."""
+    key = obj["Key"]
+    head = s3_client.head_object(Bucket=src_bucket, Key=key)
+    params = {name: head[name] for name in _HEADERS if head.get(name)}
+    params["Metadata"] = head.get("Metadata", {})
+    storage_class = head.get("StorageClass") or obj.get("StorageClass")
+    if storage_class and storage_class != "STANDARD":
+        params["StorageClass"] = storage_class
+    tags = s3_client.get_object_tagging(Bucket=src_bucket, Key=key).get("TagSet", [])
+    if tags:
+        params["Tagging"] = urlencode([(t["Key"], t["Value"]) for t in tags])
+
+    upload_id = s3_client.create_multipart_upload(Bucket=dst_bucket, Key=key, **params)["UploadId"]
+
+    def copy_part(number, start, end):
+        response = s3_client.upload_part_copy(
+            Bucket=dst_bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            CopySource={"Bucket": src_bucket, "Key": key},
+            CopySourceRange=f"bytes={start}-{end}",
+            # Fail rather than stitch together parts of two different versions
+            CopySourceIfMatch=head["ETag"],
+        )
+        return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    futures = []
+    try:
+        futures = [part_pool.submit(copy_part, *r) for r in _part_ranges(head["ContentLength"], part_size)]
+        parts = [f.result() for f in futures]
+        response = s3_client.complete_multipart_upload(
+            Bucket=dst_bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+        return response["ETag"]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        try:
+            s3_client.abort_multipart_upload(Bucket=dst_bucket, Key=key, UploadId=upload_id)
+        except (ClientError, BotoCoreError):
+            pass  # Leave it to a lifecycle AbortIncompleteMultipartUpload rule
+        raise
+
+
+def copy_objects(s3_client, src_bucket, dst_bucket, objects, max_workers=16, part_workers=16,
+                 multipart_threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE, on_result=None,
+                 journal=None, checkpoint_every=1000, max_errors=None):
+    """
+    Copy every listing entry yielded by `objects` (dicts with "Key", "Size"
+    and optionally "StorageClass") from src_bucket to dst_bucket.
+
+    At most 2 * max_workers objects are in flight, so callers can feed a
+    live listing. `on_result(obj, etag, error)` is called from the worker
+    thread after each object; error is None on success.
+
+    With a `journal` (cookbook.checkpoint.CheckpointJournal) objects are
+    recorded in batches of `checkpoint_every`; `objects` must then arrive
+    in key order so the journal watermark can be used as StartAfter.
+
+    Returns a summary dict: copied, bytes, failed, errors, elapsed,
+    bytes_per_second. `errors` keeps the first `max_errors` failures (all
+    of them by default).
+    """
+    multipart_threshold = min(multipart_threshold, MAX_COPY_OBJECT_SIZE)
+    summary = {"copied": 0, "bytes": 0, "failed": 0, "errors": [], "elapsed": 0.0, "bytes_per_second": 0.0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    tracker = BatchTracker(journal, checkpoint_every) if journal else None
+
+    def run(obj, part_pool, seq):
+        etag = error = None
+        try:
+            try:
+                if obj.get("Size", 0) > multipart_threshold:
+                    etag = copy_multipart(s3_client, src_bucket, dst_bucket, obj, part_pool, part_size)
+                else:
+                    etag = copy_single(s3_client, src_bucket, dst_bucket, obj)
+            except (ClientError, BotoCoreError) as e:
+                error = e
+            with lock:
+                if error is None:
+                    summary["copied"] += 1
+                    summary["bytes"] += obj.get("Size", 0)
+                else:
+                    summary["failed"] += 1
+                    if max_errors is None or len(summary["errors"]) < max_errors:
+                        summary["errors"].append({"Key": obj["Key"], "Error": str(error)})
+            if on_result:
+                on_result(obj, etag, error)
+            if tracker:
+                tracker.done(seq, failed=error is not None)
+        finally:
+            slots.release()
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=part_workers) as part_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for obj in objects:
+            slots.acquire()
+            seq = tracker.add(obj["Key"]) if tracker else None
+            pending.add(pool.submit(run, obj, part_pool, seq))
+            finished = {f for f in pending if f.done()}
+            for future in finished:
+                future.result()
+            pending -= finished
+        for future in pending:
+            future.result()
+    if tracker:
+        tracker.seal()
+
+    summary["elapsed"] = time.monotonic() - start
+    if summary["elapsed"]:
+        summary["bytes_per_second"] = summary["bytes"] / summary["elapsed"]
+    return summary
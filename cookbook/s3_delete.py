@@ -0,0 +1,104 @@
+"""
+Batched S3 Deletion Engine
+Groups keys into DeleteObjects requests (up to 1000 keys each) and sends
+them from a bounded worker pool while the caller is still listing.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+# DeleteObjects accepts at most 1000 keys per request
+MAX_KEYS_PER_REQUEST = 1000
+
+
+def iter_batches(objects, batch_size=MAX_KEYS_PER_REQUEST):
+    """Group an iterable of listing entries into lists of `batch_size`."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _identifier(obj):
+    ident = {"Key": obj["Key"]}
+    if obj.get("VersionId"):
+        ident["VersionId"] = obj["VersionId"]
+    return ident
+
+
+def delete_batch(s3_client, bucket, batch):
+    """Send one DeleteObjects request and return the per-key errors."""
+    try:
+        response = s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [_identifier(obj) for obj in batch], "Quiet": True}
+        )
+        return response.get("Errors", [])
+    except ClientError as e:
+        code, message = e.response["Error"]["Code"], e.response["Error"].get("Message", str(e))
+    except BotoCoreError as e:
+        code, message = type(e).__name__, str(e)
+    # The whole request failed: report every key in the batch
+    return [dict(_identifier(obj), Code=code, Message=message) for obj in batch]
+
+
+def delete_objects_batched(s3_client, bucket, objects, max_workers=8,
+                           batch_size=MAX_KEYS_PER_REQUEST, on_batch=None, journal=None):
+    """
+    Delete every entry yielded by `objects` (dicts with "Key" and optionally
+    "VersionId" / "Size", e.g. straight from list_objects_v2).
+
+    At most 2 * max_workers batches are in flight, so listing never runs far
+    ahead of deletion. `on_batch(batch, deleted, errors)` is called from the
+    worker thread after each request.
+
+    With a `journal` (cookbook.checkpoint.CheckpointJournal) each request is
+    recorded as a batch; `objects` must then arrive in key order.
+
+    Returns a summary dict: deleted, bytes, batches, errors, elapsed.
+    """
+    summary = {"deleted": 0, "bytes": 0, "batches": 0, "errors": [], "elapsed": 0.0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def run(batch, seq):
+        try:
+            errors = delete_batch(s3_client, bucket, batch)
+            failed = {(e.get("Key"), e.get("VersionId")) for e in errors}
+            deleted = [obj for obj in batch if (obj["Key"], obj.get("VersionId")) not in failed]
+            with lock:
+                summary["deleted"] += len(deleted)
+                summary["bytes"] += sum(obj.get("Size", 0) for obj in deleted)
+                summary["batches"] += 1
+                summary["errors"].extend(errors)
+            if on_batch:
+                on_batch(batch, deleted, errors)
+            if journal:
+                journal.finish(seq, batch[-1]["Key"], len(batch), len(errors))
+        finally:
+            slots.release()
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for batch in iter_batches(objects, batch_size):
+            slots.acquire()
+            seq = journal.begin(batch[0]["Key"]) if journal else None
+            pending.add(pool.submit(run, batch, seq))
+            # Surface callback errors early and keep the set small
+            finished = {f for f in pending if f.done()}
+            for future in finished:
+                future.result()
+            pending -= finished
+        for future in pending:
+            future.result()
+
+    summary["elapsed"] = time.monotonic() - start
+    return summary
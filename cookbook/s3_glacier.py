@@ -0,0 +1,335 @@
+"""
+Glacier Restore Submitter and Tracker
+Streams archived objects from a listing into a bounded pool of
+RestoreObject requests. Objects whose restore is already running or
+finished are classified instead of being resubmitted.
+
+RestoreTracker keeps the submitted keys in SQLite and polls their Restore
+header with a tier-aware backoff, yielding objects as they become readable.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from cookbook.checkpoint import BatchTracker
+
+# Storage classes that need RestoreObject before they can be read.
+# GLACIER_IR is served directly and rejects restore requests.
+ARCHIVE_CLASSES = ("GLACIER", "DEEP_ARCHIVE")
+
+# Ask list_objects_v2 for the restore state so listing alone can skip objects
+LIST_ATTRIBUTES = {"OptionalObjectAttributes": ["RestoreStatus"]}
+
+# Submission outcomes
+SUBMITTED = "submitted"      # 202 Accepted: a new restore job was started
+RESTORED = "restored"        # 200 OK or listed as restored: a readable copy exists
+IN_PROGRESS = "in_progress"  # RestoreAlreadyInProgress or listed as in progress
+FAILED = "failed"
+
+# Tracker poll schedule per tier: (first poll after, longest interval) in seconds.
+# Expedited finishes in minutes, Standard in hours and Bulk can take up to 48h.
+POLL_SCHEDULE = {
+    "Expedited": (60, 5 * 60),
+    "Standard": (30 * 60, 2 * 3600),
+    "Bulk": (2 * 3600, 6 * 3600),
+}
+
+# Tracker states
+PENDING = "pending"
+AVAILABLE = "available"
+LOST = "lost"  # deleted, or no longer archived/restoring (e.g. the restore expired)
+
+_RESTORE_HEADER = re.compile(r'(\S+?)="([^"]*)"')
+
+
+def parse_date(value):
+    """Parse an ISO date/datetime setting into an aware UTC datetime (None if empty)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def listed_state(obj, now=None):
+    """Restore state reported by the listing's RestoreStatus, or None if unknown."""
+    status = obj.get("RestoreStatus")
+    if not status:
+        return None
+    if status.get("IsRestoreInProgress"):
+        return IN_PROGRESS
+    expiry = status.get("RestoreExpiryDate")
+    if expiry and expiry > (now or datetime.now(timezone.utc)):
+        return RESTORED
+    return None
+
+
+def archived_objects(objects, min_size=0, modified_after=None, modified_before=None):
+    """Filter listing entries down to archived objects matching the size/date filters."""
+    for obj in objects:
+        if obj.get("StorageClass") not in ARCHIVE_CLASSES:
+            continue
+        if obj.get("Size", 0) < min_size:
+            continue
+        if modified_after and obj["LastModified"] < modified_after:
+            continue
+        if modified_before and obj["LastModified"] >= modified_before:
+            continue
+        yield obj
+
+
+def submit_restore(s3_client, bucket, key, days=7, tier="Standard"):
+    """Send one RestoreObject request and classify the outcome."""
+    try:
+        response = s3_client.restore_object(
+            Bucket=bucket,
+            Key=key,
+            RestoreRequest={"Days": days, "GlacierJobParameters": {"Tier": tier}}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "RestoreAlreadyInProgress":
+            return IN_PROGRESS
+        raise
+    # 200 means a restored copy already exists (its expiry was extended)
+    if response["ResponseMetadata"]["HTTPStatusCode"] == 200:
+        return RESTORED
+    return SUBMITTED
+
+
+def restore_objects(s3_client, bucket, objects, days=7, tier="Standard", max_workers=32,
+                    on_result=None, journal=None, checkpoint_every=1000):
+    """
+    Submit restores for every archived entry yielded by `objects`, typically
+    archived_objects() over a live listing made with LIST_ATTRIBUTES.
+
+    Objects the listing already reports as restoring or restored are not
+    resubmitted. At most 2 * max_workers requests are in flight.
+    `on_result(obj, status, error)` is called for every object; error is
+    None unless status is FAILED. With a `journal`, `objects` must arrive in
+    key order (see cookbook.checkpoint).
+
+    Returns a summary dict with a count per status, requests, bytes
+    (submitted), errors and elapsed.
+    """
+    summary = {SUBMITTED: 0, RESTORED: 0, IN_PROGRESS: 0, FAILED: 0,
+               "requests": 0, "bytes": 0, "errors": [], "elapsed": 0.0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    tracker = BatchTracker(journal, checkpoint_every) if journal else None
+
+    def record(obj, status, error, seq):
+        with lock:
+            summary[status] += 1
+            if status == SUBMITTED:
+                summary["bytes"] += obj.get("Size", 0)
+            elif status == FAILED:
+                summary["errors"].append({"Key": obj["Key"], "Error": str(error)})
+        if on_result:
+            on_result(obj, status, error)
+        if tracker:
+            tracker.done(seq, failed=status == FAILED)
+
+    def run(obj, seq):
+        try:
+            error = None
+            try:
+                status = submit_restore(s3_client, bucket, obj["Key"], days, tier)
+            except (ClientError, BotoCoreError) as e:
+                status, error = FAILED, e
+            with lock:
+                summary["requests"] += 1
+            record(obj, status, error, seq)
+        finally:
+            slots.release()
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for obj in objects:
+            seq = tracker.add(obj["Key"]) if tracker else None
+            state = listed_state(obj)
+            if state:
+                record(obj, state, None, seq)
+                continue
+            slots.acquire()
+            pending.add(pool.submit(run, obj, seq))
+            finished = {f for f in pending if f.done()}
+            for future in finished:
+                future.result()
+            pending -= finished
+        for future in pending:
+            future.result()
+    if tracker:
+        tracker.seal()
+
+    summary["elapsed"] = time.monotonic() - start
+    return summary
+
+
+def parse_restore_header(value):
+    """
+    Parse the x-amz-restore header, e.g.
+    'ongoing-request="false", expiry-date="Fri, 21 Dec 2012 00:00:00 GMT"'.
+    Returns (ongoing, expiry); (None, None) when the header is absent.
+    """
+    if not value:
+        return None, None
+    fields = dict(_RESTORE_HEADER.findall(value))
+    expiry = fields.get("expiry-date")
+    return fields.get("ongoing-request") == "true", parsedate_to_datetime(expiry) if expiry else None
+
+
+def restore_state(s3_client, bucket, key):
+    """HEAD one object and return (state, expiry)."""
+    try:
+        head = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return LOST, None
+        raise
+    ongoing, expiry = parse_restore_header(head.get("Restore"))
+    if ongoing:
+        return PENDING, None
+    if ongoing is False or head.get("StorageClass") not in ARCHIVE_CLASSES:
+        return AVAILABLE, expiry
+    return LOST, None
+
+
+class RestoreTracker:
+    """
+    Persistent set of submitted restores for one bucket.
+
+    Keys are added as restores are submitted and polled with HeadObject on a
+    per-tier schedule that starts at the tier's typical completion time and
+    backs off to its longest interval.
+    """
+
+    def __init__(self, path, bucket):
+        self.bucket = bucket
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS restores (
+                bucket TEXT NOT NULL,
+                key TEXT NOT NULL,
+                size INTEGER,
+                tier TEXT,
+                status TEXT,
+                submitted REAL,
+                next_poll REAL,
+                interval REAL,
+                available REAL,
+                expiry TEXT,
+                PRIMARY KEY (bucket, key)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS restores_due ON restores (bucket, status, next_poll)")
+
+    def add(self, obj, tier="Standard", status=PENDING):
+        """Start tracking a submitted (or already restored) object."""
+        first_poll = POLL_SCHEDULE.get(tier, POLL_SCHEDULE["Standard"])[0]
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO restores (bucket, key, size, tier, status, submitted, next_poll, "
+                "interval, available) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.bucket, obj["Key"], obj.get("Size", 0), tier, status, now, now + first_poll,
+                 first_poll, now if status == AVAILABLE else None))
+
+    def progress(self):
+        """Counts, bytes, percent complete and ETA (seconds, or None while unknown)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*), COALESCE(SUM(size), 0), MIN(submitted), MAX(available) "
+                "FROM restores WHERE bucket = ? GROUP BY status", (self.bucket,)).fetchall()
+        stats = {PENDING: 0, AVAILABLE: 0, LOST: 0, "bytes_total": 0, "bytes_available": 0,
+                 "percent": 0.0, "eta": None}
+        started = last_available = None
+        for status, count, size, submitted, available in rows:
+            stats[status] = count
+            if status == LOST:
+                continue
+            stats["bytes_total"] += size
+            started = submitted if started is None else min(started, submitted)
+            if status == AVAILABLE:
+                stats["bytes_available"] = size
+                last_available = available
+        if stats["bytes_total"]:
+            stats["percent"] = 100.0 * stats["bytes_available"] / stats["bytes_total"]
+        # Extrapolate from the bytes that became available since submission
+        if stats[PENDING] and stats["bytes_available"] and last_available and last_available > started:
+            rate = stats["bytes_available"] / (last_available - started)
+            pending_bytes = stats["bytes_total"] - stats["bytes_available"]
+            stats["eta"] = max(0.0, last_available + pending_bytes / rate - time.time())
+        return stats
+
+    def next_poll(self):
+        """Timestamp of the earliest pending poll, or None if nothing is pending."""
+        with self.lock:
+            return self.conn.execute("SELECT MIN(next_poll) FROM restores WHERE bucket = ? AND status = ?",
+                                     (self.bucket, PENDING)).fetchone()[0]
+
+    def _due(self, limit):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT key, size, tier, interval FROM restores WHERE bucket = ? AND status = ? "
+                "AND next_poll <= ? ORDER BY next_poll LIMIT ?",
+                (self.bucket, PENDING, time.time(), limit)).fetchall()
+
+    def _update(self, key, tier, interval, state, expiry):
+        now = time.time()
+        with self.lock:
+            if state == PENDING:
+                longest = POLL_SCHEDULE.get(tier, POLL_SCHEDULE["Standard"])[1]
+                interval = min(interval * 2, longest)
+                self.conn.execute("UPDATE restores SET next_poll = ?, interval = ? WHERE bucket = ? AND key = ?",
+                                  (now + interval, interval, self.bucket, key))
+            else:
+                self.conn.execute(
+                    "UPDATE restores SET status = ?, available = ?, expiry = ? WHERE bucket = ? AND key = ?",
+                    (state, now if state == AVAILABLE else None, expiry.isoformat() if expiry else None,
+                     self.bucket, key))
+
+    def poll(self, s3_client, max_workers=32, limit=10000):
+        """
+        HEAD every object whose poll is due (at most `limit` per call) and
+        return the ones that became available as listing-style dicts.
+        """
+        def check(row):
+            key, size, tier, interval = row
+            try:
+                state, expiry = restore_state(s3_client, self.bucket, key)
+            except (ClientError, BotoCoreError):
+                state, expiry = PENDING, None  # Retry on the normal schedule
+            self._update(key, tier, interval, state, expiry)
+            return {"Key": key, "Size": size, "Expiry": expiry} if state == AVAILABLE else None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return [obj for obj in pool.map(check, self._due(limit)) if obj]
+
+    def watch(self, s3_client, max_workers=32, on_progress=None, max_sleep=15 * 60):
+        """
+        Yield objects as their restores complete until nothing is pending.
+        Sleeps until the next poll is due (at most `max_sleep` at a time)
+        and calls `on_progress(stats)` after every polling round.
+        """
+        while True:
+            available = self.poll(s3_client, max_workers)
+            while available:
+                yield from available
+                available = self.poll(s3_client, max_workers)
+            if on_progress:
+                on_progress(self.progress())
+            due = self.next_poll()
+            if due is None:
+                return
+            time.sleep(min(max(due - time.time(), 1), max_sleep))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,196 @@
+"""
+S3 Inventory Reader
+Loads an S3 Inventory manifest and streams its data files (CSV, ORC or
+Parquet) as columnar batches, so reports can be built without listing
+the bucket. ORC and Parquet need pyarrow.
+"""
+
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+# Inventory field names (CSV fileSchema or ORC/Parquet column names,
+# lower-cased without underscores) mapped to list_objects_v2 names
+FIELD_NAMES = {
+    "key": "Key",
+    "versionid": "VersionId",
+    "islatest": "IsLatest",
+    "isdeletemarker": "IsDeleteMarker",
+    "size": "Size",
+    "lastmodifieddate": "LastModified",
+    "etag": "ETag",
+    "storageclass": "StorageClass",
+}
+
+# Fields the totals and breakdowns cannot do without
+REQUIRED_FIELDS = ("Key", "Size")
+
+BATCH_ROWS = 10000
+
+_RUN_FOLDER = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}-\d{2}Z/$")
+
+
+def parse_s3_uri(uri):
+    """Split s3://bucket/key into (bucket, key)."""
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Not an S3 URI: {uri}")
+    bucket, _, key = uri[5:].partition("/")
+    return bucket, key
+
+
+def find_latest_manifest(s3_client, bucket, prefix):
+    """Return the manifest.json key of the newest run under an inventory config prefix."""
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    runs = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        runs.extend(p["Prefix"] for p in page.get("CommonPrefixes", [])
+                    if _RUN_FOLDER.search(p["Prefix"]))
+    if not runs:
+        raise ValueError(f"No inventory runs found under s3://{bucket}/{prefix}")
+    return max(runs) + "manifest.json"
+
+
+def load_manifest(s3_client, location):
+    """
+    Load an inventory manifest from an s3:// URI. The URI may point at a
+    manifest.json or at the inventory configuration prefix, in which case
+    the newest run is used.
+    """
+    bucket, key = parse_s3_uri(location)
+    if not key.endswith("manifest.json"):
+        key = find_latest_manifest(s3_client, bucket, key)
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    manifest = json.loads(body)
+    manifest["_bucket"] = manifest["destinationBucket"].split(":::")[-1]
+    manifest["_key"] = key
+    # CSV schemas are "Bucket, Key, Size, ..."; ORC/Parquet schemas name their columns among type words
+    fields = {_normalise(name) for name in re.findall(r"[A-Za-z_]+", manifest.get("fileSchema", ""))}
+    missing = [name for name in REQUIRED_FIELDS if name not in fields]
+    if missing:
+        raise ValueError(f"Inventory s3://{bucket}/{key} has no {', '.join(missing)} field: "
+                         f"enable {', '.join(missing)} in the inventory configuration's optional fields")
+    return manifest
+
+
+def _normalise(name):
+    return FIELD_NAMES.get(name.strip().lower().replace("_", ""))
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+
+
+def _csv_batches(body, schema):
+    columns = [_normalise(name) for name in schema.split(",")]
+    wanted = [(i, name) for i, name in enumerate(columns) if name]
+    reader = csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=body), encoding="utf-8"))
+    batch = {name: [] for _, name in wanted}
+    for row in reader:
+        for i, name in wanted:
+            batch[name].append(row[i])
+        if len(batch[wanted[0][1]]) >= BATCH_ROWS:
+            yield _convert_csv(batch)
+            batch = {name: [] for _, name in wanted}
+    if batch[wanted[0][1]]:
+        yield _convert_csv(batch)
+
+
+def _convert_csv(batch):
+    if "Key" in batch:
+        batch["Key"] = [unquote(k) for k in batch["Key"]]
+    if "Size" in batch:
+        batch["Size"] = [int(v) if v else 0 for v in batch["Size"]]
+    for flag in ("IsLatest", "IsDeleteMarker"):
+        if flag in batch:
+            batch[flag] = [v == "true" for v in batch[flag]]
+    if "LastModified" in batch:
+        batch["LastModified"] = [_parse_timestamp(v) for v in batch["LastModified"]]
+    return batch
+
+
+def _columnar_batches(path, file_format):
+    try:
+        if file_format == "Parquet":
+            import pyarrow.parquet as pq
+        else:
+            import pyarrow.orc as orc
+    except ImportError:
+        raise RuntimeError(f"pyarrow is required to read {file_format} inventory files (pip install pyarrow)")
+
+    if file_format == "Parquet":
+        source = pq.ParquetFile(path)
+        columns = [n for n in source.schema_arrow.names if _normalise(n)]
+        record_batches = source.iter_batches(batch_size=BATCH_ROWS, columns=columns)
+    else:
+        source = orc.ORCFile(path)
+        columns = [n for n in source.schema.names if _normalise(n)]
+        record_batches = (source.read_stripe(i, columns=columns) for i in range(source.nstripes))
+
+    for record_batch in record_batches:
+        batch = {}
+        for name in columns:
+            values = record_batch.column(record_batch.schema.get_field_index(name)).to_pylist()
+            batch[_normalise(name)] = values
+        if "Size" in batch:
+            batch["Size"] = [v or 0 for v in batch["Size"]]
+        if "LastModified" in batch:
+            batch["LastModified"] = [_parse_timestamp(v) for v in batch["LastModified"]]
+        yield batch
+
+
+def iter_file_batches(s3_client, manifest, data_file):
+    """Yield columnar batches ({field: [values]}) from one inventory data file."""
+    bucket = manifest["_bucket"]
+    file_format = manifest["fileFormat"]
+    if file_format == "CSV":
+        body = s3_client.get_object(Bucket=bucket, Key=data_file["key"])["Body"]
+        yield from _csv_batches(body, manifest["fileSchema"])
+        return
+    # ORC and Parquet need random access, so spool the file to disk first
+    with tempfile.NamedTemporaryFile(suffix="." + file_format.lower()) as tmp:
+        s3_client.download_fileobj(bucket, data_file["key"], tmp)
+        tmp.flush()
+        yield from _columnar_batches(tmp.name, file_format)
+
+
+def iter_batches(s3_client, manifest):
+    """Yield columnar batches from every data file of the manifest in turn."""
+    for data_file in manifest["files"]:
+        yield from iter_file_batches(s3_client, manifest, data_file)
+
+
+def _file_totals(s3_client, manifest, data_file):
+    objects = size = 0
+    for batch in iter_file_batches(s3_client, manifest, data_file):
+        markers = batch.get("IsDeleteMarker") or [False] * len(batch["Size"])
+        for obj_size, is_marker in zip(batch["Size"], markers):
+            if not is_marker:
+                objects += 1
+                size += obj_size
+    return objects, size
+
+
+def inventory_totals(s3_client, manifest, max_workers=4):
+    """
+    Count objects and bytes across all data files, reading files in parallel.
+    Versioned inventories include noncurrent versions (but not delete markers).
+    """
+    totals = {"objects": 0, "bytes": 0, "files": len(manifest["files"])}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda f: _file_totals(s3_client, manifest, f), manifest["files"])
+        for objects, size in results:
+            totals["objects"] += objects
+            totals["bytes"] += size
+    return totals
@@ -0,0 +1,276 @@
+"""
+Parallel S3 Listing
+Discovers the prefix layout of a bucket with Delimiter, lists the prefixes
+in parallel and splits large prefixes into key ranges, yielding objects
+as a stream while listing is still running. A level with many objects
+directly under it (a flat keyspace) is split into key ranges as soon as
+its first page comes back truncated.
+"""
+
+import os
+import queue
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+# Highest character used when picking split points inside a prefix
+_KEY_CEILING = "\x7f"
+
+# Key ranges a truncated Delimiter level is split into
+_LEVEL_SPLITS = 8
+
+
+def iter_pages_sorted(s3_client, bucket, prefix="", start_after=None, **list_kwargs):
+    """Yield the Contents of each list_objects_v2 page, in key order."""
+    params = dict(list_kwargs, Bucket=bucket, Prefix=prefix)
+    if start_after:
+        params["StartAfter"] = start_after
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(**params):
+        yield page.get("Contents", [])
+
+
+def iter_objects_sorted(s3_client, bucket, prefix="", start_after=None, prefetch_pages=0,
+                        **list_kwargs):
+    """
+    Yield objects in key order using a single list_objects_v2 paginator.
+    With prefetch_pages > 0 the next pages are fetched in the background
+    while the caller works through the current one.
+    """
+    pages = iter_pages_sorted(s3_client, bucket, prefix, start_after, **list_kwargs)
+    if prefetch_pages:
+        pages = prefetch(pages, prefetch_pages)
+    for contents in pages:
+        yield from contents
+
+
+def prefetch(iterable, maxsize=16):
+    """Run `iterable` in a background thread, buffering at most `maxsize` items."""
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def fill():
+        try:
+            for item in iterable:
+                put(item)
+                if stop.is_set():
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=fill, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def merge_listings(left, right):
+    """
+    Sorted merge-join of two key-ordered listings.
+    Yields (key, left_obj, right_obj) with None on the side missing the key.
+    """
+    left, right = iter(left), iter(right)
+    a, b = next(left, None), next(right, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a["Key"] < b["Key"]):
+            yield a["Key"], a, None
+            a = next(left, None)
+        elif a is None or b["Key"] < a["Key"]:
+            yield b["Key"], None, b
+            b = next(right, None)
+        else:
+            yield a["Key"], a, b
+            a, b = next(left, None), next(right, None)
+
+
+def split_point(low, high):
+    """Return a key strictly between `low` and `high`, or None if there is no room."""
+    if not low < high:
+        return None
+    i = 0
+    while i < len(low) and i < len(high) and low[i] == high[i]:
+        i += 1
+    lo = ord(low[i]) if i < len(low) else 0x1f
+    hi = ord(high[i])
+    if hi - lo > 1:
+        return low[:i] + chr((lo + hi) // 2)
+    if i < len(low):
+        # Adjacent characters: split the tail of `low` against the ceiling
+        tail = split_point(low[i + 1:], _KEY_CEILING)
+        if tail is not None:
+            return low[:i + 1] + tail
+    return None
+
+
+def range_splits(first, last, high, parts=_LEVEL_SPLITS):
+    """
+    Up to `parts - 1` keys in (last, high) to split the rest of a listing at,
+    guessed from one page spanning first..last: the character before their
+    common prefix ends is stepped, so "obj-00000000".."obj-00000999" gives
+    "obj-00001", "obj-00002", ... Falls back to a single split_point().
+    """
+    common = os.path.commonprefix([first, last])
+    if len(common) < len(first) and common:
+        base, c = common[:-1], common[-1]
+        # Step within the character's own class (digits, letters), where the next keys most likely are
+        alphabet = next((chars for chars in (string.digits, string.ascii_lowercase, string.ascii_uppercase)
+                         if c in chars), "".join(map(chr, range(ord(c), ord(_KEY_CEILING)))))
+        following = alphabet[alphabet.index(c) + 1:][:parts - 1]
+        points = [base + char for char in following if last < base + char < high]
+        if points:
+            return points
+    middle = split_point(last, high)
+    return [middle] if middle is not None else []
+
+
+class _ParallelLister:
+    def __init__(self, s3_client, bucket, max_workers, delimiter, max_depth,
+                 split_after_pages, queue_pages, list_kwargs):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.delimiter = delimiter
+        self.max_depth = max_depth
+        self.split_after_pages = split_after_pages
+        self.list_kwargs = list_kwargs
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.out = queue.Queue(maxsize=queue_pages)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.pending += 1
+        self.pool.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        try:
+            if not self.stop.is_set():
+                fn(*args)
+        except Exception as e:
+            self.emit(e)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                finished = self.pending == 0
+            if finished:
+                self.emit(_DONE)
+
+    def emit(self, item):
+        """Put on the output queue, giving up once the consumer has gone away."""
+        while not self.stop.is_set():
+            try:
+                self.out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def walk(self, prefix, depth, start_after=None, end=None):
+        """
+        List one level (keys in (start_after, end]) with Delimiter and fan
+        out into the common prefixes. If the first page is truncated, the
+        rest of the level is split into key ranges walked by other workers.
+        """
+        params = dict(self.list_kwargs, Bucket=self.bucket, Prefix=prefix, Delimiter=self.delimiter)
+        if start_after:
+            params["StartAfter"] = start_after
+        first_page = True
+        while not self.stop.is_set():
+            page = self.s3_client.list_objects_v2(**params)
+            contents = [obj for obj in page.get("Contents", []) if end is None or obj["Key"] <= end]
+            if contents:
+                self.emit(contents)
+            for common in page.get("CommonPrefixes", []):
+                # A prefix straddling a range boundary belongs to the range holding the prefix itself
+                if (start_after and common["Prefix"] <= start_after) or (end is not None and common["Prefix"] > end):
+                    continue
+                if depth + 1 < self.max_depth:
+                    self.submit(self.walk, common["Prefix"], depth + 1)
+                else:
+                    self.submit(self.scan, common["Prefix"], None, None)
+
+            names = sorted([obj["Key"] for obj in page.get("Contents", [])]
+                           + [common["Prefix"] for common in page.get("CommonPrefixes", [])])
+            if not page.get("IsTruncated") or (end is not None and names and names[-1] > end):
+                return
+            params["ContinuationToken"] = page["NextContinuationToken"]
+            if first_page and names:
+                first_page = False
+                high = end if end is not None else prefix + _KEY_CEILING
+                points = range_splits(names[0], names[-1], high)
+                for low, upper in zip(points, points[1:] + [end]):
+                    self.submit(self.walk, prefix, depth, low, upper)
+                if points:
+                    end = points[0]
+
+    def scan(self, prefix, start_after, end):
+        """
+        List the keys of `prefix` in (start_after, end] without Delimiter.
+        Every `split_after_pages` pages the remaining range is halved and
+        the upper half handed to another worker.
+        """
+        params = dict(self.list_kwargs, Bucket=self.bucket, Prefix=prefix)
+        pages = 0
+        while not self.stop.is_set():
+            if start_after:
+                params["StartAfter"] = start_after
+            page = self.s3_client.list_objects_v2(**params)
+            contents = page.get("Contents", [])
+            if end is not None and contents and contents[-1]["Key"] > end:
+                self.emit([obj for obj in contents if obj["Key"] <= end])
+                return
+            if contents:
+                self.emit(contents)
+            if not page.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = page["NextContinuationToken"]
+            pages += 1
+            if pages % self.split_after_pages == 0 and contents:
+                high = end if end is not None else prefix + _KEY_CEILING
+                middle = split_point(contents[-1]["Key"], high)
+                if middle is not None:
+                    self.submit(self.scan, prefix, middle, end)
+                    end = middle
+
+
+def iter_objects(s3_client, bucket, prefix="", max_workers=16, delimiter="/",
+                 max_depth=3, split_after_pages=10, queue_pages=64, **list_kwargs):
+    """
+    Yield every object under `prefix`, listing prefixes in parallel.
+
+    Objects arrive in no particular order; use iter_objects_sorted when key
+    order matters. Extra keyword arguments (e.g. OptionalObjectAttributes)
+    are passed through to list_objects_v2.
+    """
+    lister = _ParallelLister(s3_client, bucket, max_workers, delimiter, max_depth,
+                             split_after_pages, queue_pages, list_kwargs)
+    lister.submit(lister.walk, prefix, 0)
+    try:
+        while True:
+            item = lister.out.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+    finally:
+        lister.stop.set()
+        lister.pool.shutdown(wait=False, cancel_futures=True)
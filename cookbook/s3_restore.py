@@ -0,0 +1,129 @@
+"""
+Streaming S3 Restore Pipeline
+Runs list -> diff -> copy -> verify as one stream. Both buckets are listed
+in key order with bounded prefetch and merge-joined, only missing or
+changed keys are copied, and each copy is verified from the ETag its copy
+request returned, so the target is never listed a second time.
+
+Every hand-off between stages is bounded (listing prefetch, copies in
+flight, the verify queue), so memory stays flat whatever the bucket size.
+The only state kept is counters, a small sample of problems, the JSON
+Lines report and the optional on-disk checkpoint journal.
+"""
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cookbook.s3_copy import MULTIPART_THRESHOLD, PART_SIZE, copy_objects
+from cookbook.s3_sync import COPY, DELETE, SAME, UPDATE, diff_buckets
+from cookbook.s3_verify import (MISMATCH, SAMPLE_SIZE, UNVERIFIABLE, VERIFIED, check_multipart,
+                                verify_copy)
+
+FAILED = "failed"  # the copy itself failed
+
+_DONE = object()
+
+
+def restore_bucket(s3_client, src_bucket, dst_bucket, prefix="", max_workers=16, part_workers=16,
+                   verify_workers=8, multipart_threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE,
+                   queue_size=1024, report_path=None, journal=None, checkpoint_every=1000, on_result=None):
+    """
+    Copy every source key under `prefix` that is missing or different in
+    the target, then verify it. Keys already identical in the target are
+    verified from the listing (GetObjectAttributes for multipart objects).
+    Extra target keys are counted, never deleted.
+
+    `on_result(key, status, reason)` is called for every copied or checked
+    key from a worker thread. Problems are written to `report_path` as JSON
+    Lines. With a `journal` the copy resumes after its watermark.
+
+    Returns a summary dict: a count per diff action (copy, update, same,
+    delete = extra target keys) and per status (verified, mismatch,
+    unverifiable, failed), copied, bytes, sample (first problems) and elapsed.
+    """
+    summary = {COPY: 0, UPDATE: 0, SAME: 0, DELETE: 0, VERIFIED: 0, MISMATCH: 0, UNVERIFIABLE: 0, FAILED: 0,
+               "copied": 0, "bytes": 0, "sample": [], "elapsed": 0.0}
+    lock = threading.Lock()
+    to_verify = queue.Queue(maxsize=queue_size)
+    crashes = []  # Exceptions raised while verifying (e.g. by on_result), re-raised at the end
+    report = open(report_path, "w") if report_path else None
+
+    def record(obj, status, reason):
+        with lock:
+            summary[status] += 1
+            if status != VERIFIED:
+                entry = {"key": obj["Key"], "status": status, "reason": reason,
+                         "source_size": obj.get("Size"), "source_etag": obj.get("ETag")}
+                if len(summary["sample"]) < SAMPLE_SIZE:
+                    summary["sample"].append(entry)
+                if report:
+                    report.write(json.dumps(entry) + "\n")
+        if on_result:
+            on_result(obj["Key"], status, reason)
+
+    def verifier():
+        # Keep draining the queue whatever happens, or copy workers blocked on put() would hang
+        while True:
+            item = to_verify.get()
+            if item is _DONE:
+                return
+            obj, etag = item
+            try:
+                if etag is None:
+                    # Already in the target with a different multipart layout
+                    record(obj, *check_multipart(s3_client, src_bucket, dst_bucket, obj["Key"]))
+                else:
+                    record(obj, *verify_copy(s3_client, src_bucket, dst_bucket, obj, etag))
+            except Exception as e:
+                with lock:
+                    crashes.append(e)
+
+    def on_copy(obj, etag, error):
+        if error is None:
+            to_verify.put((obj, etag))  # Blocks the copy workers while verification catches up
+        else:
+            record(obj, FAILED, str(error))
+
+    def changed_objects():
+        start_after = journal.watermark if journal else None
+        for action, src_obj, dst_obj in diff_buckets(s3_client, src_bucket, dst_bucket, prefix,
+                                                     start_after=start_after):
+            with lock:
+                summary[action] += 1
+            if action in (COPY, UPDATE):
+                yield src_obj
+            elif action == SAME:
+                if src_obj.get("ETag") == dst_obj.get("ETag"):
+                    record(src_obj, VERIFIED, "listing")
+                else:
+                    to_verify.put((src_obj, None))
+
+    start = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=verify_workers) as verify_pool:
+            verifiers = [verify_pool.submit(verifier) for _ in range(verify_workers)]
+            try:
+                result = copy_objects(
+                    s3_client, src_bucket, dst_bucket, changed_objects(),
+                    max_workers=max_workers, part_workers=part_workers,
+                    multipart_threshold=multipart_threshold, part_size=part_size,
+                    on_result=on_copy, journal=journal, checkpoint_every=checkpoint_every,
+                    max_errors=0
+                )
+            finally:
+                for _ in verifiers:
+                    to_verify.put(_DONE)
+            for future in verifiers:
+                future.result()
+    finally:
+        if report:
+            report.close()
+
+    if crashes:
+        raise crashes[0]
+    summary["copied"], summary["bytes"] = result["copied"], result["bytes"]
+    summary["elapsed"] = time.monotonic() - start
+    return summary
@@ -0,0 +1,77 @@
+"""
+S3 Storage Metrics
+Reads the daily BucketSizeBytes / NumberOfObjects metrics that S3 publishes
+to CloudWatch. The client must be in the bucket's region.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+DAY = 86400
+
+
+def cloudwatch_bucket_size(cw_client, bucket, lookback_days=3):
+    """
+    Return the latest bucket size from CloudWatch:
+    {"objects", "bytes", "by_storage_type", "timestamp"}.
+    Values are published once a day, so they can be up to ~48h old.
+    """
+    storage_types = set()
+    paginator = cw_client.get_paginator("list_metrics")
+    for page in paginator.paginate(Namespace="AWS/S3", MetricName="BucketSizeBytes",
+                                   Dimensions=[{"Name": "BucketName", "Value": bucket}]):
+        for metric in page.get("Metrics", []):
+            for dim in metric["Dimensions"]:
+                if dim["Name"] == "StorageType":
+                    storage_types.add(dim["Value"])
+
+    queries = [{
+        "Id": "objects",
+        "MetricStat": {
+            "Metric": {
+                "Namespace": "AWS/S3",
+                "MetricName": "NumberOfObjects",
+                "Dimensions": [{"Name": "BucketName", "Value": bucket},
+                               {"Name": "StorageType", "Value": "AllStorageTypes"}],
+            },
+            "Period": DAY,
+            "Stat": "Average",
+        },
+    }]
+    labels = {}
+    for i, storage_type in enumerate(sorted(storage_types)):
+        labels[f"size{i}"] = storage_type
+        queries.append({
+            "Id": f"size{i}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": "AWS/S3",
+                    "MetricName": "BucketSizeBytes",
+                    "Dimensions": [{"Name": "BucketName", "Value": bucket},
+                                   {"Name": "StorageType", "Value": storage_type}],
+                },
+                "Period": DAY,
+                "Stat": "Average",
+            },
+        })
+
+    end_time = datetime.now(timezone.utc)
+    result = {"objects": None, "bytes": 0, "by_storage_type": {}, "timestamp": None}
+    seen = set()
+    paginator = cw_client.get_paginator("get_metric_data")
+    for page in paginator.paginate(MetricDataQueries=queries, ScanBy="TimestampDescending",
+                                   StartTime=end_time - timedelta(days=lookback_days),
+                                   EndTime=end_time):
+        for series in page["MetricDataResults"]:
+            # Newest value first; later pages only carry older datapoints
+            if not series["Values"] or series["Id"] in seen:
+                continue
+            seen.add(series["Id"])
+            value, timestamp = series["Values"][0], series["Timestamps"][0]
+            if series["Id"] == "objects":
+                result["objects"] = int(value)
+            else:
+                result["by_storage_type"][labels[series["Id"]]] = int(value)
+                result["bytes"] += int(value)
+            if result["timestamp"] is None or timestamp > result["timestamp"]:
+                result["timestamp"] = timestamp
+    return result
@@ -0,0 +1,133 @@
+"""
+Versioned Bucket Purge
+Streams list_object_versions and picks what an age-based delete cannot
+reach on a versioned bucket: noncurrent versions and delete markers that
+no longer hide anything. They are removed by VersionId through the
+batched DeleteObjects engine, so storage is reclaimed at batch speed.
+
+A version's noncurrent age counts from when the next newer version (or
+delete marker) replaced it, as S3's NoncurrentDays does, so the versions
+of each key are buffered together even when they span listing pages.
+
+A key's latest delete marker is only removed in a second pass, once every
+older version of that key is confirmed deleted: removing the marker while
+a version behind it survives (Object Lock, AccessDenied) would make that
+version current again.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from cookbook.s3_delete import delete_objects_batched
+
+
+def _first(version, marker):
+    """Which head comes first in S3's order: True for the version."""
+    if version["Key"] != marker["Key"]:
+        return version["Key"] < marker["Key"]
+    if version.get("IsLatest") or marker.get("IsLatest"):
+        return bool(version.get("IsLatest"))
+    # LastModified has one-second resolution; on a tie the marker is taken as the newer write
+    return version["LastModified"] > marker["LastModified"]
+
+
+def _entries(page):
+    """
+    Merge the page's Versions and DeleteMarkers, each already in S3's order
+    (key order, newest first), without re-sorting either list.
+    """
+    versions = [dict(v, IsDeleteMarker=False) for v in page.get("Versions", [])]
+    markers = [dict(m, IsDeleteMarker=True, Size=0) for m in page.get("DeleteMarkers", [])]
+    entries, v, m = [], 0, 0
+    while v < len(versions) and m < len(markers):
+        if _first(versions[v], markers[m]):
+            entries.append(versions[v])
+            v += 1
+        else:
+            entries.append(markers[m])
+            m += 1
+    return entries + versions[v:] + markers[m:]
+
+
+def iter_key_versions(s3_client, bucket, prefix=""):
+    """Yield (key, entries) in key order; entries are versions and delete markers, newest first."""
+    key, group = None, []
+    paginator = s3_client.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for entry in _entries(page):
+            if entry["Key"] != key:
+                if group:
+                    yield key, group
+                key, group = entry["Key"], []
+            group.append(entry)
+    if group:
+        yield key, group
+
+
+def purge_candidates(entries, cutoff, keep_noncurrent=0):
+    """
+    The entries of one key (newest first) to delete: noncurrent versions
+    and markers replaced before `cutoff`, beyond the newest
+    `keep_noncurrent`, plus the latest delete marker once nothing older
+    remains and it was itself placed before `cutoff`.
+    """
+    purge = []
+    for newer, entry in zip(entries, entries[1:]):
+        # `newer` made `entry` noncurrent when it was written
+        if newer["LastModified"] < cutoff:
+            purge.append(entry)
+    purge = purge[max(0, keep_noncurrent - (len(entries) - 1 - len(purge))):]
+    latest = entries[0]
+    if latest["IsDeleteMarker"] and len(purge) == len(entries) - 1 and latest["LastModified"] < cutoff:
+        purge.append(latest)  # An expired delete marker: no versions left behind it
+    return purge
+
+
+def purge_versions(s3_client, bucket, prefix="", noncurrent_days=30, keep_noncurrent=0, max_workers=8,
+                   on_batch=None, dry_run=False, now=None):
+    """
+    Delete noncurrent versions and expired delete markers under `prefix`.
+    Current versions are never touched. `on_batch(batch, deleted, errors)`
+    is called as in delete_objects_batched().
+
+    Returns a summary dict: keys, versions, delete_markers (scanned),
+    candidates, candidate_bytes, deleted, bytes (reclaimed), batches,
+    errors, markers_kept (expired markers left because a version behind
+    them could not be deleted), elapsed. With `dry_run` nothing is deleted.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=noncurrent_days)
+    summary = {"keys": 0, "versions": 0, "delete_markers": 0, "candidates": 0, "candidate_bytes": 0}
+    expired_markers = []
+    failed_keys = set()
+
+    def candidates():
+        for _, entries in iter_key_versions(s3_client, bucket, prefix):
+            summary["keys"] += 1
+            markers = sum(e["IsDeleteMarker"] for e in entries)
+            summary["delete_markers"] += markers
+            summary["versions"] += len(entries) - markers
+            for entry in purge_candidates(entries, cutoff, keep_noncurrent):
+                summary["candidates"] += 1
+                summary["candidate_bytes"] += entry["Size"]
+                if entry is entries[0]:
+                    expired_markers.append(entry)  # Deleted after the versions behind it
+                else:
+                    yield entry
+
+    def versions_batch(batch, deleted, errors):
+        failed_keys.update(e.get("Key") for e in errors)
+        if on_batch:
+            on_batch(batch, deleted, errors)
+
+    if dry_run:
+        for _ in candidates():
+            pass
+        return dict(summary, deleted=0, bytes=0, batches=0, errors=[], markers_kept=0, elapsed=0.0)
+    result = delete_objects_batched(s3_client, bucket, candidates(), max_workers=max_workers,
+                                    on_batch=versions_batch)
+    markers = [m for m in expired_markers if m["Key"] not in failed_keys]
+    if markers:
+        second = delete_objects_batched(s3_client, bucket, markers, max_workers=max_workers, on_batch=on_batch)
+        for name in ("deleted", "bytes", "batches", "elapsed"):
+            result[name] += second[name]
+        result["errors"].extend(second["errors"])
+    return dict(summary, markers_kept=len(expired_markers) - len(markers), **result)
@@ -0,0 +1,92 @@
+import pytest
+
+from cookbook.checkpoint import BatchTracker, CheckpointJournal, resume_requested
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal.db")
+
+
+def _batches(journal, *first_keys):
+    return [journal.begin(key) for key in first_keys]
+
+
+def test_watermark_advances_over_contiguous_batches(path):
+    journal = CheckpointJournal(path, "job")
+    a, b, c = _batches(journal, "a", "c", "e")
+    journal.finish(b, "d", 2)
+    assert journal.watermark is None  # Batch a is still in flight
+    journal.finish(a, "b", 2)
+    assert journal.watermark == "d"
+    journal.finish(c, "f", 2)
+    assert (journal.watermark, journal.done_seq) == ("f", 3)
+
+
+def test_watermark_holds_at_the_first_failed_batch(path):
+    journal = CheckpointJournal(path, "job")
+    a, b, c = _batches(journal, "a", "c", "e")
+    journal.finish(a, "b", 2)
+    journal.finish(b, "d", 2, failed=1)
+    journal.finish(c, "f", 2)
+    assert (journal.watermark, journal.done_seq) == ("b", 1)
+    journal.close()
+
+    resumed = CheckpointJournal(path, "job", resume=True)
+    assert resumed.resumed and resumed.watermark == "b"
+    # Numbering restarts after the watermark, so the failed batch is redone
+    assert resumed.begin("c") == 2
+    assert resumed.totals() == (2, 0)
+
+
+def test_without_resume_progress_is_forgotten(path):
+    journal = CheckpointJournal(path, "job")
+    journal.finish(journal.begin("a"), "a", 1)
+    journal.set("update", "abc")
+    journal.close()
+
+    fresh = CheckpointJournal(path, "job")
+    assert not fresh.resumed
+    assert fresh.get("update") is None
+    assert fresh.totals() == (0, 0)
+
+
+def test_jobs_are_independent(path):
+    first = CheckpointJournal(path, "first")
+    first.finish(first.begin("a"), "a", 1)
+    second = CheckpointJournal(path, "second")
+    assert first.watermark == "a" and second.watermark is None
+
+
+def test_batch_tracker_finishes_batches_completed_out_of_order(path):
+    journal = CheckpointJournal(path, "job")
+    tracker = BatchTracker(journal, batch_size=2)
+    seqs = [tracker.add(key) for key in ("a", "b", "c", "d", "e")]
+    tracker.seal()
+    assert seqs == [1, 1, 2, 2, 3]
+
+    for seq in (3, 2, 2):
+        tracker.done(seq)
+    assert journal.watermark is None
+    tracker.done(1, failed=True)
+    tracker.done(1)
+    # Batch 1 had a failure, so nothing after it counts as done
+    assert journal.watermark is None
+    assert journal.totals() == (5, 1)
+
+
+def test_batch_tracker_advances_when_every_object_succeeds(path):
+    journal = CheckpointJournal(path, "job")
+    tracker = BatchTracker(journal, batch_size=2)
+    seqs = [tracker.add(key) for key in ("a", "b", "c")]
+    for seq in seqs:
+        tracker.done(seq)
+    assert journal.watermark == "b"  # The last batch is not sealed yet
+    tracker.seal()
+    assert journal.watermark == "c"
+
+
+def test_resume_requested():
+    assert resume_requested(["script.py", "--resume"])
+    assert resume_requested(["script.py"], "TRUE")
+    assert not resume_requested(["script.py"], None)
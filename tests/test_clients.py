@@ -0,0 +1,51 @@
+import pytest
+from botocore.exceptions import NoCredentialsError
+
+from cookbook import clients
+from cookbook.clients import DEFAULT_POOL_SIZE, RETRIES, get_client
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clients._sessions.clear()
+    clients._clients.clear()
+    yield
+    clients._sessions.clear()
+    clients._clients.clear()
+
+
+def test_clients_are_cached_per_service_and_region():
+    s3 = get_client("s3", "us-east-1")
+    assert get_client("s3", "us-east-1") is s3
+    assert get_client("s3", "eu-west-1") is not s3
+    assert get_client("ec2", "us-east-1") is not s3
+
+
+def test_pool_grows_but_never_shrinks():
+    small = get_client("s3", "us-east-1", max_pool_connections=4)
+    assert small.meta.config.max_pool_connections == DEFAULT_POOL_SIZE
+    large = get_client("s3", "us-east-1", max_pool_connections=40)
+    assert large is not small and large.meta.config.max_pool_connections == 40
+    assert get_client("s3", "us-east-1", max_pool_connections=20) is large
+
+
+def test_clients_use_adaptive_retries():
+    config = get_client("s3", "us-east-1").meta.config
+    assert config.retries["mode"] == RETRIES["mode"]
+
+
+def test_explicit_keys_get_their_own_client():
+    default = get_client("s3", "us-east-1")
+    keyed = get_client("s3", "us-east-1", access_key="AKIDEXAMPLE", secret_key="secret")
+    assert keyed is not default
+    assert keyed._request_signer._credentials.access_key == "AKIDEXAMPLE"
+
+
+def test_missing_credentials_raise(monkeypatch, tmp_path):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_SHARED_CREDENTIALS_FILE", str(tmp_path / "none"))
+    monkeypatch.setenv("AWS_CONFIG_FILE", str(tmp_path / "none"))
+    monkeypatch.setenv("AWS_EC2_METADATA_DISABLED", "true")
+    with pytest.raises(NoCredentialsError):
+        get_client("s3", "us-east-1")
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from cookbook.eks import (ADDON, BLOCKED, CONTROL_PLANE, NODEGROUP, UNCHANGED, _addon_release, _minor_steps,
+                          plan_upgrade, run_step, run_upgrade)
+
+
+class FakePaginator:
+    def __init__(self, key, items):
+        self.key, self.items = key, items
+
+    def paginate(self, **kwargs):
+        return [{self.key: self.items}]
+
+
+class FakeEks:
+    """Just enough of the EKS API for planning and running upgrades; every update succeeds instantly."""
+
+    def __init__(self, clusters, addons=(), nodegroups=(), fail=(), update_seconds=0.0):
+        self.versions = dict(clusters)
+        self.addons = {(c, a): "v1.0.0-eksbuild.1" for c in clusters for a in addons}
+        self.nodegroups = {(c, n): self.versions[c] for c in clusters for n in nodegroups}
+        self.fail = set(fail)
+        self.update_seconds = update_seconds
+        self.calls = []
+        self.updates = {}
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.peak = {}
+
+    def describe_cluster(self, name):
+        return {"cluster": {"version": self.versions[name]}}
+
+    def describe_addon(self, clusterName, addonName):
+        return {"addon": {"addonVersion": self.addons[(clusterName, addonName)]}}
+
+    def describe_nodegroup(self, clusterName, nodegroupName):
+        return {"nodegroup": {"version": self.nodegroups[(clusterName, nodegroupName)]}}
+
+    def describe_addon_versions(self, addonName, kubernetesVersion):
+        return {"addons": [{"addonVersions": [
+            {"addonVersion": "v1.2.0-eksbuild.1",
+             "compatibilities": [{"clusterVersion": kubernetesVersion, "defaultVersion": True}]},
+        ]}]}
+
+    def get_paginator(self, name):
+        if name == "list_addons":
+            return FakePaginator("addons", sorted({a for _, a in self.addons}))
+        return FakePaginator("nodegroups", sorted({n for _, n in self.nodegroups}))
+
+    def _submit(self, cluster, label, apply):
+        with self.lock:
+            self.calls.append((cluster, label))
+            self.in_flight[cluster] = self.in_flight.get(cluster, 0) + 1
+            self.peak[cluster] = max(self.peak.get(cluster, 0), self.in_flight[cluster])
+            update_id = f"u{len(self.calls)}"
+            self.updates[update_id] = (cluster, label, apply)
+        return {"update": {"id": update_id}}
+
+    def update_cluster_version(self, name, version):
+        return self._submit(name, f"{CONTROL_PLANE}@{version}", lambda: self.versions.__setitem__(name, version))
+
+    def update_addon(self, clusterName, addonName, addonVersion, resolveConflicts):
+        return self._submit(clusterName, f"{ADDON}/{addonName}",
+                            lambda: self.addons.__setitem__((clusterName, addonName), addonVersion))
+
+    def update_nodegroup_version(self, clusterName, nodegroupName, version):
+        return self._submit(clusterName, f"{NODEGROUP}/{nodegroupName}",
+                            lambda: self.nodegroups.__setitem__((clusterName, nodegroupName), version))
+
+    def describe_update(self, name, updateId, **kwargs):
+        time.sleep(self.update_seconds)
+        cluster, label, apply = self.updates[updateId]
+        with self.lock:
+            self.in_flight[cluster] -= 1
+        if label in self.fail:
+            return {"update": {"id": updateId, "status": "Failed", "type": "VersionUpdate"}}
+        apply()
+        return {"update": {"id": updateId, "status": "Successful", "type": "VersionUpdate"}}
+
+
+def test_minor_steps_move_one_version_at_a_time():
+    assert _minor_steps("1.27", "1.30") == ["1.28", "1.29", "1.30"]
+    assert _minor_steps("1.30", "1.30") == []
+
+
+def test_addon_release_orders_numerically():
+    assert _addon_release("v1.18.10-eksbuild.1") > _addon_release("v1.18.9-eksbuild.2")
+    assert _addon_release("v1.18.3-eksbuild.2") > _addon_release("v1.18.3-eksbuild.1")
+
+
+def test_plan_chains_control_plane_then_fans_out():
+    eks = FakeEks({"prod": "1.28"}, addons=["coredns"], nodegroups=["workers"])
+    steps = {step["id"]: step for step in plan_upgrade(eks, "prod", "1.30")}
+
+    assert steps["prod/control-plane@1.29"]["deps"] == []
+    assert steps["prod/control-plane@1.30"]["deps"] == ["prod/control-plane@1.29"]
+    assert steps["prod/addon/coredns@v1.2.0-eksbuild.1"]["deps"] == ["prod/control-plane@1.30"]
+    assert steps["prod/nodegroup/workers@1.30"]["deps"] == ["prod/control-plane@1.30"]
+
+
+def test_run_upgrade_orders_steps_by_dependency():
+    eks = FakeEks({"prod": "1.28"}, addons=["coredns", "kube-proxy"], nodegroups=["workers"])
+    result = run_upgrade(eks, plan_upgrade(eks, "prod", "1.30"), per_cluster=4)
+
+    labels = [label for _, label in eks.calls]
+    assert labels[:2] == [f"{CONTROL_PLANE}@1.29", f"{CONTROL_PLANE}@1.30"]
+    assert sorted(labels[2:]) == [f"{ADDON}/coredns", f"{ADDON}/kube-proxy", f"{NODEGROUP}/workers"]
+    assert set(result["statuses"].values()) == {"Successful"}
+    assert result["errors"] == []
+
+
+def test_failed_control_plane_blocks_its_dependents():
+    eks = FakeEks({"prod": "1.28"}, addons=["coredns"], nodegroups=["workers"],
+                  fail=[f"{CONTROL_PLANE}@1.29"])
+    steps = plan_upgrade(eks, "prod", "1.29")
+    result = run_upgrade(eks, steps)
+
+    assert result["statuses"]["prod/control-plane@1.29"] == "Failed"
+    assert result["statuses"]["prod/addon/coredns@v1.2.0-eksbuild.1"] == BLOCKED
+    assert result["statuses"]["prod/nodegroup/workers@1.29"] == BLOCKED
+    assert eks.calls == [("prod", f"{CONTROL_PLANE}@1.29")]
+
+
+def test_per_cluster_limit_holds_while_clusters_run_in_parallel():
+    eks = FakeEks({"a": "1.28", "b": "1.28"}, addons=["coredns", "kube-proxy", "vpc-cni"],
+                  nodegroups=["n1", "n2"], update_seconds=0.05)
+    steps = plan_upgrade(eks, "a", "1.29") + plan_upgrade(eks, "b", "1.29")
+    result = run_upgrade(eks, steps, max_workers=8, per_cluster=2)
+
+    assert len(eks.calls) == 12 and set(result["statuses"].values()) == {"Successful"}
+    assert eks.peak == {"a": 2, "b": 2}
+
+
+def test_run_step_skips_steps_already_at_version():
+    eks = FakeEks({"prod": "1.30"}, addons=["coredns"])
+    eks.addons[("prod", "coredns")] = "v1.3.0-eksbuild.1"
+    for step in plan_upgrade(eks, "prod", "1.30"):
+        assert run_step(eks, step) == UNCHANGED
+    assert eks.calls == []
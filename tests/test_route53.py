@@ -0,0 +1,128 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from cookbook.route53 import (PRIMARY, SECONDARY, _change_cost, chunk_changes, current_state, failover_records,
+                              find_pair, fleet_failover, switch_records)
+
+
+@pytest.fixture
+def route53():
+    with mock_aws():
+        yield boto3.client("route53")
+
+
+def _zone(route53, name):
+    return route53.create_hosted_zone(Name=name, CallerReference=name)["HostedZone"]["Id"].split("/")[-1]
+
+
+def _create_pair(route53, zone_id, name, primary_value, secondary_value):
+    primary, secondary = failover_records(name, "A", 60, primary_value, secondary_value, None)
+    del primary["HealthCheckId"]
+    route53.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": [
+        {"Action": "CREATE", "ResourceRecordSet": primary},
+        {"Action": "CREATE", "ResourceRecordSet": secondary},
+    ]})
+
+
+def _live_values(route53, zone_id, name):
+    pair = find_pair(route53, zone_id, name, "A")
+    return {role: [r["Value"] for r in pair[role]["ResourceRecords"]] if pair[role] else None for role in pair}
+
+
+def test_fleet_failover_points_primary_at_secondary_values(route53):
+    zones = {name: _zone(route53, name) for name in ("a.example.com", "b.example.com")}
+    inventory = []
+    for zone_name, zone_id in zones.items():
+        for i in range(3):
+            name = f"app{i}.{zone_name}"
+            _create_pair(route53, zone_id, name, f"10.0.0.{i}", f"10.1.0.{i}")
+            inventory.append({"zone_id": zone_id, "name": name, "type": "A", "ttl": 60,
+                              "primary": f"10.0.0.{i}", "secondary": f"10.1.0.{i}"})
+
+    result = fleet_failover(route53, inventory, force=True)
+
+    assert (result["failed_over"], result["already"], result["failed"], result["errors"]) == (6, 0, 0, [])
+    for entry in inventory:
+        live = _live_values(route53, entry["zone_id"], entry["name"])
+        assert live == {PRIMARY: [entry["secondary"]], SECONDARY: [entry["secondary"]]}
+
+
+def test_fleet_failover_skips_pairs_already_on_secondary(route53):
+    zone_id = _zone(route53, "example.com")
+    _create_pair(route53, zone_id, "app.example.com", "10.0.0.1", "10.1.0.1")
+    inventory = [{"zone_id": zone_id, "name": "app.example.com", "type": "A", "ttl": 60,
+                  "primary": "10.0.0.1", "secondary": "10.1.0.1"}]
+
+    first = fleet_failover(route53, inventory, force=True)
+    second = fleet_failover(route53, inventory, force=True)
+
+    assert (first["failed_over"], first["changes"]) == (1, 1)
+    assert (second["failed_over"], second["already"], second["changes"]) == (0, 1, 0)
+
+
+def test_fleet_failover_counts_rejected_zone_as_failed(route53):
+    zone_id = _zone(route53, "example.com")
+    _create_pair(route53, zone_id, "app.example.com", "10.0.0.1", "10.1.0.1")
+    inventory = [
+        {"zone_id": zone_id, "name": "app.example.com", "type": "A", "ttl": 60,
+         "primary": "10.0.0.1", "secondary": "10.1.0.1"},
+        {"zone_id": "ZMISSING", "name": "gone.example.org", "type": "A", "ttl": 60,
+         "primary": "10.0.0.2", "secondary": "10.1.0.2"},
+    ]
+
+    result = fleet_failover(route53, inventory, force=True)
+
+    assert (result["failed_over"], result["failed"], len(result["errors"])) == (1, 1, 1)
+
+
+def _group(value):
+    primary, secondary = failover_records("app.example.com", "A", 60, value, value, "hc")
+    return [{"Action": "UPSERT", "ResourceRecordSet": primary}, {"Action": "UPSERT", "ResourceRecordSet": secondary}]
+
+
+def test_chunk_changes_keeps_pairs_together_under_record_limit():
+    groups = [_group(f"10.0.{i // 256}.{i % 256}") for i in range(600)]
+
+    batches = list(chunk_changes(groups))
+
+    # Each pair costs four records (two UPSERTs, counted twice)
+    assert [len(b) for b in batches] == [500, 500, 200]
+    for batch in batches:
+        assert sum(_change_cost(c)[0] for c in batch) <= 1000
+        for primary, secondary in zip(batch[::2], batch[1::2]):
+            assert primary["ResourceRecordSet"]["SetIdentifier"] == PRIMARY
+            assert secondary["ResourceRecordSet"]["SetIdentifier"] == SECONDARY
+
+
+def test_chunk_changes_respects_character_limit():
+    groups = [_group("x" * 1000) for _ in range(20)]
+
+    batches = list(chunk_changes(groups))
+
+    # 4000 characters per pair: eight pairs fit in 32000
+    assert [len(b) for b in batches] == [16, 16, 8]
+    assert all(sum(_change_cost(c)[1] for c in batch) <= 32000 for batch in batches)
+
+
+def test_chunk_changes_never_splits_an_oversized_group():
+    groups = [_group("x" * 20000), _group("y")]
+
+    assert [len(b) for b in chunk_changes(groups)] == [2, 2]
+
+
+def test_switch_records_fails_over_and_back_keeping_the_pair(route53):
+    zone_id = _zone(route53, "example.com")
+    _create_pair(route53, zone_id, "app.example.com", "10.0.0.1", "10.1.0.1")
+    primary, secondary = failover_records("app.example.com", "A", 60, "10.0.0.1", "10.1.0.1", None)
+    del primary["HealthCheckId"]
+    assert current_state(route53, zone_id, primary, secondary) == PRIMARY
+
+    assert switch_records(route53, zone_id, primary, secondary, SECONDARY) is not None
+    assert _live_values(route53, zone_id, "app.example.com") == {PRIMARY: ["10.1.0.1"], SECONDARY: ["10.1.0.1"]}
+    assert current_state(route53, zone_id, primary, secondary) == SECONDARY
+    assert switch_records(route53, zone_id, primary, secondary, SECONDARY) is None
+
+    assert switch_records(route53, zone_id, primary, secondary, PRIMARY) is not None
+    assert _live_values(route53, zone_id, "app.example.com") == {PRIMARY: ["10.0.0.1"], SECONDARY: ["10.1.0.1"]}
+    assert current_state(route53, zone_id, primary, secondary) == PRIMARY
@@ -0,0 +1,79 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from cookbook.s3_listing import iter_objects, iter_objects_sorted, range_splits, split_point
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="bucket")
+        yield client
+
+
+def _put(s3, keys):
+    for key in keys:
+        s3.put_object(Bucket="bucket", Key=key, Body=b"")
+    return sorted(keys)
+
+
+def _listed(s3, **kwargs):
+    keys = [obj["Key"] for obj in iter_objects(s3, "bucket", MaxKeys=25, **kwargs)]
+    assert len(keys) == len(set(keys)), "keys listed more than once"
+    return sorted(keys)
+
+
+def test_split_point_is_strictly_between():
+    for low, high in [("a", "b"), ("a", "c"), ("logs/2024", "logs/2025"), ("", "\x7f"), ("abc", "abd")]:
+        middle = split_point(low, high)
+        assert middle is not None and low < middle < high
+
+
+def test_split_point_without_room():
+    assert split_point("b", "a") is None
+    assert split_point("a", "a") is None
+
+
+def test_range_splits_steps_the_last_common_character():
+    points = range_splits("obj-00000000", "obj-00000999", "obj-\x7f")
+    assert points == ["obj-00001", "obj-00002", "obj-00003", "obj-00004", "obj-00005", "obj-00006", "obj-00007"]
+
+
+def test_range_splits_falls_back_to_one_split_point():
+    points = range_splits("a", "a", "b")
+    assert len(points) == 1 and "a" < points[0] < "b"
+
+
+def test_flat_keyspace(s3):
+    keys = _put(s3, [f"obj-{i:05d}" for i in range(300)])
+    assert _listed(s3) == keys
+
+
+def test_nested_prefixes(s3):
+    keys = _put(s3, [f"{a}/{b}/{i:03d}" for a in ("logs", "data") for b in range(4) for i in range(30)])
+    assert _listed(s3) == keys
+
+
+def test_objects_and_prefixes_at_the_same_level(s3):
+    keys = _put(s3, [f"k{i:03d}" for i in range(80)] + [f"k{i:03d}/child" for i in range(0, 80, 7)]
+                + [f"z/{i:03d}" for i in range(60)])
+    assert _listed(s3) == keys
+
+
+def test_deep_prefix_is_scanned_in_ranges(s3):
+    keys = _put(s3, [f"a/b/c/{i:04d}" for i in range(200)] + ["a/top"])
+    assert _listed(s3, max_depth=1, split_after_pages=2) == keys
+
+
+def test_prefix_limits_the_listing(s3):
+    _put(s3, [f"in/{i:03d}" for i in range(60)] + [f"out/{i:03d}" for i in range(10)] + ["inside"])
+    assert _listed(s3, prefix="in/") == [f"in/{i:03d}" for i in range(60)]
+
+
+def test_sorted_listing_resumes_after_start_after(s3):
+    keys = _put(s3, [f"obj-{i:03d}" for i in range(60)])
+    listed = [obj["Key"] for obj in iter_objects_sorted(s3, "bucket", start_after="obj-029", prefetch_pages=2,
+                                                         MaxKeys=25)]
+    assert listed == keys[30:]
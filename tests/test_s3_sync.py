@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from cookbook.s3_listing import merge_listings
+from cookbook.s3_sync import COPY, DELETE, SAME, UPDATE, diff_buckets, is_same_object
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _objs(*keys):
+    return [{"Key": key} for key in keys]
+
+
+def test_merge_listings_joins_on_key():
+    merged = [(key, a and a["Key"], b and b["Key"])
+              for key, a, b in merge_listings(_objs("a", "c", "d", "f"), _objs("b", "c", "e", "f", "g"))]
+    assert merged == [("a", "a", None), ("b", None, "b"), ("c", "c", "c"), ("d", "d", None),
+                      ("e", None, "e"), ("f", "f", "f"), ("g", None, "g")]
+
+
+def test_merge_listings_with_an_empty_side():
+    assert [k for k, _, _ in merge_listings(_objs("a", "b"), [])] == ["a", "b"]
+    assert [k for k, _, _ in merge_listings([], _objs("a"))] == ["a"]
+    assert list(merge_listings([], [])) == []
+
+
+def test_merge_listings_is_lazy():
+    def endless():
+        i = 0
+        while True:
+            yield {"Key": f"{i:09d}"}
+            i += 1
+
+    merged = merge_listings(endless(), _objs("000000001"))
+    assert [next(merged)[0] for _ in range(3)] == ["000000000", "000000001", "000000002"]
+
+
+def test_is_same_object():
+    src = {"Key": "k", "Size": 3, "ETag": '"abc"', "LastModified": NOW}
+    assert is_same_object(src, dict(src))
+    assert not is_same_object(src, dict(src, Size=4))
+    assert not is_same_object(src, dict(src, ETag='"def"'))
+    # Multipart ETags fall back to size and modification time
+    multipart = dict(src, ETag='"abc-2"')
+    assert is_same_object(multipart, dict(src, ETag='"xyz"', LastModified=NOW + timedelta(seconds=1)))
+    assert not is_same_object(multipart, dict(src, ETag='"xyz"', LastModified=NOW - timedelta(seconds=1)))
+
+
+def test_diff_buckets_actions():
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        for bucket in ("src", "dst"):
+            s3.create_bucket(Bucket=bucket)
+        for key, body in (("copy", b"1"), ("same", b"2"), ("update", b"3")):
+            s3.put_object(Bucket="src", Key=key, Body=body)
+        for key, body in (("same", b"2"), ("update", b"changed"), ("zdelete", b"4")):
+            s3.put_object(Bucket="dst", Key=key, Body=body)
+
+        actions = [(action, (src or dst)["Key"]) for action, src, dst in diff_buckets(s3, "src", "dst")]
+        resumed = [(action, (src or dst)["Key"])
+                   for action, src, dst in diff_buckets(s3, "src", "dst", start_after="same")]
+
+    assert actions == [(COPY, "copy"), (SAME, "same"), (UPDATE, "update"), (DELETE, "zdelete")]
+    assert resumed == [(UPDATE, "update"), (DELETE, "zdelete")]
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from cookbook.s3_versions import _entries, purge_candidates, purge_versions
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+CUTOFF = NOW - timedelta(days=30)
+
+
+def _entry(version_id, days_ago, marker=False, latest=False, key="k"):
+    return {"Key": key, "VersionId": version_id, "LastModified": NOW - timedelta(days=days_ago),
+            "IsDeleteMarker": marker, "IsLatest": latest, "Size": 0 if marker else 10}
+
+
+def _ids(entries):
+    return [e["VersionId"] for e in entries]
+
+
+def test_noncurrent_age_counts_from_the_replacing_version():
+    # v2 replaced v1 90 days ago, v1 replaced v0 60 days ago, v3 replaced v2 only 10 days ago
+    entries = [_entry("v3", 10, latest=True), _entry("v2", 90), _entry("v1", 60), _entry("v0", 100)]
+    assert _ids(purge_candidates(entries, CUTOFF)) == ["v1", "v0"]
+
+
+def test_current_version_is_never_a_candidate():
+    entries = [_entry("v1", 100, latest=True), _entry("v0", 200)]
+    assert _ids(purge_candidates(entries, CUTOFF)) == ["v0"]
+    assert purge_candidates([_entry("only", 400, latest=True)], CUTOFF) == []
+
+
+def test_keep_noncurrent_keeps_the_newest_noncurrent_entries():
+    entries = [_entry("v4", 100, latest=True), _entry("v3", 110), _entry("v2", 120), _entry("v1", 130),
+               _entry("v0", 140)]
+    assert _ids(purge_candidates(entries, CUTOFF, keep_noncurrent=0)) == ["v3", "v2", "v1", "v0"]
+    assert _ids(purge_candidates(entries, CUTOFF, keep_noncurrent=2)) == ["v1", "v0"]
+    assert purge_candidates(entries, CUTOFF, keep_noncurrent=10) == []
+
+
+def test_recent_noncurrent_entries_count_towards_keep_noncurrent():
+    # v3 became noncurrent 5 days ago and is kept by age; it fills one of the two kept slots
+    entries = [_entry("v4", 5, latest=True), _entry("v3", 100), _entry("v2", 110), _entry("v1", 120)]
+    assert _ids(purge_candidates(entries, CUTOFF, keep_noncurrent=2)) == ["v1"]
+
+
+def test_latest_marker_goes_once_nothing_is_left_behind_it():
+    entries = [_entry("d", 100, marker=True, latest=True), _entry("v1", 200), _entry("v0", 300)]
+    assert _ids(purge_candidates(entries, CUTOFF)) == ["v1", "v0", "d"]
+
+
+def test_latest_marker_stays_while_a_version_behind_it_is_kept():
+    entries = [_entry("d", 100, marker=True, latest=True), _entry("v1", 200), _entry("v0", 300)]
+    assert _ids(purge_candidates(entries, CUTOFF, keep_noncurrent=1)) == ["v0"]
+
+
+def test_recent_latest_marker_is_kept():
+    entries = [_entry("d", 10, marker=True, latest=True), _entry("v0", 300)]
+    assert purge_candidates(entries, CUTOFF) == []
+
+
+def test_entries_merge_keeps_s3_order_on_same_second_ties():
+    same = NOW - timedelta(days=1)
+    page = {
+        "Versions": [
+            {"Key": "a", "VersionId": "v2", "LastModified": same},
+            {"Key": "a", "VersionId": "v1", "LastModified": same},
+            {"Key": "a", "VersionId": "v0", "LastModified": same - timedelta(days=1)},
+            {"Key": "b", "VersionId": "b0", "LastModified": same, "IsLatest": True},
+        ],
+        "DeleteMarkers": [
+            {"Key": "a", "VersionId": "d1", "LastModified": same, "IsLatest": True},
+            {"Key": "a", "VersionId": "d0", "LastModified": same - timedelta(hours=1)},
+            {"Key": "c", "VersionId": "c0", "LastModified": same, "IsLatest": True},
+        ],
+    }
+    entries = _entries(page)
+    assert _ids(entries) == ["d1", "v2", "v1", "d0", "v0", "b0", "c0"]
+    assert [e["IsDeleteMarker"] for e in entries] == [True, False, False, True, False, False, True]
+
+
+def test_purge_versions_end_to_end():
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="bucket")
+        s3.put_bucket_versioning(Bucket="bucket", VersioningConfiguration={"Status": "Enabled"})
+        for body in (b"1", b"22", b"333"):
+            s3.put_object(Bucket="bucket", Key="kept", Body=body)
+        for body in (b"1", b"22"):
+            s3.put_object(Bucket="bucket", Key="deleted", Body=body)
+        s3.delete_object(Bucket="bucket", Key="deleted")
+
+        future = datetime.now(timezone.utc) + timedelta(days=60)
+        dry = purge_versions(s3, "bucket", noncurrent_days=30, dry_run=True, now=future)
+        result = purge_versions(s3, "bucket", noncurrent_days=30, now=future)
+        left = s3.list_object_versions(Bucket="bucket")
+
+    assert (dry["candidates"], dry["candidate_bytes"], dry["deleted"]) == (5, 6, 0)
+    assert (result["keys"], result["versions"], result["delete_markers"]) == (2, 5, 1)
+    assert (result["deleted"], result["bytes"], result["markers_kept"], result["errors"]) == (5, 6, 0, [])
+    assert [(v["Key"], v["IsLatest"]) for v in left.get("Versions", [])] == [("kept", True)]
+    assert left.get("DeleteMarkers", []) == []